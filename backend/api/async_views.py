@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+READ_ACTIONS = ("list", "retrieve")
+
+# Потоки для запросов к БД из асинхронных представлений. Размер пула
+# ограничивает число соединений с БД на один процесс.
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_THREADS,
+    thread_name_prefix="async-db"
+)
+
+
+def render_view(view, request, *args, **kwargs):
+    """Выполняет синхронное представление целиком в потоке пула:
+    запросы к БД, сериализацию и рендеринг ответа.
+    """
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_read_view(view):
+    """Асинхронная обертка над представлением DRF.
+    Читающие запросы выполняются в пуле executor и не занимают
+    цикл событий, поэтому один процесс обслуживает много медленных
+    клиентов. Остальные методы идут прежним синхронным путем.
+    """
+    read = sync_to_async(render_view, thread_sensitive=False,
+                         executor=executor)
+    write = sync_to_async(render_view, thread_sensitive=True)
+
+    async def wrapper(request, *args, **kwargs):
+        handler = read if request.method in READ_METHODS else write
+        return await handler(view, request, *args, **kwargs)
+
+    wrapper.csrf_exempt = getattr(view, "csrf_exempt", False)
+    wrapper.cls = view.cls
+    wrapper.actions = view.actions
+    wrapper.initkwargs = view.initkwargs
+    return wrapper
+
+
+def with_async_reads(patterns, viewsets):
+    """Заменяет представления list и retrieve указанных viewset
+    на асинхронные обертки.
+    """
+    for pattern in patterns:
+        view = pattern.callback
+        if (getattr(view, "cls", None) in viewsets
+                and view.actions.get("get") in READ_ACTIONS):
+            pattern.callback = async_read_view(view)
+    return patterns
@@ -0,0 +1,129 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+VERSION_KEY = "api:version:{}"
+RESPONSE_KEY = "api:response:{}"
+HITS_KEY = "api:cache:hits"
+MISSES_KEY = "api:cache:misses"
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def increment(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def get_versions(models):
+    """Текущие версии моделей. Отсутствующая версия заводится
+    от текущего времени, чтобы после вытеснения ключа из кэша
+    старые ответы не стали снова актуальными.
+    """
+    keys = [VERSION_KEY.format(model_label(model)) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(*models):
+    """Инвалидирует все закэшированные ответы, зависящие от моделей."""
+    for model in models:
+        key = VERSION_KEY.format(model_label(model))
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def get_user_version(user):
+    """Время последнего изменения избранного, корзины и подписок
+    пользователя в наносекундах.
+    """
+    key = VERSION_KEY.format(f"user:{user.pk}")
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    cache.set(
+        VERSION_KEY.format(f"user:{user_id}"), time.time_ns(), timeout=None
+    )
+
+
+def get_stats():
+    stats = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {
+        "hits": stats.get(HITS_KEY, 0),
+        "misses": stats.get(MISSES_KEY, 0),
+    }
+
+
+class CachedResponseMixin:
+    """Кэширует ответы list и retrieve для анонимных пользователей.
+    Ключ строится из схемы, хоста и пути (в ответе абсолютные ссылки),
+    параметров запроса и версий моделей из get_cache_models(), поэтому
+    любая запись в них сбрасывает кэш.
+    """
+    cache_models = ()
+    cached_actions = ("list", "retrieve")
+
+    def is_cacheable(self, request):
+        return (
+            request.method == "GET"
+            and request.user.is_anonymous
+            and self.action in self.cached_actions
+        )
+
+    def get_cache_models(self, request):
+        return self.cache_models
+
+    def get_cache_key(self, request):
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        )
+        versions = get_versions(self.get_cache_models(request))
+        raw = (f"{request.build_absolute_uri(request.path)}|{params}|"
+               f"{versions}")
+        return RESPONSE_KEY.format(hashlib.md5(raw.encode()).hexdigest())
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return handler(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            increment(HITS_KEY)
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+        increment(MISSES_KEY)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+        response["X-Cache"] = "MISS"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,76 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import get_user_version, get_versions
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified для list и retrieve.
+    Свежесть проверяется до сериализации, и при совпадении
+    If-None-Match/If-Modified-Since отдается 304.
+    Для списка и для анонимных запросов ETag строится из версий моделей
+    get_cache_models(), из которых собран и ключ кэша ответов, поэтому
+    к базе проверка не обращается. Для одного объекта у авторизованного
+    пользователя читается его updated_at по первичному ключу.
+    Для авторизованных пользователей учитывается время изменения их
+    избранного, корзины и подписок.
+    Используется вместе с CachedResponseMixin.
+    """
+    conditional_actions = ("list", "retrieve")
+
+    def get_freshness_state(self, request):
+        """Время изменения объекта или версии моделей, от которых
+        зависит ответ.
+        """
+        if self.action == "list" or self.is_cacheable(request):
+            return None, get_versions(self.get_cache_models(request))
+        try:
+            last_updated = self.get_queryset().model.objects.filter(
+                pk=self.kwargs[self.lookup_field]
+            ).values_list("updated_at", flat=True).first()
+        except (TypeError, ValueError):
+            last_updated = None
+        return last_updated, None
+
+    def get_freshness(self, request):
+        last_updated, versions = self.get_freshness_state(request)
+        last_modified = last_updated.timestamp() if last_updated else None
+        parts = [request.get_full_path(), last_modified, versions]
+        if request.user.is_authenticated:
+            user_version = get_user_version(request.user)
+            parts += [request.user.pk, user_version]
+            if last_modified is not None:
+                last_modified = max(last_modified, user_version / 10 ** 9)
+        etag = hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()
+        if last_modified is not None:
+            last_modified = int(last_modified)
+        return quote_etag(etag), last_modified
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        if (request.method not in ("GET", "HEAD")
+                or self.action not in self.conditional_actions):
+            return handler(request, *args, **kwargs)
+        etag, last_modified = self.get_freshness(request)
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -1,16 +1,54 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
 from django_filters.rest_framework import FilterSet, filters
+from rest_framework.filters import OrderingFilter
 
 from posts.models import Ingredients, Recipes, Tags
 
+SEARCH_CONFIG = "russian"
+
+
+class TiebreakOrderingFilter(OrderingFilter):
+    """Сортировка по ?ordering, к которой добавляются поля
+    ordering_tiebreak представления в направлении первого поля.
+    Без них строки с равными значениями, например рецепты без
+    избранного, повторяются или пропадают на соседних страницах.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        prefix = "-" if ordering[0].startswith("-") else ""
+        fields = {field.lstrip("-") for field in ordering}
+        return (*ordering, *(
+            f"{prefix}{field}"
+            for field in getattr(view, "ordering_tiebreak", ())
+            if field not in fields
+        ))
+
 
 class IngredientFilter(FilterSet):
-    """Фильтры для ингредиентов."""
-    name = filters.CharFilter(lookup_expr="startswith")
+    """Фильтры для ингредиентов.
+    Поиск по названию без учета регистра: сначала ингредиенты,
+    начинающиеся с запроса, затем содержащие его.
+    """
+    name = filters.CharFilter(method="filter_name")
 
     class Meta:
         model = Ingredients
         fields = ("name",)
 
+    def filter_name(self, queryset, name, value):
+        return queryset.filter(name__icontains=value).annotate(
+            prefix_rank=Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by("prefix_rank", "name")
+
 
 class RecipeFilter(FilterSet):
     """Фильтры для рецептов."""
@@ -24,6 +62,7 @@ class RecipeFilter(FilterSet):
     is_favorited = filters.BooleanFilter(method="filter_is_favorited")
     is_in_shopping_cart = filters.BooleanFilter(
         method="filter_is_in_shopping_cart")
+    search = filters.CharFilter(method="filter_search")
 
     class Meta:
         model = Recipes
@@ -40,3 +79,19 @@ class RecipeFilter(FilterSet):
         if value and not user.is_anonymous:
             return queryset.filter(shopping_recipe__user=user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию и описанию.
+        В Postgres использует GIN-индекс по search_vector и сортирует
+        по релевантности, в остальных СУБД ищет подстроку.
+        """
+        if connection.vendor != "postgresql":
+            return queryset.filter(
+                Q(name__icontains=value) | Q(description__icontains=value)
+            )
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type="websearch"
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F("search_vector"), query)
+        ).order_by("-search_rank", "-pub_date")
@@ -0,0 +1,16 @@
+from django.core.management import BaseCommand
+
+from api.cache import get_stats
+
+
+class Command(BaseCommand):
+    help = "Показывает кол-во попаданий и промахов кэша ответов API."
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        total = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / total * 100 if total else 0
+        self.stdout.write(
+            f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, "
+            f"доля попаданий: {ratio:.1f}%."
+        )
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from foodgram.db.stats import get_stats
+
+
+class Command(BaseCommand):
+    help = "Показывает, как часто запросы переиспользуют соединения с БД."
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        total = stats["opened"] + stats["reused"]
+        ratio = stats["reused"] / total * 100 if total else 0
+        self.stdout.write(
+            f"Режим: {settings.DB_POOL_MODE}. "
+            f"Открыто соединений: {stats['opened']}, "
+            f"переиспользовано: {stats['reused']}, "
+            f"отброшено неисправных: {stats['unusable']}, "
+            f"доля переиспользования: {ratio:.1f}%."
+        )
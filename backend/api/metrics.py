@@ -0,0 +1,318 @@
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+
+from foodgram.db.stats import get_stats as get_db_stats
+
+from .cache import get_stats as get_cache_stats
+from .cache import increment
+
+logger = logging.getLogger(__name__)
+
+# Серии регистрируются по одной: ключ серии занимается через
+# cache.add, после чего ей выдается номер слота в общем списке.
+SERIES_KEY = "metrics:series:{}:{}:{}"
+SERIES_COUNT_KEY = "metrics:series:count"
+SERIES_SLOT_KEY = "metrics:series:slot:{}"
+VALUE_KEY = "metrics:{}:{}:{}:{}"
+FLUSH_INTERVAL = 10
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+HISTOGRAMS = {
+    "request_duration_seconds": TIME_BUCKETS,
+    "db_duration_seconds": TIME_BUCKETS,
+    "serialize_duration_seconds": TIME_BUCKETS,
+    "db_queries": QUERY_BUCKETS,
+}
+# Суммы времени хранятся в микросекундах: incr работает с целыми.
+SUM_SCALE = {
+    "request_duration_seconds": 10 ** 6,
+    "db_duration_seconds": 10 ** 6,
+    "serialize_duration_seconds": 10 ** 6,
+    "db_queries": 1,
+}
+
+current_metrics = contextvars.ContextVar("current_metrics", default=None)
+
+
+class RequestMetrics:
+    """Метрики одного запроса."""
+    __slots__ = ("started", "queries", "db_time",
+                 "handler_started", "handler_db_time")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.handler_started = None
+        self.handler_db_time = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    """Обертка cursor.execute, учитывает запрос в метриках запроса."""
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Aggregator:
+    """Гистограммы по представлениям внутри процесса.
+    Раз в FLUSH_INTERVAL секунд приращения переносятся в кэш,
+    где их складывают все воркеры.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = defaultdict(int)
+        self.series = set()
+        self.registered = set()
+        self.flushed_at = time.monotonic()
+
+    def observe(self, metric, labels, value):
+        buckets = HISTOGRAMS[metric]
+        series = (metric, *labels)
+        with self.lock:
+            self.series.add(series)
+            for bound in buckets:
+                if value <= bound:
+                    self.values[(*series, str(bound))] += 1
+            self.values[(*series, "+Inf")] += 1
+            self.values[(*series, "sum")] += round(
+                value * SUM_SCALE[metric]
+            )
+
+    def inc(self, metric, labels):
+        series = (metric, *labels)
+        with self.lock:
+            self.series.add(series)
+            self.values[(*series, "total")] += 1
+
+    def maybe_flush(self):
+        with self.lock:
+            if time.monotonic() - self.flushed_at < FLUSH_INTERVAL:
+                return
+            values = dict(self.values)
+            new_series = self.series - self.registered
+            self.values.clear()
+            self.registered |= new_series
+            self.flushed_at = time.monotonic()
+        for series in new_series:
+            register_series(series)
+        for key, value in values.items():
+            key = VALUE_KEY.format(*key)
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                cache.add(key, 0, timeout=None)
+                cache.incr(key, value)
+
+
+def register_series(series):
+    """Добавляет серию в общий список. Каждая серия занимает свой
+    ключ, поэтому воркеры, регистрирующие серии одновременно, не
+    перезаписывают списки друг друга.
+    """
+    if cache.add(SERIES_KEY.format(*series), True, timeout=None):
+        slot = increment(SERIES_COUNT_KEY)
+        cache.set(SERIES_SLOT_KEY.format(slot), series, timeout=None)
+
+
+def get_series():
+    count = cache.get(SERIES_COUNT_KEY, 0)
+    slots = cache.get_many([
+        SERIES_SLOT_KEY.format(slot) for slot in range(1, count + 1)
+    ])
+    return sorted({tuple(series) for series in slots.values()})
+
+
+aggregator = Aggregator()
+
+
+def get_view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "unresolved"
+
+
+def get_query_budget(request):
+    match = getattr(request, "resolver_match", None)
+    view_class = getattr(match.func, "cls", None) if match else None
+    budget = getattr(view_class, "query_budget", None)
+    return settings.QUERY_BUDGET if budget is None else budget
+
+
+def finish(request, response, metrics):
+    total = time.perf_counter() - metrics.started
+    serialize = 0.0
+    if metrics.handler_started is not None:
+        serialize = max(
+            time.perf_counter() - metrics.handler_started
+            - (metrics.db_time - metrics.handler_db_time),
+            0.0
+        )
+    view = get_view_name(request)
+    labels = (view, request.method)
+    response["Server-Timing"] = (
+        f'db;dur={metrics.db_time * 1000:.1f};'
+        f'desc="{metrics.queries} queries", '
+        f"serialize;dur={serialize * 1000:.1f}, "
+        f"total;dur={total * 1000:.1f}"
+    )
+    aggregator.observe("request_duration_seconds", labels, total)
+    aggregator.observe("db_duration_seconds", labels, metrics.db_time)
+    aggregator.observe("serialize_duration_seconds", labels, serialize)
+    aggregator.observe("db_queries", labels, metrics.queries)
+    record = {
+        "view": view,
+        "method": request.method,
+        "status": response.status_code,
+        "queries": metrics.queries,
+        "db_ms": round(metrics.db_time * 1000, 1),
+        "serialize_ms": round(serialize * 1000, 1),
+        "total_ms": round(total * 1000, 1),
+    }
+    budget = get_query_budget(request)
+    if metrics.queries > budget:
+        aggregator.inc("query_budget_exceeded", labels)
+        record["query_budget"] = budget
+        logger.warning(json.dumps(record))
+    else:
+        logger.info(json.dumps(record))
+    aggregator.maybe_flush()
+    return response
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Считает запросы к БД и время обработки каждого запроса.
+    Результат отдается в заголовке Server-Timing, пишется в лог
+    и копится в гистограммах для /metrics.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not settings.METRICS_ENABLED:
+                return await get_response(request)
+            metrics = RequestMetrics()
+            token = current_metrics.set(metrics)
+            try:
+                response = await get_response(request)
+            finally:
+                current_metrics.reset(token)
+            return finish(request, response, metrics)
+    else:
+        def middleware(request):
+            if not settings.METRICS_ENABLED:
+                return get_response(request)
+            metrics = RequestMetrics()
+            token = current_metrics.set(metrics)
+            try:
+                response = get_response(request)
+            finally:
+                current_metrics.reset(token)
+            return finish(request, response, metrics)
+    return middleware
+
+
+class MetricsMixin:
+    """Отмечает начало работы обработчика DRF. Время сериализации
+    считается от этой отметки до конца рендеринга ответа без учета
+    запросов к БД. query_budget задает свой бюджет запросов.
+    """
+    query_budget = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.handler_started = time.perf_counter()
+            metrics.handler_db_time = metrics.db_time
+
+
+def format_labels(**labels):
+    return ",".join(
+        f'{name}="{value}"' for name, value in labels.items()
+    )
+
+
+def get_suffixes(metric):
+    if metric in HISTOGRAMS:
+        return [*map(str, HISTOGRAMS[metric]), "+Inf", "sum"]
+    return ["total"]
+
+
+def render_series(metric, view, method, values):
+    name = f"foodgram_{metric}"
+    labels = format_labels(view=view, method=method)
+
+    def value(suffix):
+        return values.get(VALUE_KEY.format(metric, view, method, suffix), 0)
+
+    if metric not in HISTOGRAMS:
+        return [f"{name}_total{{{labels}}} {value('total')}"]
+    lines = [
+        f"{name}_bucket{{{labels},{format_labels(le=bound)}}} "
+        f"{value(bound)}"
+        for bound in [*map(str, HISTOGRAMS[metric]), "+Inf"]
+    ]
+    lines.append(f"{name}_sum{{{labels}}} "
+                 f"{value('sum') / SUM_SCALE[metric]}")
+    lines.append(f"{name}_count{{{labels}}} {value('+Inf')}")
+    return lines
+
+
+def render_metrics():
+    """Гистограммы и счетчики в текстовом формате Prometheus."""
+    series = get_series()
+    values = cache.get_many([
+        VALUE_KEY.format(metric, view, method, suffix)
+        for metric, view, method in series
+        for suffix in get_suffixes(metric)
+    ])
+    lines = []
+    for metric in [*HISTOGRAMS, "query_budget_exceeded"]:
+        if metric in HISTOGRAMS:
+            lines.append(f"# TYPE foodgram_{metric} histogram")
+        else:
+            lines.append(f"# TYPE foodgram_{metric}_total counter")
+        for series_metric, view, method in series:
+            if series_metric == metric:
+                lines += render_series(metric, view, method, values)
+    lines.append("# TYPE foodgram_db_connections_total counter")
+    for state, count in get_db_stats().items():
+        lines.append(
+            f"foodgram_db_connections_total{{{format_labels(state=state)}}} "
+            f"{count}"
+        )
+    lines.append("# TYPE foodgram_api_cache_total counter")
+    for result, count in get_cache_stats().items():
+        lines.append(
+            f"foodgram_api_cache_total{{{format_labels(result=result)}}} "
+            f"{count}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4"
+    )
@@ -1,6 +1,7 @@
 from django.conf import settings
 
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class CustomPagination(PageNumberPagination):
@@ -8,3 +9,89 @@ class CustomPagination(PageNumberPagination):
     """
     page_size_query_param = "limit"
     page_size = getattr(settings, "PAGE_SIZE")
+
+
+class RecipesCursorPagination(CursorPagination):
+    """Курсорная пагинация рецептов: без COUNT(*) и OFFSET,
+    глубокие страницы стоят столько же, сколько первая.
+    """
+    page_size_query_param = "limit"
+    page_size = int(getattr(settings, "PAGE_SIZE"))
+    ordering = ("-pub_date", "-id")
+    # Позиция курсора хранит значение только первого поля порядка, а
+    # строки с равным значением пропускаются через OFFSET. Поэтому
+    # первым может быть только поле с почти уникальными значениями.
+    cursor_fields = ("pub_date", "id", "search_rank")
+
+    def get_ordering(self, request, queryset, view):
+        """Порядок из ?ordering, при поиске - по релевантности, иначе
+        свой. В конец всегда добавляется id: без уникального поля
+        порядок страниц не определен.
+        """
+        ordering = None
+        for backend in getattr(view, "filter_backends", ()):
+            if hasattr(backend, "get_ordering"):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    break
+        if ordering:
+            if ordering[0].lstrip("-") not in self.cursor_fields:
+                raise ValidationError({"ordering": [
+                    f"С курсорной пагинацией нельзя сортировать по "
+                    f"{ordering[0].lstrip('-')}."
+                ]})
+        elif "search_rank" in queryset.query.annotations:
+            ordering = ("-search_rank",)
+        else:
+            ordering = self.ordering
+        ordering = tuple(ordering)
+        if not {"id", "-id", "pk", "-pk"} & set(ordering):
+            ordering += ("-id",)
+        return ordering
+
+
+class FixedCursorPagination(CursorPagination):
+    """Курсорная пагинация с собственным порядком: ?ordering
+    рецептов к ней не относится.
+    """
+    page_size_query_param = "limit"
+    page_size = int(getattr(settings, "PAGE_SIZE"))
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+
+class FeedCursorPagination(FixedCursorPagination):
+    """Курсорная пагинация ленты подписок по индексу
+    (user, -pub_date, -recipe): страница стоит одинаково при любом
+    кол-ве подписок и глубине ленты.
+    """
+    ordering = ("-pub_date", "-recipe_id")
+
+
+class RankingCursorPagination(FixedCursorPagination):
+    """Курсорная пагинация рейтинга в порядке индексов RecipeRank."""
+    ordering = ("-score", "-recipe_id")
+
+
+class UsersCursorPagination(RecipesCursorPagination):
+    """Курсорная пагинация пользователей и подписок."""
+    ordering = ("username",)
+
+
+class CursorPaginationMixin:
+    """Включает курсорную пагинацию по запросу клиента.
+    Первая страница запрашивается с ?pagination=cursor, следующие
+    по ссылкам next/previous, содержащим параметр cursor.
+    Без этих параметров остается постраничный ответ с count.
+    """
+    cursor_pagination_class = RecipesCursorPagination
+
+    @property
+    def paginator(self):
+        params = self.request.query_params
+        if not hasattr(self, "_paginator") and (
+            "cursor" in params or params.get("pagination") == "cursor"
+        ):
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
@@ -0,0 +1,237 @@
+import heapq
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Max
+
+from posts.models import AmountOfIngridient, Ingredients, Recipes
+
+
+class IngredientTrie:
+    """Префиксное дерево названий ингредиентов для автодополнения.
+    В каждом узле хранится не более limit первых по алфавиту
+    ингредиентов, поэтому поиск по префиксу не зависит от размера
+    справочника. Совпадения по подстроке ищутся перебором кэша.
+    """
+
+    def __init__(self, limit=20, ttl=300):
+        self.limit = limit
+        self.ttl = ttl
+        self.root = None
+        self.entries = []
+        self.built_at = 0
+        self.lock = threading.Lock()
+
+    def reset(self):
+        self.root = None
+
+    def build(self):
+        root = {"items": [], "children": {}}
+        entries = []
+        ingredients = Ingredients.objects.order_by("name").values(
+            "id", "name", "measurement_unit"
+        )
+        for ingredient in ingredients.iterator():
+            key = ingredient["name"].casefold()
+            entries.append((key, ingredient))
+            node = root
+            for char in key:
+                node = node["children"].setdefault(
+                    char, {"items": [], "children": {}}
+                )
+                if len(node["items"]) < self.limit:
+                    node["items"].append(ingredient)
+        self.entries = entries
+        self.root = root
+        self.built_at = time.monotonic()
+        return root
+
+    def ensure_built(self):
+        """Возвращает корень дерева. reset() из другого потока может
+        обнулить self.root в любой момент, поэтому корень читается
+        один раз.
+        """
+        root = self.root
+        if root is not None and time.monotonic() - self.built_at < self.ttl:
+            return root
+        with self.lock:
+            root = self.root
+            if root is None or time.monotonic() - self.built_at >= self.ttl:
+                root = self.build()
+            return root
+
+    def search(self, query, limit=None):
+        """Сначала совпадения по началу названия, затем по подстроке."""
+        limit = min(limit or self.limit, self.limit)
+        node = self.ensure_built()
+        query = query.casefold()
+        for char in query:
+            node = node["children"].get(char)
+            if node is None:
+                break
+        result = list(node["items"][:limit]) if node else []
+        if len(result) < limit:
+            for key, ingredient in self.entries:
+                if query in key and not key.startswith(query):
+                    result.append(ingredient)
+                    if len(result) == limit:
+                        break
+        return result
+
+
+class RecipeIngredientIndex:
+    """Обратный индекс ингредиент -> id рецептов для подбора рецептов
+    по имеющимся продуктам. Списки id хранятся в array, рядом -
+    ингредиенты каждого рецепта, чтобы знать, сколько их нужно.
+
+    Изменение ингредиентов обновляет updated_at рецепта, поэтому не
+    чаще раза в refresh_interval секунд индекс перечитывает только
+    рецепты, измененные с прошлой проверки. Удаленный рецепт сразу
+    убирается из индекса своего процесса, в остальных - при полной
+    пересборке раз в ttl секунд, а до тех пор пропускается при
+    загрузке результата.
+    Списки не меняются на месте, а заменяются новыми: поиск в другом
+    потоке дочитывает прежний список без блокировки.
+    """
+    # Запас на транзакции, которые записали updated_at раньше
+    # прошлой проверки, а зафиксировались позже нее.
+    margin = timedelta(seconds=60)
+
+    def __init__(self, ttl=3600, refresh_interval=5):
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.postings = None
+        self.recipes = None
+        self.watermark = None
+        self.built_at = 0
+        self.checked_at = 0
+        self.lock = threading.Lock()
+
+    def reset(self):
+        self.postings = None
+
+    def build(self):
+        watermark = Recipes.objects.aggregate(
+            last=Max("updated_at")
+        )["last"]
+        postings = defaultdict(lambda: array("I"))
+        recipes = defaultdict(list)
+        rows = AmountOfIngridient.objects.order_by().values_list(
+            "recipe_id", "ingredient_id"
+        )
+        for recipe, ingredient in rows.iterator(chunk_size=10000):
+            postings[ingredient].append(recipe)
+            recipes[recipe].append(ingredient)
+        self.recipes = {
+            recipe: tuple(ingredients)
+            for recipe, ingredients in recipes.items()
+        }
+        self.postings = dict(postings)
+        self.watermark = watermark
+        self.built_at = self.checked_at = time.monotonic()
+
+    def update(self, recipes):
+        """Переиндексирует рецепты по текущим данным."""
+        current = defaultdict(list)
+        for recipe, ingredient in AmountOfIngridient.objects.filter(
+            recipe_id__in=recipes
+        ).values_list("recipe_id", "ingredient_id"):
+            current[recipe].append(ingredient)
+        for recipe in recipes:
+            self.replace(recipe, current.get(recipe, ()))
+
+    def replace(self, recipe, ingredients):
+        old = set(self.recipes.get(recipe, ()))
+        new = set(ingredients)
+        for ingredient in old - new:
+            self.postings[ingredient] = array("I", (
+                pk for pk in self.postings[ingredient] if pk != recipe
+            ))
+        for ingredient in new - old:
+            self.postings[ingredient] = self.postings.get(
+                ingredient, array("I")
+            ) + array("I", [recipe])
+        if new:
+            self.recipes[recipe] = tuple(new)
+        else:
+            self.recipes.pop(recipe, None)
+
+    def discard(self, recipe):
+        """Убирает удаленный рецепт из индекса этого процесса."""
+        with self.lock:
+            if self.postings is not None:
+                self.replace(recipe, ())
+
+    def refresh(self):
+        changed = Recipes.objects.order_by().values_list("pk", "updated_at")
+        if self.watermark is not None:
+            changed = changed.filter(
+                updated_at__gte=self.watermark - self.margin
+            )
+        changed = dict(changed)
+        if changed:
+            self.update(list(changed))
+            self.watermark = max(self.watermark or max(changed.values()),
+                                 *changed.values())
+        self.checked_at = time.monotonic()
+
+    def ensure_fresh(self):
+        now = time.monotonic()
+        if (self.postings is not None and now - self.built_at < self.ttl
+                and now - self.checked_at < self.refresh_interval):
+            return
+        with self.lock:
+            now = time.monotonic()
+            if self.postings is None or now - self.built_at >= self.ttl:
+                self.build()
+            elif now - self.checked_at >= self.refresh_interval:
+                self.refresh()
+
+    def match(self, ingredients, limit):
+        """Рецепты, отсортированные по доле нужных ингредиентов, которые
+        есть в ingredients, затем по кол-ву совпавших и по новизне.
+        Возвращает кол-во рецептов хотя бы с одним совпадением и
+        список (id рецепта, совпало, нужно) длиной не больше limit.
+        """
+        self.ensure_fresh()
+        postings = self.postings
+        recipes = self.recipes
+        hits = Counter()
+        for ingredient in set(ingredients):
+            hits.update(postings.get(ingredient, ()))
+        top = heapq.nlargest(limit, (
+            (matched / len(recipes.get(recipe, (0,))), matched, recipe)
+            for recipe, matched in hits.items()
+        ))
+        return len(hits), [
+            (recipe, matched, len(recipes.get(recipe, (0,))))
+            for _, matched, recipe in top
+        ]
+
+
+ingredient_index = IngredientTrie(
+    limit=settings.INGREDIENTS_SEARCH_LIMIT,
+    ttl=settings.INGREDIENTS_TRIE_TTL
+)
+
+
+def warm_up_index():
+    """Строит дерево при старте процесса, если оно включено."""
+    if not settings.INGREDIENTS_TRIE:
+        return
+    try:
+        ingredient_index.build()
+    except DatabaseError:
+        # Дерево будет построено при первом запросе.
+        pass
+
+
+recipe_index = RecipeIngredientIndex(
+    ttl=settings.RECIPE_INDEX_TTL,
+    refresh_interval=settings.RECIPE_INDEX_REFRESH
+)
@@ -1,15 +1,17 @@
-import base64
-
 import webcolors
-from django.core.files.base import ContentFile
-from django.db.models import F
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
+from posts.changes import batch_changes
 from posts.models import (AmountOfIngridient, Favorite, Ingredients, Recipes,
                           ShoppingList, Subscribe, Tags)
 from users.models import User
+from .uploads import decode_base64_image
 from .validators import ValidationTagIngredient
 
 
@@ -26,6 +28,8 @@ class CreateUserSerializer(UserCreateSerializer):
         extra_kwargs = {"password": {"write_only": True}}
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         current_user = self.context["request"].user
         if current_user.is_anonymous:
             return False
@@ -60,6 +64,8 @@ class CustomUserSerializer(UserSerializer):
         return data
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         current_user = self.context["request"].user
         if current_user.is_anonymous:
             return False
@@ -85,12 +91,34 @@ class Hex2NameColor(serializers.Field):
 class Base64ImageField(serializers.ImageField):
     """Кодировка изображений."""
     def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(";base64,")
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+        if isinstance(data, str) and data.startswith("data:"):
+            data = decode_base64_image(data)
+
+        file = super().to_internal_value(data)
+        width, height = file.image.size
+        if max(width, height) > settings.IMAGE_MAX_DIMENSION:
+            raise serializers.ValidationError(
+                "Изображение не должно быть больше "
+                f"{settings.IMAGE_MAX_DIMENSION} пикселей по стороне."
+            )
+        return file
 
-        return super().to_internal_value(data)
+
+class ThumbnailsField(serializers.Field):
+    """Ссылки на миниатюры изображения рецепта по размерам."""
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        thumbnails = {}
+        for size, name in value.items():
+            url = default_storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            thumbnails[size] = url
+        return thumbnails
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -111,10 +139,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 class AmountOfIngridientSerializer(serializers.ModelSerializer):
     """Сериализатор ингредиентов и их количества в рецетах."""
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredients.objects.all(),
-        source="ingredient.id"
-    )
+    id = serializers.IntegerField(source="ingredient.id")
     name = serializers.ReadOnlyField(
         source="ingredient.name"
     )
@@ -133,7 +158,8 @@ class RecipesListSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     text = serializers.CharField(source="description")
     image = Base64ImageField()
-    author = CustomUserSerializer(read_only=True)
+    thumbnails = ThumbnailsField()
+    author = serializers.SerializerMethodField()
     tags = TagSerializer(read_only=True, many=True)
     ingredients = serializers.SerializerMethodField()
 
@@ -141,18 +167,28 @@ class RecipesListSerializer(serializers.ModelSerializer):
         model = Recipes
         fields = ("id", "tags", "author", "ingredients",
                   "is_favorited", "is_in_shopping_cart",
-                  "name", "image", "text", "cooking_time")
+                  "name", "image", "thumbnails", "text", "cooking_time")
+
+    def get_author(self, recipe: Recipes):
+        author = recipe.author
+        if hasattr(recipe, "author_is_subscribed"):
+            author.is_subscribed = recipe.author_is_subscribed
+        return CustomUserSerializer(author, context=self.context).data
 
     def get_ingredients(self, recipe: Recipes):
-        ingredients = recipe.ingredients.values(
-            "id",
-            "name",
-            "measurement_unit",
-            amount=F("ingredient__amount")
-        )
-        return ingredients
+        return [
+            {
+                "id": item.ingredient.id,
+                "name": item.ingredient.name,
+                "measurement_unit": item.ingredient.measurement_unit,
+                "amount": item.amount,
+            }
+            for item in recipe.ingredient_in_recipe.all()
+        ]
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         current_user = self.context["request"].user
         if current_user.is_anonymous:
             return False
@@ -161,6 +197,8 @@ class RecipesListSerializer(serializers.ModelSerializer):
             recipe=obj.id).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         current_user = self.context["request"].user
         if current_user.is_anonymous:
             return False
@@ -169,6 +207,30 @@ class RecipesListSerializer(serializers.ModelSerializer):
             recipe=obj).exists()
 
 
+class RecipeMatchSerializer(RecipesListSerializer):
+    """Рецепт из подбора по ингредиентам: сколько нужных ингредиентов
+    уже есть и сколько всего требуется.
+    """
+    matched = serializers.SerializerMethodField()
+    required = serializers.SerializerMethodField()
+    coverage = serializers.SerializerMethodField()
+
+    class Meta(RecipesListSerializer.Meta):
+        fields = RecipesListSerializer.Meta.fields + (
+            "matched", "required", "coverage"
+        )
+
+    def get_matched(self, recipe: Recipes):
+        return self.context["matches"][recipe.pk][0]
+
+    def get_required(self, recipe: Recipes):
+        return self.context["matches"][recipe.pk][1]
+
+    def get_coverage(self, recipe: Recipes):
+        matched, required = self.context["matches"][recipe.pk]
+        return round(matched / required, 4)
+
+
 class RecipesPostSerializer(serializers.ModelSerializer):
     """Сериалайзер для обновления, создания рецептов."""
     ingredients = AmountOfIngridientSerializer(many=True,
@@ -177,8 +239,7 @@ class RecipesPostSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     image = Base64ImageField(required=True, allow_null=True)
     author = CustomUserSerializer(read_only=True)
-    tags = serializers.SlugRelatedField(many=True, slug_field="id",
-                                        queryset=Tags.objects.all())
+    tags = serializers.ListField(child=serializers.IntegerField())
     text = serializers.CharField(source="description")
 
     class Meta:
@@ -191,10 +252,19 @@ class RecipesPostSerializer(serializers.ModelSerializer):
         ingredients = data.get("ingredient_in_recipe")
         cooking_time = data.get("cooking_time")
         tags = data.get("tags")
-        tags = ValidationTagIngredient.tag_validator(tags)
-        ingredients = ValidationTagIngredient.ingredient_validator(
-            ingredients
-        )
+        errors = {}
+        try:
+            tags = ValidationTagIngredient.tag_validator(tags)
+        except DjangoValidationError as error:
+            errors.update(error.message_dict)
+        try:
+            ingredients = ValidationTagIngredient.ingredient_validator(
+                ingredients
+            )
+        except DjangoValidationError as error:
+            errors.update(error.message_dict)
+        if errors:
+            raise serializers.ValidationError(errors)
         if not cooking_time:
             raise serializers.ValidationError(
                 {"error": "Вы забыли указать время приготовления блюда."}
@@ -204,6 +274,7 @@ class RecipesPostSerializer(serializers.ModelSerializer):
                 {"error": "Время приготовления должно быть не менее 1 мин."}
             )
         data["ingredient_in_recipe"] = ingredients
+        data["tags"] = tags
         return data
 
     def get_is_favorited(self, obj):
@@ -224,22 +295,56 @@ class RecipesPostSerializer(serializers.ModelSerializer):
 
     @staticmethod
     def save_ingredients(recipe, ingredients):
-        for ingredient in ingredients:
-            AmountOfIngridient.objects.create(
+        AmountOfIngridient.objects.bulk_create([
+            AmountOfIngridient(
                 recipe=recipe,
                 ingredient=ingredient.get("ingredient").get("id"),
                 amount=ingredient.get("amount")
             )
+            for ingredient in ingredients
+        ])
 
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        """Меняет в рецепте только те ингредиенты, которые изменились."""
+        amounts = {
+            ingredient.get("ingredient").get("id").id: ingredient
+            for ingredient in ingredients
+        }
+        current = {
+            item.ingredient_id: item
+            for item in recipe.ingredient_in_recipe.all()
+        }
+        removed = current.keys() - amounts.keys()
+        if removed:
+            AmountOfIngridient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, item in current.items():
+            if ingredient_id not in amounts:
+                continue
+            amount = amounts[ingredient_id].get("amount")
+            if item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            AmountOfIngridient.objects.bulk_update(changed, ["amount"])
+        added = [amounts[ingredient_id]
+                 for ingredient_id in amounts.keys() - current.keys()]
+        if added:
+            RecipesPostSerializer.save_ingredients(recipe, added)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop("ingredient_in_recipe")
         tags = validated_data.pop("tags")
         recipe = Recipes.objects.create(**validated_data)
-        for tag in tags:
-            recipe.tags.add(tag)
+        recipe.tags.set(tags)
         self.save_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         instance.name = validated_data.get("name", instance.name)
         instance.image = validated_data.get("image", instance.image)
@@ -250,26 +355,43 @@ class RecipesPostSerializer(serializers.ModelSerializer):
         instance.cooking_time = validated_data.get(
             "cooking_time", instance.cooking_time
         )
-        ingredients = validated_data.pop("ingredient_in_recipe")
-        if "tags" in validated_data:
-            tags = validated_data.pop("tags")
-            instance.tags.clear()
-            instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.save_ingredients(instance, ingredients)
         instance.save()
+        if "tags" in validated_data:
+            instance.tags.set(validated_data.pop("tags"))
+        if "ingredient_in_recipe" in validated_data:
+            with batch_changes():
+                self.update_ingredients(
+                    instance, validated_data.pop("ingredient_in_recipe")
+                )
         return instance
 
+    def save(self, **kwargs):
+        """Закрывает декодированный файл изображения: временный
+        файл на диске удаляется, даже если сохранение не удалось.
+        """
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get("image")
+            if image is not None:
+                image.close()
+
     def to_representation(self, instance):
+        request = self.context.get("request")
+        instance = Recipes.objects.with_user_annotations(
+            request.user
+        ).get(pk=instance.pk)
         return RecipesListSerializer(instance, context={
-            "request": self.context.get("request")}).data
+            "request": request}).data
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Промежуточный сериализатор с рецептами для корзины и избранного."""
+    thumbnails = ThumbnailsField()
+
     class Meta:
         model = Recipes
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "thumbnails", "cooking_time")
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
@@ -286,18 +408,25 @@ class SubscribeSerializer(serializers.ModelSerializer):
         model = User
 
     def get_recipes(self, obj):
-        request = self.context.get("request")
-        limit = request.GET.get("recipes_limit")
-        recipes = obj.recipes.all()
-        if limit:
-            recipes = recipes[:int(limit)]
+        if hasattr(obj, "recipes_preview"):
+            recipes = obj.recipes_preview
+        else:
+            request = self.context.get("request")
+            limit = request.GET.get("recipes_limit")
+            recipes = obj.recipes.all()
+            if limit:
+                recipes = recipes[:int(limit)]
         serializer = ShortRecipeSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, "recipes_count"):
+            return obj.recipes_count
         return obj.recipes.count()
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         current_user = self.context["request"].user
         if current_user.is_anonymous:
             return False
@@ -305,3 +434,53 @@ class SubscribeSerializer(serializers.ModelSerializer):
             user=current_user, author=obj.id
         ).exists():
             return True
+
+
+class RelationsBatchSerializer(serializers.Serializer):
+    """Пакетное изменение избранного, корзины или подписок:
+    id для добавления и для удаления.
+    """
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=settings.RELATIONS_BATCH_LIMIT,
+        default=list
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=settings.RELATIONS_BATCH_LIMIT,
+        default=list
+    )
+
+    def validate(self, data):
+        if not data["add"] and not data["remove"]:
+            raise serializers.ValidationError("Передайте add или remove.")
+        if set(data["add"]) & set(data["remove"]):
+            raise serializers.ValidationError(
+                "Один id не может быть одновременно в add и remove."
+            )
+        return data
+
+
+class MatchQuerySerializer(serializers.Serializer):
+    """Параметры подбора рецептов: id имеющихся ингредиентов
+    и кол-во рецептов в ответе.
+    """
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=settings.RECIPE_MATCH_INGREDIENTS
+    )
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.RECIPE_MATCH_LIMIT,
+        default=int(settings.PAGE_SIZE)
+    )
+
+
+class SimilarQuerySerializer(serializers.Serializer):
+    """Кол-во похожих рецептов в ответе."""
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.SIMILAR_RECIPES_COUNT,
+        default=settings.SIMILAR_RECIPES_COUNT
+    )
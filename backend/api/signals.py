@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from posts.changes import recipes_updated, relations_changed
+from posts.models import (AmountOfIngridient, Favorite, Ingredients, Recipes,
+                          ShoppingList, Subscribe, Tags)
+from users.models import User
+
+from .cache import bump_user_version, bump_version
+from .metrics import install_query_recorder
+from .search import ingredient_index, recipe_index
+
+CACHED_MODELS = (Recipes, AmountOfIngridient, Ingredients, Tags, User)
+
+
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+def reset_ingredient_index(**kwargs):
+    """Сбрасывает дерево автодополнения при изменении справочника."""
+    ingredient_index.reset()
+
+
+@receiver(post_delete, sender=Recipes)
+def discard_recipe_from_index(instance, **kwargs):
+    """Убирает удаленный рецепт из индекса подбора по ингредиентам.
+    pk читается сразу: к фиксации delete() уже обнулит его у экземпляра.
+    """
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: recipe_index.discard(recipe_id))
+
+
+def invalidate_cache(sender, **kwargs):
+    """Сбрасывает кэш ответов после фиксации транзакции, чтобы
+    закэшированный ответ не собрался из незавершенной записи.
+    """
+    update_fields = kwargs.get("update_fields")
+    if sender is User and update_fields == frozenset({"last_login"}):
+        return
+    transaction.on_commit(lambda: bump_version(sender))
+
+
+for model in CACHED_MODELS:
+    post_save.connect(invalidate_cache, sender=model)
+    post_delete.connect(invalidate_cache, sender=model)
+
+
+@receiver(m2m_changed, sender=Recipes.tags.through)
+def invalidate_recipe_tags(**kwargs):
+    transaction.on_commit(lambda: bump_version(Recipes))
+
+
+@receiver(recipes_updated)
+def invalidate_updated_recipes(**kwargs):
+    transaction.on_commit(lambda: bump_version(Recipes))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_save, sender=Subscribe)
+@receiver(post_delete, sender=Subscribe)
+def invalidate_user_state(instance, **kwargs):
+    """Избранное, корзина и подписки меняют ответы только для
+    самого пользователя, поэтому у него своя версия.
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_user_version(user_id))
+    if isinstance(instance, Favorite):
+        transaction.on_commit(lambda: bump_version(Favorite))
+
+
+@receiver(relations_changed)
+def invalidate_user_relations(sender, user_id, **kwargs):
+    transaction.on_commit(lambda: bump_user_version(user_id))
+    if sender is Favorite:
+        # Изменился favorites_count рецептов.
+        transaction.on_commit(lambda: bump_version(Favorite))
+
+
+connection_created.connect(install_query_recorder)
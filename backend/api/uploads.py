@@ -0,0 +1,139 @@
+import base64
+import binascii
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile)
+from rest_framework import serializers
+
+# Кол-во символов base64 за один шаг, кратно 4.
+CHUNK_SIZE = 64 * 1024
+HEADER_MAX_LENGTH = 100
+
+SIGNATURES = {
+    "image/jpeg": lambda head: head.startswith(b"\xff\xd8\xff"),
+    "image/png": lambda head: head.startswith(b"\x89PNG\r\n\x1a\n"),
+    "image/gif": lambda head: head[:6] in (b"GIF87a", b"GIF89a"),
+    "image/webp": lambda head: head[:4] == b"RIFF" and head[8:12] == b"WEBP",
+}
+# Нестандартные типы, которые присылают клиенты.
+MIME_ALIASES = {"image/jpg": "image/jpeg", "image/pjpeg": "image/jpeg"}
+# Переносы строк и пробелы, которыми разбивают длинный base64.
+WHITESPACE = " \t\r\n"
+STRIP_WHITESPACE = str.maketrans("", "", WHITESPACE)
+EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+
+
+def parse_data_uri(data):
+    """Возвращает MIME тип и начало base64 данных в строке data URI.
+    Заголовок ищется только в первых HEADER_MAX_LENGTH символах,
+    сама строка не копируется.
+    """
+    index = data.find(";base64,", 0, HEADER_MAX_LENGTH)
+    if not data.startswith("data:") or index == -1:
+        raise serializers.ValidationError(
+            "Изображение должно быть передано в виде data URI base64."
+        )
+    mime_type = data[5:index].split(";")[0].strip().lower()
+    return MIME_ALIASES.get(mime_type, mime_type), index + len(";base64,")
+
+
+def payload_length(data, start):
+    """Кол-во символов base64 без пробелов и переносов строк."""
+    return len(data) - start - sum(
+        data.count(char, start) for char in WHITESPACE
+    )
+
+
+def decoded_size(data, start, length):
+    end = len(data)
+    while end > start and data[end - 1] in WHITESPACE:
+        end -= 1
+    return length // 4 * 3 - data.count("=", max(start, end - 2), end)
+
+
+def iter_chunks(data, start):
+    """Части base64 без пробелов и переносов строк, длина каждой
+    кратна 4. Остаток части переносится в следующую.
+    """
+    rest = ""
+    for offset in range(start, len(data), CHUNK_SIZE):
+        chunk = rest + data[offset:offset + CHUNK_SIZE].translate(
+            STRIP_WHITESPACE
+        )
+        cut = len(chunk) - len(chunk) % 4
+        rest = chunk[cut:]
+        if cut:
+            yield chunk[:cut]
+    if rest:
+        yield rest
+
+
+def detect_type(head):
+    for mime_type, matches in SIGNATURES.items():
+        if matches(head):
+            return mime_type
+    return None
+
+
+def make_upload_file(mime_type, size):
+    """Файл для декодированных данных. Как и при обычной загрузке,
+    небольшие файлы остаются в памяти, а крупнее
+    FILE_UPLOAD_MAX_MEMORY_SIZE пишутся во временный файл на диске.
+    """
+    name = f"temp.{EXTENSIONS[mime_type]}"
+    if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+        return TemporaryUploadedFile(name, mime_type, size, None)
+    return InMemoryUploadedFile(
+        BytesIO(), None, name, mime_type, size, None
+    )
+
+
+def decode_base64_image(data):
+    """Декодирует изображение из data URI по частям.
+    Размер и тип проверяются до декодирования и до того,
+    как файл откроет Pillow. Пробелы и переносы строк в base64
+    пропускаются.
+    """
+    mime_type, start = parse_data_uri(data)
+    allowed_types = settings.IMAGE_ALLOWED_TYPES
+    if mime_type not in allowed_types or mime_type not in SIGNATURES:
+        raise serializers.ValidationError(
+            f"Недопустимый тип изображения {mime_type}. "
+            f"Разрешены: {', '.join(allowed_types)}."
+        )
+    length = payload_length(data, start)
+    if not length or length % 4:
+        raise serializers.ValidationError(
+            "Некорректные данные base64."
+        )
+    size = decoded_size(data, start, length)
+    if size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        raise serializers.ValidationError(
+            "Размер изображения не должен превышать "
+            f"{settings.IMAGE_UPLOAD_MAX_SIZE} байт."
+        )
+    upload = make_upload_file(mime_type, size)
+    try:
+        for number, chunk in enumerate(iter_chunks(data, start)):
+            chunk = base64.b64decode(chunk, validate=True)
+            if not number and detect_type(chunk) != mime_type:
+                raise serializers.ValidationError(
+                    f"Содержимое файла не соответствует типу {mime_type}."
+                )
+            upload.write(chunk)
+    except binascii.Error:
+        upload.close()
+        raise serializers.ValidationError("Некорректные данные base64.")
+    except serializers.ValidationError:
+        upload.close()
+        raise
+    upload.seek(0, os.SEEK_SET)
+    return upload
@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .async_views import with_async_reads
 from .views import IngredientViewSet, RecipesViewSet, TagViewSet, UsersViewSet
 
 app_name = 'api'
@@ -11,8 +13,13 @@ v1_router.register(r"ingredients", IngredientViewSet, basename="ingredients")
 v1_router.register(r"recipes", RecipesViewSet, basename="recipes")
 v1_router.register(r"tags", TagViewSet, basename="tag")
 
+router_urls = v1_router.urls
+if settings.ASYNC_VIEWS:
+    router_urls = with_async_reads(
+        router_urls, (IngredientViewSet, RecipesViewSet, TagViewSet)
+    )
 
 urlpatterns = [
-    path("", include(v1_router.urls)),
+    path("", include(router_urls)),
     path('auth/', include("djoser.urls.authtoken")),
 ]
@@ -1,29 +1,105 @@
+import csv
 from datetime import datetime
+from tempfile import SpooledTemporaryFile
 
+from django.conf import settings
 from django.db.models import F, Sum
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
 
 from posts.models import AmountOfIngridient
 
+CHUNK_SIZE = 64 * 1024
+PDF_FONT_NAME = "ShoppingCartFont"
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
 
-def download_cart(recipes):
-    shop_list = ("Моя корзина.\n\n")
-    for recipe in recipes:
-        shop_list += f"{recipe.name}:\n"
-        ingredients = AmountOfIngridient.objects.filter(recipe=recipe).values(
-            name=F("ingredient__name"),
-            measurement_unit=F("ingredient__measurement_unit")
-        ).annotate(amount=Sum("amount"))
-        shop_list += "\n".join([
-            f"* {ingredient['name']} "
-            f"({ingredient['measurement_unit']})"
-            f" - {ingredient['amount']}"
-            for ingredient in ingredients
-
-        ])
-        shop_list += "\n\n"
+
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def get_cart_ingredients(user):
+    """Суммарное кол-во каждого ингредиента по всей корзине пользователя.
+    Выполняется одним запросом с группировкой по названию и единице.
+    """
+    return AmountOfIngridient.objects.filter(
+        recipe__shopping_recipe__user=user
+    ).values(
+        name=F("ingredient__name"),
+        measurement_unit=F("ingredient__measurement_unit")
+    ).annotate(amount=Sum("amount")).order_by("name")
+
+
+def cart_to_txt(ingredients):
+    yield "Моя корзина.\n\n"
+    for ingredient in ingredients:
+        yield (f"* {ingredient['name']} "
+               f"({ingredient['measurement_unit']})"
+               f" - {ingredient['amount']}\n")
+
+
+def cart_to_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(("Ингредиент", "Единица измерения", "Количество"))
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient["name"],
+            ingredient["measurement_unit"],
+            ingredient["amount"]
+        ))
+
+
+def cart_to_pdf(ingredients):
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_CART_FONT)
+        )
+    with SpooledTemporaryFile(max_size=CHUNK_SIZE * 16) as file:
+        page = Canvas(file, pagesize=A4)
+        width, height = A4
+        line_height = PDF_FONT_SIZE * 1.5
+        position = height - PDF_MARGIN
+        page.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+        page.drawString(PDF_MARGIN, position, "Моя корзина.")
+        position -= line_height * 2
+        for ingredient in ingredients:
+            if position < PDF_MARGIN:
+                page.showPage()
+                page.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+                position = height - PDF_MARGIN
+            page.drawString(
+                PDF_MARGIN, position,
+                f"• {ingredient['name']} "
+                f"({ingredient['measurement_unit']})"
+                f" - {ingredient['amount']}"
+            )
+            position -= line_height
+        page.save()
+        file.seek(0)
+        yield from iter(lambda: file.read(CHUNK_SIZE), b"")
+
+
+CART_FORMATS = {
+    "txt": (cart_to_txt, "text/plain; charset=utf-8"),
+    "csv": (cart_to_csv, "text/csv; charset=utf-8"),
+    "pdf": (cart_to_pdf, "application/pdf"),
+}
+
+
+def download_cart(ingredients, file_type="txt"):
+    """Отдает список покупок потоком в одном из форматов CART_FORMATS."""
+    renderer, content_type = CART_FORMATS[file_type]
     today = datetime.today()
-    file = f"Список покупок от {today:%Y-%m-%d}.txt"
-    response = HttpResponse(shop_list, content_type="text/plain")
+    file = f"Список покупок от {today:%Y-%m-%d}.{file_type}"
+    response = StreamingHttpResponse(
+        renderer(ingredients), content_type=content_type
+    )
     response["Content-Disposition"] = f"attachment; filename={file}"
     return response
@@ -1,42 +1,80 @@
 from django.core.exceptions import ValidationError
 
-from posts.models import Tags
+from posts.models import Ingredients, Tags
+
+
+def find_duplicates(values):
+    """Возвращает отсортированный список повторяющихся значений."""
+    seen = set()
+    duplicates = set()
+    for value in values:
+        if value in seen:
+            duplicates.add(value)
+        seen.add(value)
+    return sorted(duplicates)
+
+
+def join_ids(ids):
+    return ", ".join(str(item) for item in ids)
 
 
 class ValidationTagIngredient:
-    """Проверка данных для тэгов и ингредиентов."""
+    """Проверка данных для тэгов и ингредиентов.
+    Все id поля проверяются одним запросом, а обо всех ошибках
+    сообщается сразу.
+    """
 
     def tag_validator(tag_input):
         if not tag_input:
-            raise ValidationError("Укажите теги")
-        tag_total = []
-        for tag in tag_input:
-            if not Tags.objects.filter(name=tag).exists():
-                raise ValidationError(
-                    {"error": "Такого тэга не существует"}
-                )
-        for tag in tag_input:
-            if tag in tag_total:
-                raise ValidationError(
-                    "Не выбирайте один и тот же тэг для рецепта."
-                )
-            tag_total.append(tag)
-        return tag_input
+            raise ValidationError({"tags": "Укажите теги"})
+        errors = []
+        duplicates = find_duplicates(tag_input)
+        if duplicates:
+            errors.append(
+                "Не выбирайте один и тот же тэг для рецепта: "
+                f"{join_ids(duplicates)}."
+            )
+        tags = Tags.objects.in_bulk(set(tag_input))
+        missing = sorted(set(tag_input) - tags.keys())
+        if missing:
+            errors.append(
+                f"Таких тэгов не существует: {join_ids(missing)}."
+            )
+        if errors:
+            raise ValidationError({"tags": errors})
+        return [tags[tag_id] for tag_id in tag_input]
 
     def ingredient_validator(ingredients):
         if not ingredients:
-            raise ValidationError("Укажите ингридиенты")
-        ingredient_total = []
-        for ingredient_item in ingredients:
-            ingredient_amount = ingredient_item["amount"]
-            if ingredient_amount < 1:
-                raise ValidationError(
-                    "Необходимо добавить хотя бы щепотку игредиента!"
-                )
-            if (ingredient_item["ingredient"] in
-                    [item["ingredient"] for item in ingredient_total]):
-                raise ValidationError(
-                    "Ингредиент должен быть уникальным!")
-            ingredient_total.append(ingredient_item)
-            print(ingredient_total)
-        return ingredient_total
+            raise ValidationError({"ingredients": "Укажите ингридиенты"})
+        errors = []
+        ingredient_ids = [item["ingredient"]["id"] for item in ingredients]
+        too_small = sorted({
+            item["ingredient"]["id"] for item in ingredients
+            if item["amount"] < 1
+        })
+        if too_small:
+            errors.append(
+                "Необходимо добавить хотя бы щепотку игредиента: "
+                f"{join_ids(too_small)}."
+            )
+        duplicates = find_duplicates(ingredient_ids)
+        if duplicates:
+            errors.append(
+                f"Ингредиент должен быть уникальным: {join_ids(duplicates)}."
+            )
+        found = Ingredients.objects.in_bulk(set(ingredient_ids))
+        missing = sorted(set(ingredient_ids) - found.keys())
+        if missing:
+            errors.append(
+                f"Таких ингредиентов не существует: {join_ids(missing)}."
+            )
+        if errors:
+            raise ValidationError({"ingredients": errors})
+        return [
+            {
+                "ingredient": {"id": found[item["ingredient"]["id"]]},
+                "amount": item["amount"],
+            }
+            for item in ingredients
+        ]
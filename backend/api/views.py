@@ -1,3 +1,6 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Exists, OuterRef, Prefetch, Value
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
@@ -5,23 +8,59 @@ from rest_framework import exceptions, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from posts.models import (Favorite, Ingredients, Recipes, ShoppingList,
-                          Subscribe, Tags)
+from posts.models import (AmountOfIngridient, Favorite, FeedItem,
+                          Ingredients, RecipeRank, Recipes, ShoppingList,
+                          SimilarRecipe, Subscribe, Tags)
 from users.models import User
 
-from .filters import IngredientFilter, RecipeFilter
-from .paginations import CustomPagination
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .filters import IngredientFilter, RecipeFilter, TiebreakOrderingFilter
+from .metrics import MetricsMixin
+from .paginations import (CursorPaginationMixin, CustomPagination,
+                          FeedCursorPagination, RankingCursorPagination,
+                          UsersCursorPagination)
 from .permissions import IsAuthorOrAdminOrReadOnly
-from .serializers import (IngredientSerializer, RecipesListSerializer,
-                          RecipesPostSerializer, ShortRecipeSerializer,
+from .search import ingredient_index, recipe_index
+from .serializers import (IngredientSerializer, MatchQuerySerializer,
+                          RecipeMatchSerializer, RecipesListSerializer,
+                          RecipesPostSerializer, RelationsBatchSerializer,
+                          ShortRecipeSerializer, SimilarQuerySerializer,
                           SubscribeSerializer, TagSerializer)
-from .utils import download_cart
+from .utils import CART_FORMATS, download_cart, get_cart_ingredients
 
 
-class UsersViewSet(UserViewSet):
+def update_relations(model, request):
+    """Добавляет и удаляет связи пользователя из запроса пакетного
+    изменения. Несуществующие id и уже примененные изменения
+    пропускаются, в ответе кол-во фактически измененных связей.
+    """
+    serializer = RelationsBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    with transaction.atomic():
+        removed = model.objects.remove(
+            request.user, serializer.validated_data["remove"]
+        )
+        added = model.objects.add(
+            request.user, serializer.validated_data["add"]
+        )
+    return Response({"added": added, "removed": removed})
+
+
+class UsersViewSet(MetricsMixin, CursorPaginationMixin, UserViewSet):
     """Получение информации, поиск, редактирование
     пользователей и подписки для пользователей."""
     pagination_class = CustomPagination
+    cursor_pagination_class = UsersCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if self.action in ("list", "retrieve") and user.is_authenticated:
+            queryset = queryset.annotate(is_subscribed=Exists(
+                Subscribe.objects.filter(user=user, author=OuterRef("pk"))
+            ))
+        return queryset
 
     def get_permissions(self):
         """
@@ -43,33 +82,43 @@ class UsersViewSet(UserViewSet):
             api/users/2/subscribe/
             2 = pk пользователя.
         """
+        if request.method == "DELETE" and Subscribe.objects.remove(
+            request.user, [id]
+        ):
+            return Response(status=status.HTTP_204_NO_CONTENT)
         author = get_object_or_404(User, id=id)
-        subscription = Subscribe.objects.filter(
-            user=request.user,
-            author=author
-        )
         if (author == request.user):
             raise exceptions.ValidationError(
                 detail="Подписаться на себя не возможно!"
             )
-        if request.method == "POST" and subscription.exists():
+        if request.method == "DELETE":
             raise exceptions.ValidationError(
-                detail="Вы уже подписались на данного автора!"
-            )
-        if request.method == "POST":
-            serializer = SubscribeSerializer(
-                author,
-                context={"request": request}
+                detail="Вы не подписывались на этого автора."
             )
-            Subscribe.objects.create(user=request.user, author=author)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        if request.method == "DELETE" and not subscription.exists():
+        if not Subscribe.objects.add(request.user, [author.pk]):
             raise exceptions.ValidationError(
-                detail="Вы не подписывались на этого автора."
+                detail="Вы уже подписались на данного автора!"
             )
-        if request.method == "DELETE":
-            subscription.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
+        author.is_subscribed = True
+        serializer = SubscribeSerializer(
+            author,
+            context={"request": request}
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=False,
+        methods=("POST",),
+        url_path="subscribe",
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def subscribe_batch(self, request):
+        """Пакетная подписка и отписка.
+        Пример endpoint:
+            api/users/subscribe/
+            {"add": [2, 3], "remove": [4]}
+        """
+        return update_relations(Subscribe, request)
 
     @action(
         detail=False,
@@ -81,7 +130,19 @@ class UsersViewSet(UserViewSet):
         Пример endpoint:
             api/users/subscriptions/
         """
-        queryset = User.objects.filter(author__user=self.request.user)
+        limit = request.query_params.get("recipes_limit")
+        limit = int(limit) if limit and limit.isdigit() else None
+        queryset = User.objects.filter(
+            author__user=self.request.user
+        ).annotate(
+            is_subscribed=Value(True, BooleanField())
+        ).prefetch_related(
+            Prefetch(
+                "recipes",
+                queryset=Recipes.objects.latest_per_author(limit),
+                to_attr="recipes_preview"
+            )
+        ).order_by("username")
         serializer = SubscribeSerializer(
             self.paginate_queryset(queryset),
             context={'request': request},
@@ -90,17 +151,34 @@ class UsersViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class RecipesViewSet(viewsets.ModelViewSet):
+class RecipesViewSet(MetricsMixin, ConditionalGetMixin, CachedResponseMixin,
+                     CursorPaginationMixin, viewsets.ModelViewSet):
     """Работа с рецептыми, создание, удаление, добавление в избранное
     и корзину.
     """
     queryset = Recipes.objects.all()
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
-    filter_backends = (DjangoFilterBackend,)
+    filter_backends = (DjangoFilterBackend, TiebreakOrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ("favorites_count", "pub_date")
+    # Порядок индекса recipes_favorites_count_idx, id - для
+    # уникальности.
+    ordering_tiebreak = ("pub_date", "id")
     pagination_class = CustomPagination
+    cache_models = (Recipes, AmountOfIngridient, Ingredients, Tags, User)
     # http_method_names = ("get", "post", "patch", "delete")
 
+    def get_queryset(self):
+        return Recipes.objects.with_user_annotations(self.request.user)
+
+    def get_cache_models(self, request):
+        """Счетчик избранного меняется без сохранения рецепта, поэтому
+        от версии избранного зависит только сортировка по нему.
+        """
+        if "favorites_count" in request.query_params.get("ordering", ""):
+            return self.cache_models + (Favorite,)
+        return self.cache_models
+
     def get_serializer_class(self):
         if self.request.method == "GET":
             return RecipesListSerializer
@@ -114,45 +192,28 @@ class RecipesViewSet(viewsets.ModelViewSet):
             permission_classes=(permissions.IsAuthenticated,))
     def favorite(self, request, pk):
         """Функция для добавления и удаления рецепта в/из избранные."""
-        user = self.request.user
         if request.method == "POST":
-            favorite_recipe = Favorite.objects.filter(
-                recipe__id=pk, user=user
-            )
-            if favorite_recipe.exists():
-                return Response(
-                    {"error": "Вы уже добавили этот рецепт в избранное!"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            try:
-                recipe = Recipes.objects.get(pk=pk)
-            except Recipes.DoesNotExist:
-                return Response(
-                    {"errors": "Такого рецепта не существует!."},
-                    status=status.HTTP_400_BAD_REQUEST)
-            Favorite.objects.create(user=user, recipe=recipe)
-            serializer = ShortRecipeSerializer(recipe)
-            return Response(
-                serializer.data,
-                status=status.HTTP_201_CREATED
+            return self.add_cart(
+                Favorite, request.user, pk,
+                "Вы уже добавили этот рецепт в избранное!"
             )
         if request.method == "DELETE":
-            try:
-                recipe = Recipes.objects.get(pk=pk)
-            except Recipes.DoesNotExist:
-                return Response(
-                    {"errors": "Такого рецепта не существует!."},
-                    status=status.HTTP_404_NOT_FOUND)
-            favorite_recipe = Favorite.objects.filter(
-                recipe__id=pk, user=user
+            return self.delete_cart(
+                Favorite, request.user, pk,
+                "Вы еще не добавляли этот рецепт в избранное!"
             )
-            if favorite_recipe.exists():
-                favorite_recipe.delete()
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            return Response({"error": ("Вы еще не добавляли этот рецепт "
-                                       "в избранное!")},
-                            status=status.HTTP_400_BAD_REQUEST
-                            )
+
+    @action(detail=False,
+            methods=("POST",),
+            url_path="favorite",
+            permission_classes=(permissions.IsAuthenticated,))
+    def favorite_batch(self, request):
+        """Пакетное изменение избранного.
+        Пример endpoint:
+            api/recipes/favorite/
+            {"add": [1, 2], "remove": [3]}
+        """
+        return update_relations(Favorite, request)
 
     @action(detail=True,
             methods=("POST", "DELETE"),
@@ -160,56 +221,214 @@ class RecipesViewSet(viewsets.ModelViewSet):
     def shopping_cart(self, request, pk):
         """Функция добавления рецепта в список покупок."""
         if request.method == "POST":
-            return self.add_cart(ShoppingList, request.user, pk)
+            return self.add_cart(
+                ShoppingList, request.user, pk,
+                "Вы уже добавили этот рецепт в список покупок."
+            )
         if request.method == "DELETE":
-            return self.delete_cart(ShoppingList, request.user, pk)
+            return self.delete_cart(
+                ShoppingList, request.user, pk,
+                "Вы уже удалили данный рецепт."
+            )
 
-    def add_cart(self, model, user, pk):
-        if model.objects.filter(user=user, recipe__id=pk).exists():
-            return Response(
-                {"errors": "Вы уже добавили этот рецепт в список покупок."},
-                status=status.HTTP_400_BAD_REQUEST)
-        try:
-            recipe = Recipes.objects.get(pk=pk)
-        except Recipes.DoesNotExist:
-            return Response(
-                {"errors": "Такого рецепта не существует!."},
-                status=status.HTTP_400_BAD_REQUEST)
-        model.objects.create(user=user, recipe=recipe)
-        serializer = ShortRecipeSerializer(recipe)
+    @action(detail=False,
+            methods=("POST",),
+            url_path="shopping_cart",
+            permission_classes=(permissions.IsAuthenticated,))
+    def shopping_cart_batch(self, request):
+        """Пакетное изменение списка покупок.
+        Пример endpoint:
+            api/recipes/shopping_cart/
+            {"add": [1, 2], "remove": [3]}
+        """
+        return update_relations(ShoppingList, request)
+
+    def add_cart(self, model, user, pk, error):
+        """Связь вставляется без проверок заранее, рецепт для ответа
+        возвращается той же командой. Причина отказа выясняется
+        только когда ничего не добавилось.
+        """
+        added = model.objects.add_returning(user, [pk])
+        if not added:
+            if not Recipes.objects.filter(pk=pk).exists():
+                error = "Такого рецепта не существует!."
+            return Response({"errors": error},
+                            status=status.HTTP_400_BAD_REQUEST)
+        serializer = ShortRecipeSerializer(added[0])
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    def delete_cart(self, model, user, pk):
-        recipe = get_object_or_404(Recipes, id=pk)
-        cart = model.objects.filter(user=user, recipe=recipe)
-        if cart.exists():
-            cart.delete()
+    def delete_cart(self, model, user, pk, error):
+        if model.objects.remove(user, [pk]):
             return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response({"errors": "Вы уже удалили данный рецепт."},
+        get_object_or_404(Recipes, id=pk)
+        return Response({"errors": error},
                         status=status.HTTP_400_BAD_REQUEST)
 
+    def paginate_recipes(self, rows):
+        """Страница берется из таблицы rows со столбцом recipe_id по
+        ее индексу, затем загружаются только рецепты этой страницы.
+        """
+        rows = self.paginate_queryset(rows)
+        recipes = self.get_queryset().in_bulk(
+            [row.recipe_id for row in rows]
+        )
+        serializer = RecipesListSerializer(
+            [recipes[row.recipe_id] for row in rows
+             if row.recipe_id in recipes],
+            context=self.get_serializer_context(),
+            many=True
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False,
+            methods=("GET",),
+            permission_classes=(permissions.IsAuthenticated,),
+            pagination_class=FeedCursorPagination,
+            cursor_pagination_class=FeedCursorPagination)
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь,
+        от новых к старым.
+        Пример endpoint:
+            api/recipes/feed/
+        """
+        return self.paginate_recipes(
+            FeedItem.objects.filter(user=request.user)
+        )
+
+    def ranking(self, request, kind):
+        """Рейтинг из таблицы refresh_rankings, ?tag=<slug>
+        оставляет рецепты с этим тэгом.
+        """
+        tag = request.query_params.get("tag")
+        ranks = RecipeRank.objects.filter(kind=kind)
+        if tag:
+            ranks = ranks.filter(tag__slug=tag)
+        else:
+            ranks = ranks.filter(tag__isnull=True)
+        return self.paginate_recipes(ranks)
+
+    @action(detail=False,
+            methods=("GET",),
+            pagination_class=RankingCursorPagination,
+            cursor_pagination_class=RankingCursorPagination)
+    def popular(self, request):
+        """Рецепты, которые чаще всего добавляли в избранное и корзину
+        за последнюю неделю.
+        Пример endpoint:
+            api/recipes/popular/?tag=breakfast
+        """
+        return self.ranking(request, RecipeRank.POPULAR)
+
+    @action(detail=False,
+            methods=("GET",),
+            pagination_class=RankingCursorPagination,
+            cursor_pagination_class=RankingCursorPagination)
+    def trending(self, request):
+        """Рецепты, которые набирают популярность: недавние добавления
+        весят больше старых.
+        Пример endpoint:
+            api/recipes/trending/?tag=breakfast
+        """
+        return self.ranking(request, RecipeRank.TRENDING)
+
+    @action(detail=True,
+            methods=("GET",))
+    def similar(self, request, pk):
+        """Похожие рецепты по ингредиентам и тэгам из таблицы
+        refresh_similar_recipes, от самых близких.
+        Пример endpoint:
+            api/recipes/1/similar/?limit=5
+        """
+        query = SimilarQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        rows = list(SimilarRecipe.objects.filter(recipe_id=pk).order_by(
+            "-score", "-similar_id"
+        )[:query.validated_data["limit"]])
+        if not rows:
+            get_object_or_404(Recipes, pk=pk)
+        recipes = self.get_queryset().in_bulk(
+            [row.similar_id for row in rows]
+        )
+        serializer = RecipesListSerializer(
+            [recipes[row.similar_id] for row in rows
+             if row.similar_id in recipes],
+            context=self.get_serializer_context(),
+            many=True
+        )
+        return Response(serializer.data)
+
+    @action(detail=False,
+            methods=("GET",))
+    def match(self, request):
+        """Рецепты, которые можно приготовить из имеющихся ингредиентов:
+        сначала те, где есть большая доля нужных ингредиентов.
+        Подбор идет по индексу в памяти, из базы загружаются только
+        рецепты ответа.
+        Пример endpoint:
+            api/recipes/match/?ingredients=1,2&ingredients=3&limit=20
+        """
+        ingredients = [
+            value for values in request.query_params.getlist("ingredients")
+            for value in values.split(",") if value
+        ]
+        query = MatchQuerySerializer(data={
+            "ingredients": ingredients,
+            **({"limit": request.query_params["limit"]}
+               if "limit" in request.query_params else {})
+        })
+        query.is_valid(raise_exception=True)
+        count, matches = recipe_index.match(
+            query.validated_data["ingredients"],
+            query.validated_data["limit"]
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe for recipe, _, _ in matches]
+        )
+        context = self.get_serializer_context()
+        context["matches"] = {
+            recipe: (matched, required)
+            for recipe, matched, required in matches
+        }
+        serializer = RecipeMatchSerializer(
+            [recipes[recipe] for recipe, _, _ in matches
+             if recipe in recipes],
+            context=context,
+            many=True
+        )
+        return Response({"count": count, "results": serializer.data})
+
     @action(detail=False,
             methods=("GET",),
             permission_classes=(permissions.IsAuthenticated,))
     def download_shopping_cart(self, request):
-        """Функция скачивания рецептов из списка покупок."""
-        shop_user = request.user
-        if not shop_user.shopping_user.exists():
+        """Функция скачивания рецептов из списка покупок.
+        Формат файла задается параметром type: txt (по умолчанию),
+        csv или pdf.
+        """
+        file_type = request.query_params.get("type", "txt")
+        if file_type not in CART_FORMATS:
+            return Response(
+                {"errors": "Доступные форматы: "
+                           f"{', '.join(CART_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST)
+        ingredients = list(get_cart_ingredients(request.user))
+        if not ingredients:
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        recipes = Recipes.objects.filter(shopping_recipe__user=shop_user)
-        response = download_cart(recipes)
-        return response
+        return download_cart(ingredients, file_type)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(MetricsMixin, CachedResponseMixin,
+                 viewsets.ReadOnlyModelViewSet):
     """Класс для работы с тегами.
     Создание и редактирование доступно только администратору.
     """
     queryset = Tags.objects.all()
     serializer_class = TagSerializer
+    cache_models = (Tags,)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(MetricsMixin, CachedResponseMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Класс для работы с ингредиентами.
     Создание и редактирование доступно только администратору.
     """
@@ -217,3 +436,16 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
+    cache_models = (Ingredients,)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == "list" and self.request.query_params.get("name"):
+            return queryset[:settings.INGREDIENTS_SEARCH_LIMIT]
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
+        if name and settings.INGREDIENTS_TRIE:
+            return Response(ingredient_index.search(name))
+        return super().list(request, *args, **kwargs)
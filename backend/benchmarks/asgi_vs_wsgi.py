@@ -0,0 +1,72 @@
+"""Сравнение пропускной способности и задержек в режимах WSGI и ASGI.
+
+Для каждого режима запускает gunicorn с gunicorn.conf.py, подает
+одинаковую нагрузку на читающие эндпоинты и печатает результат
+в JSON. Запускать из каталога backend с настроенной БД:
+
+    python benchmarks/asgi_vs_wsgi.py --concurrency 50 --duration 20
+
+С --token запросы идут от имени пользователя и не попадают
+в кэш анонимных ответов.
+"""
+import argparse
+import json
+
+from load import run_load, start_server, stop_server, wait_until_ready
+
+DEFAULT_PATHS = [
+    "/api/recipes/",
+    "/api/recipes/?page=2",
+    "/api/tags/",
+    "/api/ingredients/?name=%D0%B0",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["wsgi", "asgi"],
+                        choices=("wsgi", "asgi"))
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--token", help="Токен для заголовка Authorization.")
+    parser.add_argument("--recipe", type=int,
+                        help="id рецепта для запроса /api/recipes/<id>/.")
+    parser.add_argument("--path", action="append", dest="paths",
+                        help="Путь для нагрузки, можно указать несколько.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    paths = args.paths or list(DEFAULT_PATHS)
+    if args.recipe:
+        paths.append(f"/api/recipes/{args.recipe}/")
+    headers = {}
+    if args.token:
+        headers["Authorization"] = f"Token {args.token}"
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = {}
+    for mode in args.modes:
+        process = start_server(mode, args.port, args.workers)
+        try:
+            wait_until_ready(base_url, paths[0])
+            run_load(base_url, paths, args.concurrency, args.warmup, headers)
+            results[mode] = run_load(
+                base_url, paths, args.concurrency, args.duration, headers
+            )
+        finally:
+            stop_server(process)
+    print(json.dumps({
+        "paths": paths,
+        "workers": args.workers,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "results": results,
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Простой генератор нагрузки на стандартной библиотеке.
+
+Каждый из потоков держит свое keep-alive соединение и отправляет
+запросы из своего потока сценария, пока не истечет duration.
+Запрос сценария - кортеж (name, method, path, body), по name
+результаты группируются в отчете.
+"""
+import http.client
+import itertools
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * len(values))))
+    return values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    """RPS и перцентили задержки в миллисекундах."""
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(
+            statistics.fmean(latencies) * 1000 if latencies else 0, 1
+        ),
+    }
+
+
+def client_loop(base_url, requests, headers, deadline, latencies, errors):
+    url = urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port,
+                                            timeout=30)
+    for name, method, path, body in requests:
+        if time.monotonic() >= deadline:
+            break
+        request_headers = headers
+        if body is not None:
+            body = json.dumps(body)
+            request_headers = {**headers,
+                               "Content-Type": "application/json"}
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=body,
+                               headers=request_headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors[name] += 1
+            connection.close()
+            continue
+        if response.status >= 400:
+            errors[name] += 1
+        else:
+            latencies[name].append(time.perf_counter() - started)
+    connection.close()
+
+
+def run_workers(base_url, workers, duration=10):
+    """Запускает по потоку на каждую пару (headers, requests) и
+    возвращает общий итог и итоги по именам запросов.
+    """
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=client_loop,
+            args=(base_url, requests, headers, deadline, latencies, errors)
+        )
+        for headers, requests in workers
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    names = sorted(set(latencies) | set(errors))
+    return {
+        "total": summarize(
+            list(itertools.chain.from_iterable(latencies.values())),
+            sum(errors.values()), elapsed
+        ),
+        "requests": {
+            name: summarize(latencies[name], errors[name], elapsed)
+            for name in names
+        },
+    }
+
+
+def run_load(base_url, paths, concurrency=10, duration=10, headers=None):
+    """Каждый поток по кругу запрашивает GET пути из списка.
+    Возвращает RPS и перцентили задержки в миллисекундах.
+    """
+    headers = headers or {}
+    workers = [
+        (headers, itertools.cycle(
+            [(path, "GET", path, None) for path in paths]
+        ))
+        for _ in range(concurrency)
+    ]
+    return run_workers(base_url, workers, duration)["total"]
+
+
+def wait_until_ready(base_url, path, timeout=30):
+    url = urlsplit(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(url.hostname, url.port,
+                                                    timeout=2)
+            connection.request("GET", path)
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Сервер {base_url} не ответил за {timeout} с.")
+
+
+def start_server(mode, port, workers):
+    """Запускает gunicorn с gunicorn.conf.py из каталога backend."""
+    env = dict(
+        os.environ,
+        SERVER_MODE=mode,
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        WEB_CONCURRENCY=str(workers),
+        ALLOWED_HOSTS="127.0.0.1,localhost",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
@@ -0,0 +1,171 @@
+"""Нагрузочные сценарии API с записью результата в JSON.
+
+Данные готовит manage.py generate_data, сценарии описаны в
+scenarios.py. Каждый сценарий по очереди нагружает сервер
+concurrency виртуальными пользователями, результат - RPS и
+перцентили задержки по сценарию и по каждому виду запроса.
+Запускать из каталога backend:
+
+    # docker-compose, запросы через nginx
+    python benchmarks/run.py --base-url http://localhost \\
+        --output benchmarks/results/baseline.json
+
+    # локально на SQLite, gunicorn запускается скриптом
+    DB_ENGINE=sqlite python benchmarks/run.py --serve \\
+        --compare benchmarks/results/baseline.json
+
+С --compare результат сравнивается с сохраненным, и скрипт
+завершается с кодом 1, если RPS упал или p95 вырос больше,
+чем на --threshold процентов.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from load import run_workers, start_server, stop_server, wait_until_ready
+from scenarios import SCENARIOS, login, make_workers
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS),
+                        choices=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--prefix", default="bench",
+                        help="Префикс пользователей из generate_data.")
+    parser.add_argument("--password", default="benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--serve", action="store_true",
+                        help="Запустить gunicorn на порту из --base-url.")
+    parser.add_argument("--mode", default="wsgi", choices=("wsgi", "asgi"))
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Воркеры gunicorn для --serve.")
+    parser.add_argument("--output", help="Файл для результата в JSON.")
+    parser.add_argument("--compare", help="Сохраненный результат "
+                                          "для сравнения.")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args()
+    args.port = None
+    if args.serve:
+        try:
+            args.port = urlsplit(args.base_url).port
+        except ValueError:
+            pass
+        if args.port is None:
+            parser.error("для --serve в --base-url нужен порт, например "
+                         "http://127.0.0.1:8000")
+    return args
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_tokens(args):
+    emails = [f"{args.prefix}{index}@example.com"
+              for index in range(args.concurrency)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        return list(executor.map(
+            lambda email: login(args.base_url, email, args.password), emails
+        ))
+
+
+def run_scenarios(args):
+    tokens = get_tokens(args)
+    results = {}
+    for scenario in args.scenarios:
+        if args.warmup:
+            run_workers(args.base_url, make_workers(
+                args.base_url, scenario, tokens, args.seed
+            ), args.warmup)
+        results[scenario] = run_workers(args.base_url, make_workers(
+            args.base_url, scenario, tokens, args.seed
+        ), args.duration)
+        total = results[scenario]["total"]
+        print(f"{scenario}: {total['rps']} rps, p50 {total['p50_ms']} мс, "
+              f"p95 {total['p95_ms']} мс, ошибок {total['errors']}",
+              file=sys.stderr)
+    return results
+
+
+def change(old, new):
+    if not old:
+        return 0.0
+    return round((new - old) / old * 100, 1)
+
+
+def compare(baseline, report, threshold):
+    """Печатает изменения RPS и p95 по сценариям и возвращает
+    список сценариев, где изменение хуже порога.
+    """
+    regressions = []
+    print(f"{'сценарий':<16}{'rps':>20}{'p95, мс':>22}", file=sys.stderr)
+    for scenario, result in report["scenarios"].items():
+        old = baseline["scenarios"].get(scenario)
+        if old is None:
+            continue
+        old, new = old["total"], result["total"]
+        rps, p95 = change(old["rps"], new["rps"]), change(
+            old["p95_ms"], new["p95_ms"]
+        )
+        print(f"{scenario:<16}{old['rps']:>8} -> {new['rps']:<6}"
+              f"{rps:>+6}%{old['p95_ms']:>8} -> {new['p95_ms']:<6}"
+              f"{p95:>+6}%", file=sys.stderr)
+        if rps < -threshold or p95 > threshold:
+            regressions.append(scenario)
+    return regressions
+
+
+def main():
+    args = parse_args()
+    process = None
+    if args.serve:
+        process = start_server(args.mode, args.port, args.workers)
+    try:
+        wait_until_ready(args.base_url, "/api/tags/")
+        results = run_scenarios(args)
+    finally:
+        if process is not None:
+            stop_server(process)
+    report = {
+        "commit": get_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "base_url": args.base_url,
+        "database": os.getenv("DB_ENGINE", "postgresql"),
+        "mode": args.mode,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "scenarios": results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"Регрессия: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
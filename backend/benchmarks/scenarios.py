@@ -0,0 +1,193 @@
+"""Сценарии нагрузки на API.
+
+Каждый виртуальный пользователь входит под своим пользователем
+из generate_data и получает свой бесконечный поток запросов.
+Добавление в избранное, корзину и подписка всегда идут парой
+с удалением, поэтому состояние БД между прогонами не меняется.
+"""
+import http.client
+import itertools
+import json
+import random
+from urllib.parse import quote, urlsplit
+
+SEARCH_WORDS = ("суп", "салат", "пирог", "паста", "острый", "куриный")
+SETUP_PAGES = 5
+PAGE_LIMIT = 50
+
+
+class SetupError(Exception):
+    pass
+
+
+class ApiClient:
+    """Синхронный клиент для подготовки сценариев."""
+
+    def __init__(self, base_url, token=None):
+        url = urlsplit(base_url)
+        self.connection = http.client.HTTPConnection(url.hostname, url.port,
+                                                     timeout=60)
+        self.headers = {"Content-Type": "application/json"}
+        if token:
+            self.headers["Authorization"] = f"Token {token}"
+
+    def request(self, method, path, body=None):
+        self.connection.request(
+            method, path, body=None if body is None else json.dumps(body),
+            headers=self.headers
+        )
+        response = self.connection.getresponse()
+        data = response.read()
+        if response.status >= 400:
+            raise SetupError(f"{method} {path}: {response.status} "
+                             f"{data[:200]!r}")
+        return json.loads(data) if data else None
+
+    def close(self):
+        self.connection.close()
+
+
+def login(base_url, email, password):
+    client = ApiClient(base_url)
+    try:
+        return client.request("POST", "/api/auth/token/login/", {
+            "email": email, "password": password,
+        })["auth_token"]
+    finally:
+        client.close()
+
+
+class Context:
+    """Данные пользователя для сценариев: рецепты, которых нет в его
+    избранном и корзине, и авторы, на которых он не подписан.
+    """
+
+    def __init__(self, base_url, token, rng):
+        client = ApiClient(base_url, token)
+        try:
+            self.user = client.request("GET", "/api/users/me/")["id"]
+            self.tags = [tag["slug"]
+                         for tag in client.request("GET", "/api/tags/")]
+            first = client.request("GET", f"/api/recipes/?limit={PAGE_LIMIT}")
+            self.pages = max(1, -(-first["count"] // PAGE_LIMIT))
+            recipes = list(first["results"])
+            for page in rng.sample(range(2, self.pages + 1),
+                                   min(SETUP_PAGES, self.pages - 1)):
+                recipes += client.request(
+                    "GET", f"/api/recipes/?limit={PAGE_LIMIT}&page={page}"
+                )["results"]
+            users = client.request(
+                "GET", f"/api/users/?limit={PAGE_LIMIT}"
+            )["results"]
+        finally:
+            client.close()
+        self.recipes = [recipe["id"] for recipe in recipes]
+        self.authors = sorted({recipe["author"]["id"] for recipe in recipes})
+        self.not_favorited = [recipe["id"] for recipe in recipes
+                              if not recipe["is_favorited"]]
+        self.not_in_cart = [recipe["id"] for recipe in recipes
+                            if not recipe["is_in_shopping_cart"]]
+        self.not_subscribed = [user["id"] for user in users
+                               if not user["is_subscribed"]
+                               and user["id"] != self.user]
+        if not all((self.recipes, self.not_favorited, self.not_in_cart,
+                    self.not_subscribed)):
+            raise SetupError("Недостаточно данных, запустите "
+                             "manage.py generate_data.")
+
+    def page(self, rng):
+        """Номер страницы: чаще первые, изредка глубокие."""
+        if rng.random() < 0.8:
+            return rng.randint(1, min(self.pages, 5))
+        return rng.randint(1, self.pages)
+
+
+def browse(context, rng):
+    """Листание ленты рецептов и просмотр рецептов."""
+    while True:
+        yield ("recipes", "GET", f"/api/recipes/?page={context.page(rng)}",
+               None)
+        yield ("recipes_cursor", "GET", "/api/recipes/?pagination=cursor",
+               None)
+        for _ in range(2):
+            yield ("recipe", "GET",
+                   f"/api/recipes/{rng.choice(context.recipes)}/", None)
+
+
+def filtering(context, rng):
+    """Фильтры по тэгам, автору, избранному, корзине и поиск."""
+    while True:
+        tags = "&".join(
+            f"tags={slug}"
+            for slug in rng.sample(context.tags,
+                                   min(len(context.tags), rng.randint(1, 2)))
+        )
+        yield ("tags", "GET", f"/api/recipes/?{tags}", None)
+        yield ("author", "GET",
+               f"/api/recipes/?author={rng.choice(context.authors)}", None)
+        yield ("is_favorited", "GET", "/api/recipes/?is_favorited=1", None)
+        yield ("is_in_shopping_cart", "GET",
+               "/api/recipes/?is_in_shopping_cart=1", None)
+        yield ("search", "GET",
+               f"/api/recipes/?search={quote(rng.choice(SEARCH_WORDS))}",
+               None)
+        yield ("popular", "GET", "/api/recipes/?ordering=-favorites_count",
+               None)
+
+
+def subscriptions(context, rng):
+    """Просмотр подписок, подписка и отписка."""
+    for author in itertools.cycle(context.not_subscribed):
+        yield ("subscriptions", "GET",
+               "/api/users/subscriptions/?recipes_limit=3", None)
+        yield ("subscribe", "POST", f"/api/users/{author}/subscribe/", None)
+        yield ("users", "GET", f"/api/users/?page={rng.randint(1, 5)}", None)
+        yield ("unsubscribe", "DELETE", f"/api/users/{author}/subscribe/",
+               None)
+
+
+def favorites(context, rng):
+    """Избранное и корзина: добавление, просмотр, удаление."""
+    pairs = zip(itertools.cycle(context.not_favorited),
+                itertools.cycle(context.not_in_cart))
+    for favorite, cart in pairs:
+        yield ("favorite", "POST", f"/api/recipes/{favorite}/favorite/",
+               None)
+        yield ("shopping_cart", "POST",
+               f"/api/recipes/{cart}/shopping_cart/", None)
+        yield ("is_favorited", "GET", "/api/recipes/?is_favorited=1", None)
+        yield ("unfavorite", "DELETE", f"/api/recipes/{favorite}/favorite/",
+               None)
+        yield ("remove_from_cart", "DELETE",
+               f"/api/recipes/{cart}/shopping_cart/", None)
+
+
+def shopping_list(context, rng):
+    """Скачивание списка покупок в разных форматах."""
+    while True:
+        yield ("download_txt", "GET", "/api/recipes/download_shopping_cart/",
+               None)
+        yield ("download_csv", "GET",
+               "/api/recipes/download_shopping_cart/?type=csv", None)
+
+
+SCENARIOS = {
+    "browse": browse,
+    "filtering": filtering,
+    "subscriptions": subscriptions,
+    "favorites": favorites,
+    "shopping_list": shopping_list,
+}
+
+
+def make_workers(base_url, scenario, tokens, seed=0):
+    """Пары (headers, requests) для load.run_workers, по одной на токен."""
+    workers = []
+    for index, token in enumerate(tokens):
+        rng = random.Random(seed + index)
+        context = Context(base_url, token, rng)
+        workers.append((
+            {"Authorization": f"Token {token}"},
+            SCENARIOS[scenario](context, rng),
+        ))
+    return workers
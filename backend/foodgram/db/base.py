@@ -0,0 +1,92 @@
+import threading
+
+from django.conf import settings
+from django.db.backends.postgresql import base
+
+from .pool import ConnectionPool
+from .stats import record
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias):
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(
+                max_size=settings.DB_POOL_MAX_SIZE,
+                max_idle=settings.DB_POOL_MAX_IDLE,
+                timeout=settings.DB_POOL_TIMEOUT,
+            )
+        return _pools[alias]
+
+
+def is_alive(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except base.Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Postgres с проверкой постоянных соединений и пулом.
+    Постоянное соединение проверяется при первом обращении к БД
+    в каждом запросе, а не при каждом запросе к БД. В режиме
+    DB_POOL_MODE = pool соединение берется из пула процесса и
+    возвращается в него в конце запроса.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_needed = False
+
+    @property
+    def uses_pool(self):
+        return settings.DB_POOL_MODE == "pool"
+
+    def get_new_connection(self, conn_params):
+        if not self.uses_pool:
+            connection = super().get_new_connection(conn_params)
+            record("opened")
+            return connection
+        pool = get_pool(self.alias)
+        while True:
+            connection, created = pool.get(
+                lambda: super(DatabaseWrapper, self).get_new_connection(
+                    conn_params
+                )
+            )
+            if created:
+                record("opened")
+                return connection
+            if not settings.DB_CONN_HEALTH_CHECKS or is_alive(connection):
+                record("reused")
+                self.isolation_level = connection.isolation_level
+                return connection
+            record("unusable")
+            pool.put(connection, discard=True)
+
+    def _close(self):
+        if self.connection is None or not self.uses_pool:
+            return super()._close()
+        with self.wrap_database_errors:
+            get_pool(self.alias).put(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        # get_autocommit внутри проверки не должен расходовать флаг.
+        self.health_check_needed = False
+        super().close_if_unusable_or_obsolete()
+        self.health_check_needed = self.connection is not None
+
+    def ensure_connection(self):
+        if self.health_check_needed:
+            self.health_check_needed = False
+            if self.connection is not None and not self.in_atomic_block:
+                if settings.DB_CONN_HEALTH_CHECKS and not self.is_usable():
+                    record("unusable")
+                    self.close()
+                else:
+                    record("reused")
+        super().ensure_connection()
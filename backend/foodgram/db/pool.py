@@ -0,0 +1,57 @@
+import threading
+import time
+
+from psycopg2 import OperationalError, extensions
+
+
+class ConnectionPool:
+    """Пул соединений psycopg2 внутри процесса.
+    Вернувшиеся соединения держатся не дольше max_idle секунд.
+    Если все max_size соединений заняты, get ждет до timeout секунд.
+    """
+
+    def __init__(self, max_size, max_idle, timeout):
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.idle = []
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_size)
+
+    def get(self, connect):
+        """Возвращает соединение и признак того, что оно новое.
+        Новое соединение открывается вызовом connect.
+        """
+        if not self.slots.acquire(timeout=self.timeout):
+            raise OperationalError(
+                "Нет свободных соединений в пуле за "
+                f"{self.timeout} с."
+            )
+        try:
+            while True:
+                with self.lock:
+                    if not self.idle:
+                        break
+                    connection, returned_at = self.idle.pop()
+                if (time.monotonic() - returned_at < self.max_idle
+                        and not connection.closed):
+                    return connection, False
+                connection.close()
+            return connect(), True
+        except Exception:
+            self.slots.release()
+            raise
+
+    def put(self, connection, discard=False):
+        try:
+            if not discard and not connection.closed:
+                status = connection.info.transaction_status
+                if status != extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+                with self.lock:
+                    self.idle.append((connection, time.monotonic()))
+                return
+            connection.close()
+        except Exception:
+            connection.close()
+        finally:
+            self.slots.release()
@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+STATS_KEY = "db:connections:{}"
+STATS_NAMES = ("opened", "reused", "unusable")
+FLUSH_INTERVAL = 10
+
+_counters = Counter()
+_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+
+def record(name):
+    """Учитывает событие соединения с БД. Счетчики копятся в памяти
+    процесса и раз в FLUSH_INTERVAL секунд переносятся в кэш, чтобы
+    не обращаться к кэшу на каждом запросе.
+    """
+    global _flushed_at
+    with _lock:
+        _counters[name] += 1
+        if time.monotonic() - _flushed_at < FLUSH_INTERVAL:
+            return
+        counters = dict(_counters)
+        _counters.clear()
+        _flushed_at = time.monotonic()
+    flush(counters)
+
+
+def flush(counters):
+    for name, value in counters.items():
+        key = STATS_KEY.format(name)
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            cache.add(key, 0, timeout=None)
+            cache.incr(key, value)
+
+
+def get_stats():
+    """Суммарные счетчики всех процессов и несброшенные данные
+    текущего процесса.
+    """
+    keys = {name: STATS_KEY.format(name) for name in STATS_NAMES}
+    stored = cache.get_many(keys.values())
+    with _lock:
+        return {
+            name: stored.get(key, 0) + _counters[name]
+            for name, key in keys.items()
+        }
@@ -13,8 +13,85 @@ DEBUG = os.getenv('DEBUG', 'True') == 'True'
 
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'https://tasty-foodgram.hopto.org/').split(',')
 
+# wsgi или asgi, см. gunicorn.conf.py.
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+
+ASYNC_VIEWS = SERVER_MODE == "asgi"
+
+ASYNC_DB_THREADS = int(os.getenv("ASYNC_DB_THREADS", "8"))
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+
+# Запросов к БД на один запрос к API, больше - предупреждение в логе.
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "10"))
+
 PAGE_SIZE = os.getenv("PAGE_SIZE", "6")
 
+INGREDIENTS_SEARCH_LIMIT = int(os.getenv("INGREDIENTS_SEARCH_LIMIT", "20"))
+
+# Максимум id в одном запросе пакетного изменения избранного,
+# корзины или подписок.
+RELATIONS_BATCH_LIMIT = int(os.getenv("RELATIONS_BATCH_LIMIT", "100"))
+
+# Сколько последних рецептов подписок хранится в ленте пользователя.
+FEED_LENGTH = int(os.getenv("FEED_LENGTH", "1000"))
+
+# Рейтинги рецептов: окно популярного и период полураспада вклада
+# добавления в избранное или корзину в оценку трендов. Добавления
+# старше RANKING_WINDOW_DAYS не учитываются.
+RANKING_POPULAR_DAYS = int(os.getenv("RANKING_POPULAR_DAYS", "7"))
+RANKING_HALF_LIFE_HOURS = float(os.getenv("RANKING_HALF_LIFE_HOURS", "72"))
+RANKING_WINDOW_DAYS = int(os.getenv("RANKING_WINDOW_DAYS", "30"))
+
+# Похожие рецепты: сколько хранить для каждого рецепта и вес тэгов
+# относительно ингредиентов.
+SIMILAR_RECIPES_COUNT = int(os.getenv("SIMILAR_RECIPES_COUNT", "10"))
+SIMILAR_TAG_WEIGHT = float(os.getenv("SIMILAR_TAG_WEIGHT", "0.5"))
+
+INGREDIENTS_TRIE = os.getenv("INGREDIENTS_TRIE", "False") == "True"
+
+INGREDIENTS_TRIE_TTL = int(os.getenv("INGREDIENTS_TRIE_TTL", "300"))
+
+# Обратный индекс ингредиентов для подбора рецептов: полная
+# пересборка и проверка измененных рецептов, в секундах.
+RECIPE_INDEX_TTL = int(os.getenv("RECIPE_INDEX_TTL", "3600"))
+
+RECIPE_INDEX_REFRESH = int(os.getenv("RECIPE_INDEX_REFRESH", "5"))
+
+# Максимум рецептов в ответе подбора по ингредиентам и ингредиентов
+# в запросе.
+RECIPE_MATCH_LIMIT = int(os.getenv("RECIPE_MATCH_LIMIT", "100"))
+
+RECIPE_MATCH_INGREDIENTS = int(os.getenv("RECIPE_MATCH_INGREDIENTS", "200"))
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "WEBP")
+
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+
+IMAGE_MAX_SIZE = int(os.getenv("IMAGE_MAX_SIZE", "1920"))
+
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "8000"))
+
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv("IMAGE_UPLOAD_MAX_SIZE", str(10 * 1024 * 1024))
+)
+
+IMAGE_ALLOWED_TYPES = os.getenv(
+    "IMAGE_ALLOWED_TYPES", "image/jpeg,image/png,image/gif,image/webp"
+).split(",")
+
+RECIPE_THUMBNAIL_SIZES = tuple(
+    int(size) for size in
+    os.getenv("RECIPE_THUMBNAIL_SIZES", "160,480,960").split(",")
+)
+
+SHOPPING_CART_FONT = os.getenv(
+    "SHOPPING_CART_FONT",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+)
+
 CSRF_COOKIE_SECURE = True
 
 CSRF_TRUSTED_ORIGINS = ['https://tasty-foodgram.hopto.org/',
@@ -29,6 +106,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     "rest_framework.authtoken",
     'django_filters',
@@ -39,6 +117,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,6 +150,23 @@ TEMPLATES = [
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # INFO пишет метрики каждого запроса, WARNING - только
+        # превышения QUERY_BUDGET.
+        'api.metrics': {
+            'handlers': ['console'],
+            'level': os.getenv('METRICS_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -96,17 +192,67 @@ DJOSER = {
 }
 
 
+# persistent - постоянное соединение на поток,
+# pool - пул соединений внутри процесса,
+# pgbouncer - постоянные соединения с PgBouncer в режиме transaction.
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'persistent')
+
+# В режиме asgi запросы к БД идут из ASYNC_DB_THREADS потоков,
+# синхронному воркеру хватает одного соединения и запасного.
+DB_POOL_MAX_SIZE = int(os.getenv(
+    'DB_POOL_MAX_SIZE', ASYNC_DB_THREADS + 2 if ASYNC_VIEWS else 2
+))
+
+DB_POOL_MAX_IDLE = int(os.getenv('DB_POOL_MAX_IDLE', '300'))
+
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '10'))
+
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'foodgram.db',
         'NAME': os.getenv('POSTGRES_DB', 'foodgram'),
         'USER': os.getenv('POSTGRES_USER', 'foodgram_user'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'foodgram_password'),
         'HOST': os.getenv('DB_HOST', 'db'),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # В режиме pool соединение возвращается в пул после запроса.
+        'CONN_MAX_AGE': (
+            0 if DB_POOL_MODE == 'pool'
+            else int(os.getenv('DB_CONN_MAX_AGE', '600'))
+        ),
+        # PgBouncer в режиме transaction не поддерживает
+        # серверные курсоры.
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOL_MODE == 'pgbouncer',
     }
 }
 
+# Локальный запуск без Postgres, например для нагрузочных тестов
+# на сгенерированных данных. Полнотекстовый поиск в этом режиме
+# работает через LIKE.
+if os.getenv('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3')),
+    }
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', '300'))
+
 AUTH_USER_MODEL = 'users.User'
 
 
@@ -0,0 +1,19 @@
+import multiprocessing
+import os
+
+# SERVER_MODE=asgi запускает приложение через uvicorn воркеры,
+# в режиме wsgi используются обычные синхронные воркеры.
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(
+    os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1)
+)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+
+if SERVER_MODE == "asgi":
+    wsgi_app = "foodgram.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "foodgram.wsgi:application"
+    worker_class = "sync"
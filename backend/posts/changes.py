@@ -0,0 +1,102 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+from django.dispatch import Signal
+from django.utils import timezone
+
+# Связи добавлены или удалены методами add() и remove() менеджера
+# без save() и delete(). Аргументы: user_id, targets - id целей,
+# delta - на сколько изменилось кол-во связей.
+relations_changed = Signal()
+# Рецепты изменены методом update() без save().
+# Аргументы: recipes - id рецептов.
+recipes_updated = Signal()
+
+current_batch = ContextVar("posts_changes_batch", default=None)
+
+
+class Changes:
+    """Изменения счетчиков и дат изменения рецептов, накопленные
+    сигналами внутри блока batch_changes(). Применяются в конце
+    блока одним UPDATE на каждую группу.
+    """
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.recipes = set()
+        self.authors = set()
+
+    def apply(self):
+        from .models import Recipes
+
+        groups = defaultdict(set)
+        for (model, field, pk), delta in self.counters.items():
+            if delta:
+                groups[(model, field, delta)].add(pk)
+        for (model, field, delta), pks in groups.items():
+            model.objects.filter(pk__in=pks).update(
+                **{field: Greatest(F(field) + delta, Value(0))}
+            )
+        if self.recipes or self.authors:
+            Recipes.objects.filter(
+                Q(pk__in=self.recipes) | Q(author__in=self.authors)
+            ).update(updated_at=timezone.now())
+        self.counters.clear()
+        self.recipes.clear()
+        self.authors.clear()
+
+
+@contextmanager
+def batch_changes():
+    """Копит изменения от сигналов каскадных удалений и правок и
+    применяет их в конце блока, в той же транзакции, что и запись.
+    Вложенный блок применяется вместе с внешним.
+    """
+    if current_batch.get() is not None:
+        yield
+        return
+    changes = Changes()
+    token = current_batch.set(changes)
+    try:
+        with transaction.atomic(savepoint=False):
+            yield
+            changes.apply()
+    finally:
+        current_batch.reset(token)
+
+
+def flush_pending():
+    """Применяет накопленные изменения сразу, например перед
+    пересчетом счетчиков по фактическим данным.
+    """
+    changes = current_batch.get()
+    if changes is not None:
+        changes.apply()
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно меняет счетчик, не опуская его ниже нуля."""
+    changes = current_batch.get()
+    if changes is None:
+        model.objects.filter(pk=pk).update(
+            **{field: Greatest(F(field) + delta, Value(0))}
+        )
+        return
+    changes.counters[(model, field, pk)] += delta
+
+
+def touch_recipes(recipes=(), authors=()):
+    """Обновляет дату изменения рецептов без вызова save()."""
+    changes = current_batch.get()
+    if changes is None:
+        changes = Changes()
+        changes.recipes.update(recipes)
+        changes.authors.update(authors)
+        changes.apply()
+        return
+    changes.recipes.update(recipes)
+    changes.authors.update(authors)
@@ -0,0 +1,271 @@
+"""Генератор данных для нагрузочного тестирования.
+
+Создает пользователей, тэги, ингредиенты, рецепты с ингредиентами
+и тэгами, подписки, избранное и списки покупок. Популярность авторов
+и рецептов распределена по закону Ципфа: немногие авторы собирают
+большую часть подписок, как на живом сайте.
+Все пользователи получают один пароль, чтобы нагрузочные сценарии
+могли получить их токены через API.
+"""
+import io
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from users.models import User
+
+from .models import (AmountOfIngridient, Favorite, FeedItem, Ingredients,
+                     Recipes, ShoppingList, Subscribe, Tags,
+                     refresh_user_counters)
+
+IMAGE_NAME = "recipe/generated.jpg"
+WORDS = (
+    "суп", "салат", "пирог", "рагу", "запеканка", "каша", "омлет",
+    "паста", "плов", "котлеты", "блины", "десерт", "соус", "жаркое",
+    "домашний", "быстрый", "острый", "сырный", "овощной", "куриный",
+    "грибной", "рыбный", "летний", "праздничный", "постный", "нежный",
+)
+
+
+@contextmanager
+def explicit_dates(model, *names):
+    """Отключает auto_now и auto_now_add, чтобы bulk_create сохранил
+    переданные даты, а не текущее время.
+    """
+    fields = [model._meta.get_field(name) for name in names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def zipf_weights(size, exponent=1.0):
+    """Накопленные веса для random.choices: элемент с индексом i
+    выбирается пропорционально 1 / (i + 1) ** exponent.
+    """
+    return list(accumulate(1 / (rank + 1) ** exponent
+                           for rank in range(size)))
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+
+
+class DataGenerator:
+    """Заполняет БД пачками по batch_size строк.
+    Первичные ключи назначаются заранее, поэтому связи создаются
+    без повторного чтения строк, в том числе на SQLite, где
+    bulk_create не возвращает id. После вставки последовательности
+    Postgres сдвигаются за последний id.
+    """
+
+    def __init__(self, users=1000, recipes=100_000, ingredients=2000,
+                 tags=12, ingredients_per_recipe=(3, 12),
+                 tags_per_recipe=(1, 3), subscriptions=20, favorites=30,
+                 shopping=8, days=365, password="benchmark",
+                 prefix="bench", batch_size=5000, seed=0, log=None):
+        self.users = users
+        self.recipes = recipes
+        self.ingredients = ingredients
+        self.tags = tags
+        self.ingredients_per_recipe = ingredients_per_recipe
+        self.tags_per_recipe = tags_per_recipe
+        self.subscriptions = subscriptions
+        self.favorites = favorites
+        self.shopping = shopping
+        self.days = days
+        self.password = password
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.log = log or (lambda message: None)
+
+    def insert(self, model, objs):
+        """Вставляет объекты пачками, возвращает их кол-во."""
+        objs = iter(objs)
+        total = 0
+        while True:
+            batch = list(islice(objs, self.batch_size))
+            if not batch:
+                return total
+            with transaction.atomic():
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+
+    def generate(self):
+        tags = self.create_tags()
+        ingredients = self.create_ingredients()
+        users = self.create_users()
+        recipes = self.create_recipes(users, tags, ingredients)
+        self.create_subscriptions(users)
+        self.create_relations(users, recipes)
+        self.log("Пересчет счетчиков")
+        refresh_user_counters(User.objects.filter(pk__in=users))
+        self.log("Ленты подписок")
+        for start in range(0, len(users), 100):
+            FeedItem.objects.rebuild(users[start:start + 100])
+        self.reset_sequences()
+        return {
+            "users": len(users), "recipes": len(recipes),
+            "tags": len(tags), "ingredients": len(ingredients),
+        }
+
+    def create_tags(self):
+        existing = Tags.objects.count()
+        self.insert(Tags, (
+            Tags(name=f"Тэг {i}", slug=f"{self.prefix}-tag-{i}",
+                 color=f"#{self.rng.randrange(16 ** 6):06X}")
+            for i in range(existing, self.tags)
+        ))
+        return list(Tags.objects.values_list("pk", flat=True))
+
+    def create_ingredients(self):
+        """Добавляет недостающие ингредиенты к уже загруженным
+        командой import_csv.
+        """
+        existing = Ingredients.objects.count()
+        self.insert(Ingredients, (
+            Ingredients(name=f"Ингредиент {i:05d}",
+                        measurement_unit=self.rng.choice(("г", "мл", "шт")))
+            for i in range(existing, self.ingredients)
+        ))
+        return list(Ingredients.objects.values_list("pk", flat=True))
+
+    def create_users(self):
+        self.log(f"Пользователи: {self.users}")
+        password = make_password(self.password)
+        self.insert(User, (
+            User(username=f"{self.prefix}{i}",
+                 email=f"{self.prefix}{i}@example.com",
+                 first_name="Имя", last_name="Фамилия", password=password)
+            for i in range(self.users)
+        ))
+        return list(User.objects.filter(
+            username__regex=rf"^{self.prefix}[0-9]+$"
+        ).order_by("pk").values_list("pk", flat=True))
+
+    def get_image(self):
+        """Одно изображение на все рецепты: обработка изображений не
+        участвует в нагрузочных тестах.
+        """
+        if not default_storage.exists(IMAGE_NAME):
+            buffer = io.BytesIO()
+            Image.new("RGB", (480, 320), (200, 120, 60)).save(
+                buffer, "JPEG"
+            )
+            default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+        return IMAGE_NAME
+
+    def create_recipes(self, users, tags, ingredients):
+        self.log(f"Рецепты: {self.recipes}")
+        image = self.get_image()
+        first = next_id(Recipes)
+        ids = range(first, first + self.recipes)
+        now = timezone.now()
+        author_weights = zipf_weights(len(users), 0.8)
+        period = timedelta(days=self.days).total_seconds()
+        rng = self.rng
+
+        def recipes():
+            for pk in ids:
+                # Более поздние id получают более поздние даты, как
+                # при обычной публикации.
+                pub_date = now - timedelta(
+                    seconds=period * (ids[-1] - pk) / len(ids)
+                    + rng.random() * 60
+                )
+                yield Recipes(
+                    pk=pk,
+                    author_id=rng.choices(
+                        users, cum_weights=author_weights
+                    )[0],
+                    name=" ".join(rng.sample(WORDS, 3)).capitalize(),
+                    description=" ".join(rng.choices(WORDS, k=30)),
+                    image=image, cooking_time=rng.randint(5, 180),
+                    pub_date=pub_date, updated_at=pub_date,
+                )
+
+        with explicit_dates(Recipes, "pub_date", "updated_at"):
+            self.insert(Recipes, recipes())
+        self.insert(Recipes.tags.through, (
+            Recipes.tags.through(recipes_id=pk, tags_id=tag)
+            for pk in ids
+            for tag in rng.sample(tags, min(
+                len(tags), rng.randint(*self.tags_per_recipe)
+            ))
+        ))
+        ingredient_weights = zipf_weights(len(ingredients), 0.6)
+
+        def amounts():
+            for pk in ids:
+                chosen = set(rng.choices(
+                    ingredients, cum_weights=ingredient_weights,
+                    k=rng.randint(*self.ingredients_per_recipe)
+                ))
+                for ingredient in chosen:
+                    yield AmountOfIngridient(
+                        recipe_id=pk, ingredient_id=ingredient,
+                        amount=rng.randint(1, 500)
+                    )
+
+        self.log("Ингредиенты рецептов")
+        self.insert(AmountOfIngridient, amounts())
+        return ids
+
+    def sample(self, population, weights, k):
+        """До k разных элементов с учетом весов популярности."""
+        return set(self.rng.choices(population, cum_weights=weights,
+                                    k=min(k, len(population))))
+
+    def create_subscriptions(self, users):
+        self.log("Подписки")
+        weights = zipf_weights(len(users))
+        self.insert(Subscribe, (
+            Subscribe(user_id=user, author_id=author)
+            for user in users
+            for author in self.sample(users, weights, self.subscriptions)
+            if author != user
+        ))
+
+    def create_relations(self, users, recipes):
+        self.log("Избранное и списки покупок")
+        recipes = list(recipes)
+        # Популярные рецепты разбросаны по всему периоду, а не
+        # сосредоточены среди первых id.
+        popular = self.rng.sample(recipes, len(recipes))
+        weights = zipf_weights(len(popular))
+        now = timezone.now()
+        period = timedelta(days=self.days).total_seconds()
+        for model, per_user in ((Favorite, self.favorites),
+                                (ShoppingList, self.shopping)):
+            with explicit_dates(model, "created"):
+                self.insert(model, (
+                    model(user_id=user, recipe_id=recipe,
+                          created=now - timedelta(
+                              seconds=period * self.rng.random()
+                          ))
+                    for user in users
+                    for recipe in self.sample(popular, weights, per_user)
+                ))
+
+    def reset_sequences(self):
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Recipes]
+        )
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
@@ -0,0 +1,129 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .changes import recipes_updated
+
+logger = logging.getLogger(__name__)
+
+PROCESSED_DIR = "recipe/processed/"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS,
+                thread_name_prefix="recipe-images"
+            )
+    return _executor
+
+
+def is_processed(name):
+    return name.startswith(PROCESSED_DIR)
+
+
+def schedule_processing(recipe_id):
+    """Ставит обработку изображения рецепта в фоновый пул.
+    При IMAGE_WORKERS = 0 обработка выполняется сразу.
+    """
+    if settings.IMAGE_WORKERS == 0:
+        process_recipe_image(recipe_id)
+        return
+    get_executor().submit(run_in_worker, recipe_id)
+
+
+def run_in_worker(recipe_id):
+    try:
+        process_recipe_image(recipe_id)
+    except Exception:
+        logger.exception("Не удалось обработать изображение рецепта %s",
+                         recipe_id)
+    finally:
+        connections.close_all()
+
+
+def save_variant(image, name):
+    """Сохраняет копию без метаданных: EXIF и ICC не передаются."""
+    buffer = BytesIO()
+    image.save(buffer, format=settings.IMAGE_FORMAT,
+               quality=settings.IMAGE_QUALITY, optimize=True)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def find_missing_variants(recipes):
+    """id рецептов из recipes с необработанным изображением или без
+    миниатюр каких-то размеров из RECIPE_THUMBNAIL_SIZES: задачи пула
+    теряются при перезапуске процесса, а размеры могут добавить в
+    настройках. Ключи миниатюр проверяются в Python: в SQLite lookup
+    has_keys принимает числовые ключи за индексы массива.
+    """
+    sizes = {str(size) for size in settings.RECIPE_THUMBNAIL_SIZES}
+    rows = recipes.exclude(image="").order_by("pk").values_list(
+        "pk", "image", "thumbnails"
+    )
+    for recipe_id, image, thumbnails in rows.iterator():
+        if not is_processed(image) or not sizes <= thumbnails.keys():
+            yield recipe_id
+
+
+def process_recipe_image(recipe_id, force=False):
+    """Перекодирует оригинал и строит миниатюры RECIPE_THUMBNAIL_SIZES.
+    С force обрабатывается и уже обработанное изображение, например
+    чтобы построить миниатюры новых размеров.
+    Возвращает True, если изображение рецепта заменено.
+    """
+    from .models import Recipes
+
+    recipe = Recipes.objects.filter(pk=recipe_id).only(
+        "image", "thumbnails"
+    ).first()
+    if recipe is None or not recipe.image:
+        return False
+    if is_processed(recipe.image.name) and not force:
+        return False
+    source_name = recipe.image.name
+    with recipe.image.open("rb") as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    mode = "RGBA" if (settings.IMAGE_FORMAT == "WEBP"
+                      and "A" in image.getbands()) else "RGB"
+    image = image.convert(mode)
+    extension = settings.IMAGE_FORMAT.lower()
+    base_name = f"{PROCESSED_DIR}{recipe_id}_{uuid4().hex[:8]}"
+    main = image.copy()
+    main.thumbnail((settings.IMAGE_MAX_SIZE, settings.IMAGE_MAX_SIZE))
+    image_name = save_variant(main, f"{base_name}.{extension}")
+    thumbnails = {}
+    for size in settings.RECIPE_THUMBNAIL_SIZES:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size))
+        thumbnails[str(size)] = save_variant(
+            thumbnail, f"{base_name}_{size}.{extension}"
+        )
+    updated = Recipes.objects.filter(pk=recipe_id, image=source_name).update(
+        image=image_name, thumbnails=thumbnails, updated_at=timezone.now()
+    )
+    if not updated:
+        # Пока шла обработка, загрузили новое изображение
+        # или удалили рецепт.
+        for name in [image_name, *thumbnails.values()]:
+            default_storage.delete(name)
+        return False
+    recipes_updated.send(sender=Recipes, recipes=[recipe_id])
+    for name in [source_name, *recipe.thumbnails.values()]:
+        default_storage.delete(name)
+    return True
@@ -0,0 +1,82 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from posts.generator import DataGenerator
+
+
+def int_range(value):
+    """Диапазон вида '3-12' или одно число."""
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
+
+class Command(BaseCommand):
+    help = ("Заполняет БД пользователями, рецептами, подписками, "
+            "избранным и списками покупок для нагрузочных тестов. "
+            "Повторный запуск добавляет новые рецепты.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--recipes", type=int, default=100_000)
+        parser.add_argument(
+            "--ingredients", type=int, default=2000,
+            help="Сколько всего должно быть ингредиентов, недостающие "
+                 "создаются.")
+        parser.add_argument("--tags", type=int, default=12)
+        parser.add_argument(
+            "--ingredients-per-recipe", type=int_range, default=(3, 12),
+            help="Диапазон кол-ва ингредиентов в рецепте, например 3-12.")
+        parser.add_argument(
+            "--tags-per-recipe", type=int_range, default=(1, 3))
+        parser.add_argument(
+            "--subscriptions", type=int, default=20,
+            help="Подписок на пользователя.")
+        parser.add_argument(
+            "--favorites", type=int, default=30,
+            help="Рецептов в избранном у пользователя.")
+        parser.add_argument(
+            "--shopping", type=int, default=8,
+            help="Рецептов в списке покупок у пользователя.")
+        parser.add_argument(
+            "--days", type=int, default=365,
+            help="За сколько дней распределены даты публикации.")
+        parser.add_argument(
+            "--prefix", default="bench",
+            help="Префикс имен и email пользователей.")
+        parser.add_argument("--password", default="benchmark")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["users"] < 1:
+            raise CommandError("Нужен хотя бы один пользователь.")
+        started = time.monotonic()
+
+        def log(message):
+            self.stdout.write(
+                f"[{time.monotonic() - started:7.1f} с] {message}"
+            )
+
+        created = DataGenerator(
+            users=options["users"],
+            recipes=options["recipes"],
+            ingredients=options["ingredients"],
+            tags=options["tags"],
+            ingredients_per_recipe=options["ingredients_per_recipe"],
+            tags_per_recipe=options["tags_per_recipe"],
+            subscriptions=options["subscriptions"],
+            favorites=options["favorites"],
+            shopping=options["shopping"],
+            days=options["days"],
+            password=options["password"],
+            prefix=options["prefix"],
+            batch_size=options["batch_size"],
+            seed=options["seed"],
+            log=log,
+        ).generate()
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано рецептов {created['recipes']}, пользователей "
+            f"{created['users']}, тэгов {created['tags']}, ингредиентов "
+            f"{created['ingredients']} за {time.monotonic() - started:.2f} с."
+        ))
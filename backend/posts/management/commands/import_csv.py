@@ -1,23 +1,146 @@
+import json
 import os
+import re
+import sys
+import time
 from csv import DictReader
+from itertools import islice
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
 
 from posts.models import Ingredients
 
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "ingredients.csv")
+FIELDS = ["name", "measurement_unit"]
+CHUNK_SIZE = 64 * 1024
+# Элемент массива закончен, только если за ним идет "," или "]".
+ITEM_END = re.compile(r"\s*[,\]]")
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    """Читает элементы JSON массива по одному: в памяти только
+    текущий кусок файла, а не весь файл.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+
+    def peek():
+        """Следующий непробельный символ, при необходимости дочитывает
+        файл. Пустая строка - конец файла.
+        """
+        nonlocal buffer, position
+        while True:
+            while position < len(buffer) and buffer[position].isspace():
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            buffer, position = file.read(chunk_size), 0
+            if not buffer:
+                return ""
+
+    if peek() != "[":
+        raise ValueError("ожидался JSON массив.")
+    position += 1
+    if peek() == "]":
+        return
+    while True:
+        peek()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                item, end = None, None
+            # Элемент в конце куска мог быть прочитан не полностью:
+            # от числа "1.5" в буфере может оказаться только "1.".
+            if end is not None and ITEM_END.match(buffer, end):
+                break
+            chunk = file.read(chunk_size)
+            if not chunk:
+                if end is None:
+                    raise ValueError("некорректный JSON.")
+                break
+            buffer, position = buffer[position:] + chunk, 0
+        yield item
+        position = end
+        char = peek()
+        if char == "]":
+            return
+        if char != ",":
+            raise ValueError("JSON массив не закрыт.")
+        position += 1
+
 
 class Command(BaseCommand):
+    help = ("Загружает ингредиенты из CSV или JSON файла. "
+            "Повторный запуск не создает дубликатов.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default=DEFAULT_PATH,
+            help="Путь к файлу, '-' для чтения из stdin.")
+        parser.add_argument(
+            "--format", choices=("csv", "json"),
+            help="Формат файла, по умолчанию определяется по расширению.")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Кол-во строк в одном INSERT.")
+
+    def get_format(self, path, file_format):
+        if file_format:
+            return file_format
+        if path.endswith(".json"):
+            return "json"
+        return "csv"
+
+    def read_rows(self, file, file_format):
+        if file_format == "json":
+            rows = iter_json_array(file)
+        else:
+            rows = DictReader(file, fieldnames=FIELDS)
+        for number, row in enumerate(rows, start=1):
+            values = {}
+            for field in FIELDS:
+                value = row.get(field) if isinstance(row, dict) else None
+                if not isinstance(value, str) or not value.strip():
+                    raise CommandError(
+                        f"Строка {number}: не заполнено поле {field}."
+                    )
+                values[field] = value.strip()
+            yield Ingredients(**values)
+
     def handle(self, *args, **options):
-        csv_file_path = os.path.join(
-            os.path.dirname(__file__), "data", "ingredients.csv")
-        counter = 0
-        for row in DictReader(open(csv_file_path, encoding='utf-8'),
-                              fieldnames=["name", "measurement_unit"]):
-            ingredient = Ingredients(
-                name=row["name"],
-                measurement_unit=row["measurement_unit"]
-            )
-            ingredient.save()
-            print(f"'{ingredient}' - добавлен в базу данных.")
-            counter += 1
-        print(f"Загружено {counter} ингредиентов.")
+        path = options["path"]
+        file_format = self.get_format(path, options["format"])
+        started = time.monotonic()
+        try:
+            file = (sys.stdin if path == "-"
+                    else open(path, encoding="utf-8"))
+        except OSError as error:
+            raise CommandError(f"Не удалось открыть файл: {error}")
+        try:
+            with file, transaction.atomic():
+                total, created = self.load(
+                    file, file_format, options["batch_size"]
+                )
+        except ValueError as error:
+            raise CommandError(f"Некорректный файл: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано {total} строк, добавлено {created} ингредиентов, "
+            f"пропущено {total - created} за "
+            f"{time.monotonic() - started:.2f} с."
+        ))
+
+    def load(self, file, file_format, batch_size):
+        before = Ingredients.objects.count()
+        rows = self.read_rows(file, file_format)
+        total = 0
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            Ingredients.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+        return total, Ingredients.objects.count() - before
@@ -0,0 +1,40 @@
+import logging
+import time
+
+from django.core.management import BaseCommand
+
+from posts.images import find_missing_variants, process_recipe_image
+from posts.models import Recipes
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ("Обрабатывает изображения рецептов без перекодированной "
+            "копии или миниатюр: задачи фонового пула теряются при "
+            "перезапуске. Запускается после деплоя и периодически.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recipes", type=int, nargs="+",
+            help="id рецептов, по умолчанию все, где не хватает копий.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        recipes = Recipes.objects.all()
+        if options["recipes"]:
+            recipes = recipes.filter(pk__in=options["recipes"])
+        processed = failed = 0
+        for recipe_id in find_missing_variants(recipes):
+            try:
+                processed += process_recipe_image(recipe_id, force=True)
+            except Exception:
+                failed += 1
+                logger.exception(
+                    "Не удалось обработать изображение рецепта %s",
+                    recipe_id
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано изображений: {processed}, с ошибкой: {failed} "
+            f"за {time.monotonic() - started:.2f} с."
+        ))
@@ -0,0 +1,37 @@
+import time
+from itertools import islice
+
+from django.core.management import BaseCommand
+
+from posts.models import FeedItem
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ("Собирает заново ленты подписок: после загрузки данных "
+            "через bulk_create или чтобы обрезать ленты до FEED_LENGTH.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, nargs="+",
+            help="id пользователей, по умолчанию все.")
+        parser.add_argument(
+            "--batch-size", type=int, default=100,
+            help="Пользователей в одной транзакции.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        users = User.objects.order_by("pk").values_list("pk", flat=True)
+        if options["users"]:
+            users = users.filter(pk__in=options["users"])
+        users = iter(users.iterator())
+        total = 0
+        while True:
+            batch = list(islice(users, options["batch_size"]))
+            if not batch:
+                break
+            total += FeedItem.objects.rebuild(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f"В ленты добавлено рецептов: {total} "
+            f"за {time.monotonic() - started:.2f} с."
+        ))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from posts.models import Recipes, refresh_user_counters
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ("Сверяет счетчики избранного, корзины, рецептов и подписчиков "
+            "с фактическими данными и исправляет расхождения.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        with transaction.atomic():
+            recipes = Recipes.objects.all().refresh_counters()
+            users = refresh_user_counters(User.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f"Исправлено счетчиков: рецептов {recipes}, "
+            f"пользователей {users} за {time.monotonic() - started:.2f} с."
+        ))
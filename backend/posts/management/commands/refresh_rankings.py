@@ -0,0 +1,23 @@
+import time
+
+from django.core.management import BaseCommand
+
+from posts.rankings import refresh_rankings
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает рейтинги популярных рецептов и трендов по "
+            "добавлениям в избранное и корзину. Запускается "
+            "периодически, например раз в несколько минут из cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        counts = refresh_rankings(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Рецептов в рейтингах: популярное {counts['popular']}, "
+            f"тренды {counts['trending']} "
+            f"за {time.monotonic() - started:.2f} с."
+        ))
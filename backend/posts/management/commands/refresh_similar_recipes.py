@@ -0,0 +1,29 @@
+import time
+
+from django.core.management import BaseCommand
+
+from posts.similarity import refresh_similar_recipes
+
+
+class Command(BaseCommand):
+    help = ("Пересчитывает похожие рецепты для рецептов, измененных "
+            "после прошлого расчета. Запускается периодически, например "
+            "раз в несколько минут из cron, --full считает все заново.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full", action="store_true",
+            help="Пересчитать списки всех рецептов.")
+        parser.add_argument(
+            "--batch-size", type=int, default=200,
+            help="Рецептов в одной пачке умножения матриц.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = refresh_similar_recipes(
+            full=options["full"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Пересчитаны похожие для рецептов: {total} "
+            f"за {time.monotonic() - started:.2f} с."
+        ))
@@ -0,0 +1,31 @@
+import time
+from itertools import islice
+
+from django.core.management import BaseCommand
+
+from posts.models import FeedItem
+
+
+class Command(BaseCommand):
+    help = ("Обрезает ленты подписок до FEED_LENGTH последних рецептов: "
+            "при публикации рецепта ленты подписчиков только растут. "
+            "Запускается периодически.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=100,
+            help="Пользователей в одной команде DELETE.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        users = iter(list(FeedItem.objects.overflowing()))
+        total = 0
+        while True:
+            batch = list(islice(users, options["batch_size"]))
+            if not batch:
+                break
+            total += FeedItem.objects.trim(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f"Из лент удалено рецептов: {total} "
+            f"за {time.monotonic() - started:.2f} с."
+        ))
@@ -0,0 +1,58 @@
+# Generated by Django 3.2 on 2026-10-18 02:32
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+# Предел PositiveSmallIntegerField.
+MAX_AMOUNT = 32767
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Объединяет дубликаты, оставшиеся от повторных запусков импорта.
+    Если в рецепте есть несколько дубликатов одного ингредиента, их
+    количества складываются в одну строку.
+    """
+    Ingredients = apps.get_model('posts', 'Ingredients')
+    AmountOfIngridient = apps.get_model('posts', 'AmountOfIngridient')
+    duplicates = Ingredients.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1).order_by()
+    for duplicate in duplicates:
+        group = Ingredients.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit']
+        )
+        amounts = AmountOfIngridient.objects.filter(ingredient__in=group)
+        repeated = list(amounts.values('recipe').annotate(
+            keep_row=Min('id'), total=Sum('amount'), rows=Count('id')
+        ).filter(rows__gt=1).order_by())
+        for row in repeated:
+            amounts.filter(id=row['keep_row']).update(
+                amount=min(row['total'], MAX_AMOUNT)
+            )
+            amounts.filter(recipe=row['recipe']).exclude(
+                id=row['keep_row']
+            ).delete()
+        amounts.exclude(ingredient_id=duplicate['keep_id']).update(
+            ingredient_id=duplicate['keep_id']
+        )
+        group.exclude(id=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredients',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+CREATE_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS posts_ingredients_name_prefix_idx '
+    'ON posts_ingredients (UPPER(name) text_pattern_ops);',
+    'CREATE INDEX IF NOT EXISTS posts_ingredients_name_trgm_idx '
+    'ON posts_ingredients USING gin (UPPER(name) gin_trgm_ops);',
+)
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS posts_ingredients_name_prefix_idx;',
+    'DROP INDEX IF EXISTS posts_ingredients_name_trgm_idx;',
+)
+
+
+def run_postgres_only(statements):
+    """Индексы по выражениям нужны только Postgres: lookup-и istartswith
+    и icontains там строятся как UPPER(name) LIKE UPPER(...).
+    В SQLite поиску хватает индекса уникальности (name, measurement_unit).
+    """
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_ingredients_unique_ingredient'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(
+            run_postgres_only(CREATE_INDEXES),
+            run_postgres_only(DROP_INDEXES),
+        ),
+    ]
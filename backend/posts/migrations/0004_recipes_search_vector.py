@@ -0,0 +1,67 @@
+# Generated by Django 3.2 on 2026-10-18 02:35
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+CREATE_TRIGGER = (
+    """
+    CREATE OR REPLACE FUNCTION posts_recipes_search_vector_update()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('pg_catalog.russian',
+                                  coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('pg_catalog.russian',
+                                     coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER posts_recipes_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description ON posts_recipes
+    FOR EACH ROW EXECUTE PROCEDURE posts_recipes_search_vector_update();
+    """,
+    'UPDATE posts_recipes SET name = name;',
+)
+DROP_TRIGGER = (
+    'DROP TRIGGER IF EXISTS posts_recipes_search_vector_trigger '
+    'ON posts_recipes;',
+    'DROP FUNCTION IF EXISTS posts_recipes_search_vector_update();',
+)
+
+
+def run_postgres_only(statements):
+    """Поисковый вектор поддерживает триггер Postgres, поэтому он
+    заполняется и при bulk_create, и при update() без участия Django.
+    """
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_ingredients_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.AddIndex(
+            model_name='recipes',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipes_search_idx'),
+        ),
+        migrations.RunPython(
+            run_postgres_only(CREATE_TRIGGER),
+            run_postgres_only(DROP_TRIGGER),
+        ),
+    ]
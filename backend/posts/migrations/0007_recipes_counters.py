@@ -0,0 +1,55 @@
+# Generated by Django 3.2 on 2026-10-18 02:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipes = apps.get_model('posts', 'Recipes')
+    Favorite = apps.get_model('posts', 'Favorite')
+    ShoppingList = apps.get_model('posts', 'ShoppingList')
+    Subscribe = apps.get_model('posts', 'Subscribe')
+    User = apps.get_model('users', 'User')
+    Recipes.objects.update(
+        favorites_count=count_related(Favorite, 'recipe'),
+        shopping_count=count_related(ShoppingList, 'recipe'),
+    )
+    User.objects.update(
+        recipes_count=count_related(Recipes, 'author'),
+        followers_count=count_related(Subscribe, 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_recipes_updated_at'),
+        ('users', '0003_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipes',
+            name='shopping_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.AddIndex(
+            model_name='recipes',
+            index=models.Index(fields=['-favorites_count', '-pub_date'], name='recipes_favorites_count_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 3.2 on 2026-10-18 03:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.operations import (AddIndexConcurrently,
+                              AddUniqueConstraintConcurrently,
+                              DropForeignKeyIndexConcurrently)
+
+
+def count_related(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def remove_duplicates(apps, schema_editor):
+    """Удаляет повторные подписки и покупки, оставляя первую запись,
+    и пересчитывает счетчики, если что-то было удалено.
+    """
+    Recipes = apps.get_model('posts', 'Recipes')
+    ShoppingList = apps.get_model('posts', 'ShoppingList')
+    Subscribe = apps.get_model('posts', 'Subscribe')
+    User = apps.get_model('users', 'User')
+    for model, fields, counters, counter, related in (
+        (Subscribe, ('user', 'author'), User, 'followers_count', 'author'),
+        (ShoppingList, ('user', 'recipe'), Recipes, 'shopping_count',
+         'recipe'),
+    ):
+        first = model.objects.values(*fields).annotate(
+            first=Min('pk')
+        ).values('first')
+        deleted, _ = model.objects.exclude(pk__in=Subquery(first)).delete()
+        if deleted:
+            counters.objects.update(
+                **{counter: count_related(model, related)}
+            )
+
+
+class Migration(migrations.Migration):
+    """Без транзакции: CREATE INDEX CONCURRENTLY в ней не работает.
+    Дубликаты удаляются в отдельной транзакции прямо перед
+    построением индексов. Если за это время появится новый дубликат,
+    построение упадет, и migrate достаточно запустить повторно.
+    """
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0008_recipes_thumbnails'),
+        ('users', '0003_user_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicates, migrations.RunPython.noop, atomic=True
+        ),
+        AddIndexConcurrently(
+            model_name='recipes',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipes_author_pub_date_idx'),
+        ),
+        DropForeignKeyIndexConcurrently(
+            model_name='recipes',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recipes', to=settings.AUTH_USER_MODEL, verbose_name='автор'),
+        ),
+        AddUniqueConstraintConcurrently(
+            model_name='shoppinglist',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_list'),
+        ),
+        AddUniqueConstraintConcurrently(
+            model_name='subscribe',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_subscribe'),
+        ),
+        DropForeignKeyIndexConcurrently(
+            model_name='favorite',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        DropForeignKeyIndexConcurrently(
+            model_name='shoppinglist',
+            name='user',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shopping_user', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        DropForeignKeyIndexConcurrently(
+            model_name='subscribe',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='subscriber', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 3.2 on 2026-10-18 03:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feed(apps, schema_editor):
+    """Собирает ленты существующих подписок: та же выборка, что
+    в FeedItemQuerySet.fill, для всех пользователей сразу.
+    """
+    FeedItem = apps.get_model('posts', 'FeedItem')
+    Recipes = apps.get_model('posts', 'Recipes')
+    Subscribe = apps.get_model('posts', 'Subscribe')
+    quote = schema_editor.connection.ops.quote_name
+    schema_editor.execute(
+        f'INSERT INTO {quote(FeedItem._meta.db_table)} '
+        '(user_id, recipe_id, author_id, pub_date) '
+        'SELECT user_id, recipe_id, author_id, pub_date FROM ('
+        'SELECT s.user_id AS user_id, r.id AS recipe_id, '
+        'r.author_id AS author_id, r.pub_date AS pub_date, '
+        'ROW_NUMBER() OVER (PARTITION BY s.user_id '
+        'ORDER BY r.pub_date DESC, r.id DESC) AS position '
+        f'FROM {quote(Recipes._meta.db_table)} r '
+        f'JOIN {quote(Subscribe._meta.db_table)} s '
+        'ON s.author_id = r.author_id'
+        ') ranked WHERE position <= %s',
+        [settings.FEED_LENGTH]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_relation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации рецепта')),
+                ('author', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор рецепта')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.recipes', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Рецепт в ленте',
+                'verbose_name_plural': 'Лента подписок',
+            },
+        ),
+        migrations.RunPython(fill_feed, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['author', 'user'], name='feed_author_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_item'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 3.2 on 2026-10-18 03:52
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from posts.operations import AddIndexConcurrently
+
+# Когда добавлены существующие строки, неизвестно. Дата далеко за
+# окнами рейтингов: иначе все прежнее избранное и корзина попали бы
+# в популярное и тренды как добавленные в день миграции.
+BACKFILL_CREATED = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class Migration(migrations.Migration):
+    """Без транзакции: индексы по дате добавления строятся без
+    блокировки записи. Столбец со значением по умолчанию в Postgres
+    добавляется без перезаписи таблицы.
+    """
+    atomic = False
+
+    dependencies = [
+        ('posts', '0010_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=BACKFILL_CREATED, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppinglist',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=BACKFILL_CREATED, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        AddIndexConcurrently(
+            model_name='favorite',
+            index=models.Index(fields=['created'], name='favorite_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='shoppinglist',
+            index=models.Index(fields=['created'], name='shopping_list_created_idx'),
+        ),
+        migrations.CreateModel(
+            name='RecipeRank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('popular', 'Популярное за неделю'), ('trending', 'В тренде')], max_length=10, verbose_name='Рейтинг')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.recipes', verbose_name='Рецепт')),
+                ('tag', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.tags', verbose_name='Тэг')),
+            ],
+            options={
+                'verbose_name': 'Место в рейтинге',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reciperank',
+            index=models.Index(condition=models.Q(('tag__isnull', True)), fields=['kind', '-score', '-recipe'], name='recipe_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reciperank',
+            index=models.Index(condition=models.Q(('tag__isnull', False)), fields=['kind', 'tag', '-score', '-recipe'], name='recipe_rank_tag_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2 on 2026-10-18 04:31
+
+from django.db import migrations, models
+
+from posts.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    """Без транзакции: индекс строится без блокировки записи."""
+    atomic = False
+
+    dependencies = [
+        ('posts', '0011_rankings'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='recipes',
+            index=models.Index(fields=['updated_at'], name='recipes_updated_at_idx'),
+        ),
+    ]
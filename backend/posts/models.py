@@ -1,8 +1,20 @@
+from abc import ABCMeta, abstractmethod
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import (Count, Exists, OuterRef, Prefetch, Subquery,
+                              Value)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 from users.models import User
 
+from .changes import batch_changes, flush_pending, relations_changed
+
 
 class Tags(models.Model):
     """Модель тэга для рецепта."""
@@ -49,17 +61,257 @@ class Ingredients(models.Model):
         ordering = ("name", )
         verbose_name = "Ингридиент"
         verbose_name_plural = "Ингридиенты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "measurement_unit"],
+                name="unique_ingredient"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.name}, {self.measurement_unit}"
 
 
+class RecipesQuerySet(models.QuerySet):
+    """Выборка рецептов, подготовленная для сериализации."""
+
+    def with_user_annotations(self, user):
+        """Подгружает автора, тэги и ингредиенты одним набором запросов
+        и помечает рецепты флагами избранного, корзины и подписки
+        на автора для текущего пользователя.
+        """
+        queryset = self.select_related("author").prefetch_related(
+            "tags",
+            Prefetch(
+                "ingredient_in_recipe",
+                queryset=AmountOfIngridient.objects.select_related(
+                    "ingredient"
+                ).order_by("ingredient__name")
+            )
+        )
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, models.BooleanField()),
+                is_in_shopping_cart=Value(False, models.BooleanField()),
+                author_is_subscribed=Value(False, models.BooleanField())
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef("pk")
+            )),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user, recipe=OuterRef("pk")
+            )),
+            author_is_subscribed=Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef("author")
+            ))
+        )
+
+    def latest_per_author(self, limit=None):
+        """Оставляет не более limit последних рецептов каждого автора.
+        Отбор делает коррелированный подзапрос, поэтому превью для всей
+        страницы подписок загружаются одним запросом.
+        """
+        if limit is None:
+            return self
+        latest = Recipes.objects.filter(
+            author=OuterRef("author")
+        ).order_by("-pub_date", "-id").values("pk")[:limit]
+        return self.filter(pk__in=Subquery(latest))
+
+    def refresh_counters(self):
+        """Пересчитывает счетчики избранного и корзины одним UPDATE на
+        счетчик. Возвращает кол-во рецептов, где значение разошлось.
+        """
+        flush_pending()
+        drifted = 0
+        for field, model in (("favorites_count", Favorite),
+                             ("shopping_count", ShoppingList)):
+            actual = count_related(model, "recipe")
+            drifted += self.exclude(**{field: actual}).update(
+                **{field: actual}
+            )
+        return drifted
+
+
+def count_related(model, field):
+    """Подзапрос с кол-вом строк model, ссылающихся на внешний объект."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef("pk")}).order_by().values(
+            field
+        ).annotate(total=Count("pk")).values("total")
+    ), 0)
+
+
+def refresh_user_counters(users):
+    """Пересчитывает счетчики рецептов и подписчиков пользователей."""
+    flush_pending()
+    drifted = 0
+    for field, model, related_field in (
+        ("recipes_count", Recipes, "author"),
+        ("followers_count", Subscribe, "author"),
+    ):
+        actual = count_related(model, related_field)
+        drifted += users.exclude(**{field: actual}).update(
+            **{field: actual}
+        )
+    return drifted
+
+
+class RelationQuerySet(models.QuerySet, metaclass=ABCMeta):
+    """Связи пользователя с рецептами или авторами, уникальные по паре
+    (user, target_field). bulk_create, add и remove не отправляют
+    сигналы модели, поэтому счетчики целей пересчитываются отдельно.
+    """
+    target_field = None
+
+    @abstractmethod
+    def refresh_targets(self, pks):
+        """Пересчитывает счетчики целей по фактическим данным."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self.refresh_targets({
+            getattr(obj, f"{self.target_field}_id") for obj in objs
+        })
+        return objs
+
+    def get_insert_sql(self, connection, user, targets):
+        """Команда INSERT ... SELECT ... ON CONFLICT DO NOTHING
+        и ее параметры.
+        """
+        meta = self.model._meta
+        target = meta.get_field(self.target_field)
+        quote = connection.ops.quote_name
+        columns = [meta.get_field("user").column, target.column]
+        values = ["%s", quote(target.related_model._meta.pk.column)]
+        params = [user.pk]
+        for field in meta.concrete_fields:
+            if getattr(field, "auto_now_add", False):
+                columns.append(field.column)
+                values.append("%s")
+                params.append(field.get_db_prep_save(timezone.now(),
+                                                     connection))
+        placeholders = ", ".join(["%s"] * len(targets))
+        sql = (
+            f"INSERT INTO {quote(meta.db_table)} "
+            f"({', '.join(quote(column) for column in columns)}) "
+            f"SELECT {', '.join(values)} "
+            f"FROM {quote(target.related_model._meta.db_table)} "
+            f"WHERE {values[1]} IN ({placeholders}) "
+            "ON CONFLICT DO NOTHING"
+        )
+        return sql, [*params, *targets]
+
+    def add(self, user, targets):
+        """Добавляет связи одной командой INSERT ... SELECT ...
+        ON CONFLICT DO NOTHING. Уже существующие связи и
+        несуществующие цели пропускаются без проверки заранее,
+        поэтому повторный запрос не создаст дубликат и не упадет.
+        Возвращает кол-во добавленных строк.
+        """
+        targets = sorted({int(pk) for pk in targets})
+        if not targets:
+            return 0
+        connection = connections[self.db]
+        sql, params = self.get_insert_sql(connection, user, targets)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            added = cursor.rowcount
+        self.changed(user, targets, added)
+        return added
+
+    def add_returning(self, user, targets):
+        """Как add(), но возвращает список добавленных целей.
+        В Postgres связи вставляются и цели читаются одной командой
+        WITH ... INSERT ... RETURNING, в остальных БД цели читаются
+        по вернувшимся id вторым запросом.
+        """
+        targets = sorted({int(pk) for pk in targets})
+        if not targets:
+            return []
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        target = self.model._meta.get_field(self.target_field)
+        related = target.related_model
+        sql, params = self.get_insert_sql(connection, user, targets)
+        sql += f" RETURNING {quote(target.column)}"
+        if connection.vendor == "postgresql":
+            pk = quote(related._meta.pk.column)
+            added = list(related.objects.db_manager(self.db).raw(
+                f"WITH added AS ({sql}) SELECT t.* "
+                f"FROM {quote(related._meta.db_table)} t "
+                f"JOIN added ON t.{pk} = added.{quote(target.column)}",
+                params
+            ))
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                pks = [row[0] for row in cursor.fetchall()]
+            added = list(
+                related.objects.using(self.db).filter(pk__in=pks)
+            ) if pks else []
+        self.changed(user, [obj.pk for obj in added], len(added))
+        return added
+
+    def remove(self, user, targets):
+        """Удаляет связи одной командой DELETE и возвращает
+        кол-во удаленных строк.
+        """
+        targets = sorted({int(pk) for pk in targets})
+        if not targets:
+            return 0
+        meta = self.model._meta
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        target_column = meta.get_field(self.target_field).column
+        sql = (
+            f"DELETE FROM {quote(meta.db_table)} "
+            f"WHERE {quote(meta.get_field('user').column)} = %s "
+            f"AND {quote(target_column)} IN "
+            f"({', '.join(['%s'] * len(targets))})"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [user.pk, *targets])
+            removed = cursor.rowcount
+        self.changed(user, targets, -removed)
+        return removed
+
+    def changed(self, user, targets, delta):
+        if delta:
+            relations_changed.send(sender=self.model, user_id=user.pk,
+                                   targets=targets, delta=delta)
+
+
+class RecipeRelationQuerySet(RelationQuerySet):
+    """Избранное и корзина."""
+    target_field = "recipe"
+
+    def refresh_targets(self, pks):
+        Recipes.objects.filter(pk__in=pks).refresh_counters()
+
+
+class SubscribeQuerySet(RelationQuerySet):
+    """Подписки на авторов."""
+    target_field = "author"
+
+    def refresh_targets(self, pks):
+        refresh_user_counters(User.objects.filter(pk__in=pks))
+
+    def add(self, user, targets):
+        """Подписка на себя пропускается."""
+        return super().add(
+            user, [pk for pk in targets if int(pk) != user.pk]
+        )
+
+
 class Recipes(models.Model):
     """Модель рецетов."""
+    # Выборки по автору идут по индексу (author, -pub_date, -id).
     author = models.ForeignKey(
         User,
         related_name="recipes",
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name="автор"
     )
     name = models.CharField(
@@ -84,23 +336,94 @@ class Recipes(models.Model):
         verbose_name="Дата публикации",
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения",
+        auto_now=True
+    )
     image = models.ImageField(
         verbose_name="Изображение блюда",
         upload_to="recipe/"
     )
+    thumbnails = models.JSONField(
+        verbose_name="Миниатюры изображения",
+        default=dict,
+        blank=True,
+        editable=False
+    )
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name="Время приготовления",
         default=1
     )
+    search_vector = SearchVectorField(
+        verbose_name="Поисковый вектор",
+        null=True,
+        editable=False
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="В избранном",
+        default=0,
+        editable=False
+    )
+    shopping_count = models.PositiveIntegerField(
+        verbose_name="В списках покупок",
+        default=0,
+        editable=False
+    )
+    similar_at = models.DateTimeField(
+        verbose_name="Дата расчета похожих рецептов",
+        null=True,
+        editable=False
+    )
+
+    objects = RecipesQuerySet.as_manager()
+
+    COUNTER_FIELDS = ("favorites_count", "shopping_count")
+    # Пишутся только командами пересчета и обработкой изображений.
+    COMPUTED_FIELDS = ("similar_at", "thumbnails")
 
     class Meta:
         ordering = ("-pub_date", )
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        indexes = [
+            GinIndex(fields=["search_vector"], name="recipes_search_idx"),
+            models.Index(fields=["-pub_date", "-id"],
+                         name="recipes_pub_date_idx"),
+            models.Index(fields=["-favorites_count", "-pub_date"],
+                         name="recipes_favorites_count_idx"),
+            models.Index(fields=["author", "-pub_date", "-id"],
+                         name="recipes_author_pub_date_idx"),
+            models.Index(fields=["updated_at"],
+                         name="recipes_updated_at_idx"),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Счетчики меняются только через F(), дата расчета похожих -
+        командой пересчета, а изображение и миниатюры - обработкой
+        изображений, поэтому при обновлении рецепта они не
+        перезаписываются устаревшими значениями. Изображение
+        сохраняется, только если загружен новый файл.
+        """
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+                and field.name not in self.COMPUTED_FIELDS
+                and (field.name != "image" or not self.image._committed)
+            ]
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """Каскадно удаляемые ингредиенты, избранное и корзина
+        меняют счетчики и даты одним UPDATE на группу, а не по строке.
+        """
+        with batch_changes():
+            return super().delete(*args, **kwargs)
+
 
 class AmountOfIngridient(models.Model):
     """Модель кол-ва ингридинтов в описанном рецепте."""
@@ -132,15 +455,22 @@ class AmountOfIngridient(models.Model):
 
 class Favorite(models.Model):
     """Модель с любимыми рецептами."""
+    # Выборки по user идут по уникальному индексу (user, ...).
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name="Пользователь")
     recipe = models.ForeignKey(
         Recipes,
         on_delete=models.CASCADE,
         related_name="favorite_recipe",
         verbose_name="Понравившийся рецепт")
+    created = models.DateTimeField(
+        "Дата добавления",
+        auto_now_add=True)
+
+    objects = RecipeRelationQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Понравившийся рецепт"
@@ -150,6 +480,9 @@ class Favorite(models.Model):
                 fields=["user", "recipe"],
                 name="unique_favorite"),
         ]
+        indexes = [
+            models.Index(fields=["created"], name="favorite_created_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.user} {self.recipe}"
@@ -157,10 +490,12 @@ class Favorite(models.Model):
 
 class Subscribe(models.Model):
     """Подписки для авторов."""
+    # Выборки по user идут по уникальному индексу (user, ...).
     user = models.ForeignKey(
         User,
         related_name="subscriber",
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name="Подписчик"
     )
     author = models.ForeignKey(
@@ -173,9 +508,16 @@ class Subscribe(models.Model):
         "Дата подписки на автора",
         auto_now_add=True)
 
+    objects = SubscribeQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Подписки"
         verbose_name_plural = "Подписки"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "author"],
+                name="unique_subscribe"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.user} {self.author}"
@@ -183,22 +525,325 @@ class Subscribe(models.Model):
 
 class ShoppingList(models.Model):
     """Модель рецептов помещенных в корзину."""
+    # Выборки по user идут по уникальному индексу (user, ...).
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name="shopping_user",
         null=True,
+        db_index=False,
         verbose_name="Пользователь")
     recipe = models.ForeignKey(
         Recipes,
         on_delete=models.CASCADE,
         related_name="shopping_recipe",
         verbose_name="Покупка")
+    created = models.DateTimeField(
+        "Дата добавления",
+        auto_now_add=True)
+
+    objects = RecipeRelationQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Покупка"
         verbose_name_plural = "Покупки"
         ordering = ["-id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"],
+                name="unique_shopping_list"),
+        ]
+        indexes = [
+            models.Index(fields=["created"],
+                         name="shopping_list_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} {self.recipe}"
+
+
+class FeedItemQuerySet(models.QuerySet):
+    """Раскладывает рецепты по лентам подписчиков. Строки выбираются
+    и вставляются на стороне БД одной командой INSERT ... SELECT.
+    При заполнении в ленту попадают не больше FEED_LENGTH последних
+    рецептов на пользователя, при публикации лента может стать
+    длиннее до следующего запуска trim_feed.
+    """
+
+    def fill(self, condition, params):
+        """Добавляет в ленты рецепты r авторов из подписок s,
+        подходящих под условие condition.
+        """
+        if not params:
+            return 0
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        sql = (
+            f"INSERT INTO {quote(FeedItem._meta.db_table)} "
+            "(user_id, recipe_id, author_id, pub_date) "
+            "SELECT user_id, recipe_id, author_id, pub_date FROM ("
+            "SELECT s.user_id AS user_id, r.id AS recipe_id, "
+            "r.author_id AS author_id, r.pub_date AS pub_date, "
+            "ROW_NUMBER() OVER (PARTITION BY s.user_id "
+            "ORDER BY r.pub_date DESC, r.id DESC) AS position "
+            f"FROM {quote(Recipes._meta.db_table)} r "
+            f"JOIN {quote(Subscribe._meta.db_table)} s "
+            f"ON s.author_id = r.author_id WHERE {condition}"
+            ") ranked WHERE position <= %s "
+            "ON CONFLICT DO NOTHING"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, settings.FEED_LENGTH])
+            return cursor.rowcount
+
+    def publish(self, recipes):
+        """Новые рецепты попадают в ленты всех подписчиков автора.
+        Ленты здесь не обрезаются, чтобы публикация стоила
+        O(подписчиков): лишние строки удаляет команда trim_feed.
+        """
+        recipes = list(recipes)
+        return self.fill(
+            f"r.id IN ({', '.join(['%s'] * len(recipes))})", recipes
+        )
+
+    def follow(self, user_id, authors):
+        """Добавляет рецепты новых авторов и обрезает ленту."""
+        authors = list(authors)
+        if not authors:
+            return 0
+        added = self.fill(
+            "s.user_id = %s AND s.author_id IN "
+            f"({', '.join(['%s'] * len(authors))})", [user_id, *authors]
+        )
+        if added:
+            self.trim([user_id])
+        return added
+
+    def unfollow(self, user_id, authors):
+        return self.filter(user_id=user_id, author__in=authors).delete()[0]
+
+    def rebuild(self, users):
+        """Собирает ленты пользователей заново."""
+        users = list(users)
+        with transaction.atomic(using=self.db):
+            self.filter(user__in=users).delete()
+            return self.fill(
+                f"s.user_id IN ({', '.join(['%s'] * len(users))})", users
+            )
+
+    def overflowing(self):
+        """id пользователей, в лентах которых больше FEED_LENGTH
+        рецептов.
+        """
+        return self.values("user").annotate(
+            total=Count("id")
+        ).filter(total__gt=settings.FEED_LENGTH).values_list(
+            "user", flat=True
+        ).order_by("user")
+
+    def trim(self, users):
+        """Оставляет в лентах FEED_LENGTH последних рецептов."""
+        users = list(users)
+        if not users:
+            return 0
+        connection = connections[self.db]
+        table = connection.ops.quote_name(FeedItem._meta.db_table)
+        sql = (
+            f"DELETE FROM {table} WHERE id IN ("
+            "SELECT id FROM ("
+            "SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id "
+            "ORDER BY pub_date DESC, recipe_id DESC) AS position "
+            f"FROM {table} WHERE user_id IN "
+            f"({', '.join(['%s'] * len(users))})"
+            ") ranked WHERE position > %s)"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*users, settings.FEED_LENGTH])
+            return cursor.rowcount
+
+
+class FeedItem(models.Model):
+    """Лента пользователя: рецепты авторов, на которых он подписан.
+    Строки добавляются при публикации рецепта и при подписке,
+    поэтому страница ленты читается по индексу (user, -pub_date)
+    без обхода подписок.
+    """
+    # Выборки по user идут по уникальному индексу (user, ...),
+    # по author - по индексу (author, user).
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="feed",
+        db_index=False,
+        verbose_name="Пользователь")
+    recipe = models.ForeignKey(
+        Recipes,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Рецепт")
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_index=False,
+        verbose_name="Автор рецепта")
+    pub_date = models.DateTimeField(
+        verbose_name="Дата публикации рецепта")
+
+    objects = FeedItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Рецепт в ленте"
+        verbose_name_plural = "Лента подписок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"],
+                name="unique_feed_item"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-recipe"],
+                name="feed_user_pub_date_idx"),
+            models.Index(
+                fields=["author", "user"],
+                name="feed_author_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.recipe}"
+
+
+class RecipeRank(models.Model):
+    """Материализованные рейтинги рецептов. Для каждого рейтинга
+    хранится строка на рецепт без тэга и по строке на каждый его тэг,
+    поэтому список, в том числе с фильтром по тэгу, читается одним
+    проходом по индексу в порядке -score. Таблица обновляется командой
+    refresh_rankings.
+    """
+    POPULAR = "popular"
+    TRENDING = "trending"
+    KINDS = (
+        (POPULAR, "Популярное за неделю"),
+        (TRENDING, "В тренде"),
+    )
+    kind = models.CharField(
+        verbose_name="Рейтинг",
+        max_length=10,
+        choices=KINDS)
+    # Тэги удаляются редко, отдельный индекс для каскада не нужен.
+    tag = models.ForeignKey(
+        Tags,
+        on_delete=models.CASCADE,
+        related_name="+",
+        null=True,
+        db_index=False,
+        verbose_name="Тэг")
+    recipe = models.ForeignKey(
+        Recipes,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Рецепт")
+    score = models.FloatField(verbose_name="Оценка")
+
+    class Meta:
+        verbose_name = "Место в рейтинге"
+        verbose_name_plural = "Рейтинги рецептов"
+        # Условие tag IS NULL Postgres не считает равенством и не
+        # читает по нему индекс в порядке score, поэтому у строк без
+        # тэга свой частичный индекс.
+        indexes = [
+            models.Index(
+                fields=["kind", "-score", "-recipe"],
+                condition=models.Q(tag__isnull=True),
+                name="recipe_rank_idx"),
+            models.Index(
+                fields=["kind", "tag", "-score", "-recipe"],
+                condition=models.Q(tag__isnull=False),
+                name="recipe_rank_tag_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.recipe_id} {self.score}"
+
+
+class SimilarRecipeQuerySet(models.QuerySet):
+    def insert(self, rows, batch_size=1000):
+        """Добавляет строки (recipe_id, similar_id, score) многострочными
+        INSERT без создания объектов модели: пересчет пишет миллионы
+        строк. Возвращает кол-во строк.
+        """
+        connection = connections[self.db]
+        table = connection.ops.quote_name(SimilarRecipe._meta.db_table)
+        columns = ("recipe_id", "similar_id", "score")
+        batch_size = connection.ops.bulk_batch_size(
+            columns, range(batch_size)
+        )
+        rows = iter(rows)
+        total = 0
+        with connection.cursor() as cursor:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    return total
+                cursor.execute(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+                    + ", ".join(["(%s, %s, %s)"] * len(batch)),
+                    [value for row in batch for value in row]
+                )
+                total += len(batch)
+
+    def trim(self, recipes, length):
+        """Оставляет у рецептов length самых похожих."""
+        recipes = list(recipes)
+        if not recipes:
+            return 0
+        connection = connections[self.db]
+        table = connection.ops.quote_name(SimilarRecipe._meta.db_table)
+        sql = (
+            f"DELETE FROM {table} WHERE id IN ("
+            "SELECT id FROM ("
+            "SELECT id, ROW_NUMBER() OVER (PARTITION BY recipe_id "
+            "ORDER BY score DESC, similar_id DESC) AS position "
+            f"FROM {table} WHERE recipe_id IN "
+            f"({', '.join(['%s'] * len(recipes))})"
+            ") ranked WHERE position > %s)"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*recipes, length])
+            return cursor.rowcount
+
+
+class SimilarRecipe(models.Model):
+    """Похожие рецепты, посчитанные командой refresh_similar_recipes.
+    Список рецепта читается по индексу (recipe, -score).
+    """
+    recipe = models.ForeignKey(
+        Recipes,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_index=False,
+        verbose_name="Рецепт")
+    # Строки удаленного рецепта остаются в чужих списках до пересчета:
+    # удаление рецепта не трогает эту таблицу, а пересчет находит
+    # такие списки по индексу и считает их заново.
+    similar = models.ForeignKey(
+        Recipes,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        verbose_name="Похожий рецепт")
+    score = models.FloatField(verbose_name="Косинусная близость")
+
+    objects = SimilarRecipeQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Похожий рецепт"
+        verbose_name_plural = "Похожие рецепты"
+        indexes = [
+            models.Index(
+                fields=["recipe", "-score", "-similar"],
+                name="similar_recipe_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} {self.similar_id} {self.score}"
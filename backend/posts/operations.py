@@ -0,0 +1,128 @@
+"""Операции миграций, которые в Postgres строят и удаляют индексы
+без блокировки записи в таблицу. Миграции с ними должны быть
+объявлены с atomic = False: CREATE INDEX CONCURRENTLY не работает
+внутри транзакции.
+"""
+from django.db import migrations, models
+
+
+def get_index_state(schema_editor, name):
+    """None - индекса нет, False - индекс остался невалидным после
+    прерванного построения, True - индекс готов.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indisvalid FROM pg_index "
+            "JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+            "WHERE pg_class.relname = %s", [name]
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def prepare_index(schema_editor, name):
+    """Удаляет невалидный индекс, возвращает True, если индекс
+    нужно строить.
+    """
+    state = get_index_state(schema_editor, name)
+    if state is False:
+        schema_editor.execute(
+            f"DROP INDEX CONCURRENTLY {schema_editor.quote_name(name)}"
+        )
+    return state is not True
+
+
+def constraint_exists(schema_editor, name):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_constraint WHERE conname = %s", [name]
+        )
+        return cursor.fetchone() is not None
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """В Postgres строит индекс без блокировки записи в таблицу,
+    в остальных СУБД работает как AddIndex.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if prepare_index(schema_editor, self.index.name):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = from_state.apps.get_model(app_label, self.model_name)
+        schema_editor.remove_index(model, self.index, concurrently=True)
+
+
+class AddUniqueConstraintConcurrently(migrations.AddConstraint):
+    """В Postgres сначала строит уникальный индекс без блокировки
+    записи, затем превращает его в ограничение. ALTER TABLE ... USING
+    INDEX меняет только каталог и не читает таблицу.
+    В остальных СУБД работает как AddConstraint.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        quote = schema_editor.quote_name
+        table = quote(model._meta.db_table)
+        name = quote(self.constraint.name)
+        columns = ", ".join(
+            quote(model._meta.get_field(field).column)
+            for field in self.constraint.fields
+        )
+        if prepare_index(schema_editor, self.constraint.name):
+            schema_editor.execute(
+                f"CREATE UNIQUE INDEX CONCURRENTLY {name} "
+                f"ON {table} ({columns})"
+            )
+        if not constraint_exists(schema_editor, self.constraint.name):
+            schema_editor.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {name} "
+                f"UNIQUE USING INDEX {name}"
+            )
+
+
+class DropForeignKeyIndexConcurrently(migrations.AlterField):
+    """Убирает индекс внешнего ключа, который перекрыт уникальным
+    индексом с тем же первым столбцом. В Postgres индекс удаляется
+    без блокировки таблицы, в остальных СУБД работает как AlterField.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = from_state.apps.get_model(app_label, self.model_name)
+        column = model._meta.get_field(self.name).column
+        for name in schema_editor._constraint_names(
+            model, [column], index=True, type_=models.Index.suffix
+        ):
+            schema_editor.execute(
+                "DROP INDEX CONCURRENTLY IF EXISTS "
+                f"{schema_editor.quote_name(name)}"
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        # AlterField откатывается через database_forwards.
+        super().database_forwards(
+            app_label, schema_editor, from_state, to_state
+        )
@@ -0,0 +1,115 @@
+"""Рейтинги рецептов по добавлениям в избранное и корзину.
+
+Популярное - кол-во добавлений за RANKING_POPULAR_DAYS дней.
+Тренды - сумма вкладов добавлений за RANKING_WINDOW_DAYS дней, вклад
+уменьшается вдвое каждые RANKING_HALF_LIFE_HOURS часов. Читаются
+только добавления за окно, поэтому пересчет стоит столько же при
+любом объеме истории. Рецепт без добавлений за окно выпадает из
+рейтингов при следующем пересчете.
+
+Оценка трендов хранится как log2 суммы вкладов, приведенных к
+TRENDING_EPOCH: со временем все вклады убывают одинаково, поэтому
+порядок от этого не зависит, а оценка рецепта без новых добавлений
+между пересчетами не меняется. В таблицу записываются только
+изменившиеся оценки.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Favorite, RecipeRank, Recipes, ShoppingList
+
+TRENDING_EPOCH = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def compute_scores(now):
+    """Оценки рецептов с добавлениями за окно: {kind: {recipe: score}}."""
+    window_start = now - timedelta(days=settings.RANKING_WINDOW_DAYS)
+    popular_start = now - timedelta(days=settings.RANKING_POPULAR_DAYS)
+    half_life = timedelta(
+        hours=settings.RANKING_HALF_LIFE_HOURS
+    ).total_seconds()
+    popular = defaultdict(int)
+    trending = defaultdict(float)
+    for model in (Favorite, ShoppingList):
+        events = model.objects.filter(
+            created__gte=window_start, created__lte=now
+        ).order_by().values_list("recipe_id", "created")
+        for recipe, created in events.iterator():
+            if created >= popular_start:
+                popular[recipe] += 1
+            age = (now - created).total_seconds()
+            trending[recipe] += 0.5 ** (age / half_life)
+    shift = (now - TRENDING_EPOCH).total_seconds() / half_life
+    return {
+        RecipeRank.POPULAR: popular,
+        RecipeRank.TRENDING: {
+            recipe: math.log2(score) + shift
+            for recipe, score in trending.items()
+        },
+    }
+
+
+def batches(items, batch_size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def get_recipe_tags(recipes, batch_size):
+    tags = defaultdict(list)
+    for batch in batches(recipes, batch_size):
+        for recipe, tag in Recipes.tags.through.objects.filter(
+            recipes_id__in=batch
+        ).values_list("recipes_id", "tags_id"):
+            tags[recipe].append(tag)
+    return tags
+
+
+def refresh_rankings(now=None, batch_size=1000):
+    """Обновляет таблицу рейтингов в одной транзакции: читатели
+    до фиксации видят прежние рейтинги. Вставляются и обновляются
+    только строки рецептов, у которых изменились оценка или тэги,
+    удаляются только строки рецептов, выпавших из окна.
+    Возвращает кол-во рецептов в каждом рейтинге.
+    """
+    now = now or timezone.now()
+    scores = compute_scores(now)
+    tags = get_recipe_tags(scores[RecipeRank.TRENDING], batch_size)
+    rows = {
+        (kind, tag, recipe): score
+        for kind, recipe_scores in scores.items()
+        for recipe, score in recipe_scores.items()
+        for tag in (None, *tags[recipe])
+    }
+    with transaction.atomic():
+        changed = []
+        removed = []
+        for pk, kind, tag, recipe, score in RecipeRank.objects.values_list(
+            "pk", "kind", "tag", "recipe", "score"
+        ).iterator():
+            new_score = rows.pop((kind, tag, recipe), None)
+            if new_score is None:
+                removed.append(pk)
+            elif not math.isclose(score, new_score, rel_tol=1e-12):
+                changed.append(RecipeRank(pk=pk, score=new_score))
+        for batch in batches(removed, batch_size):
+            RecipeRank.objects.filter(pk__in=batch).delete()
+        RecipeRank.objects.bulk_update(changed, ["score"],
+                                       batch_size=batch_size)
+        RecipeRank.objects.bulk_create(
+            (RecipeRank(kind=kind, tag_id=tag, recipe_id=recipe,
+                        score=score)
+             for (kind, tag, recipe), score in rows.items()),
+            batch_size=batch_size
+        )
+    return {kind: len(recipe_scores)
+            for kind, recipe_scores in scores.items()}
@@ -0,0 +1,133 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import User
+
+from .changes import change_counter, relations_changed, touch_recipes
+from .images import is_processed, schedule_processing
+from .models import (AmountOfIngridient, Favorite, FeedItem, Ingredients,
+                     Recipes, ShoppingList, Subscribe, Tags)
+
+
+@receiver(post_save, sender=AmountOfIngridient)
+@receiver(post_delete, sender=AmountOfIngridient)
+def touch_recipe_ingredients(instance, **kwargs):
+    touch_recipes(recipes=[instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipes.tags.through)
+def touch_recipe_tags(instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if reverse:
+        if pk_set:
+            touch_recipes(recipes=pk_set)
+        return
+    touch_recipes(recipes=[instance.pk])
+
+
+@receiver(post_save, sender=Tags)
+@receiver(pre_delete, sender=Tags)
+def touch_tag_recipes(instance, created=False, raw=False, **kwargs):
+    """Название, цвет и slug тега входят в ответ с рецептом.
+    При удалении рецепты ищутся до того, как удалятся их связи с тегом.
+    """
+    if created or raw:
+        return
+    Recipes.objects.filter(tags=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Ingredients)
+def touch_ingredient_recipes(instance, created, raw=False, **kwargs):
+    """Название и единица измерения ингредиента входят в ответ
+    с рецептом.
+    """
+    if created or raw:
+        return
+    Recipes.objects.filter(
+        ingredient_in_recipe__ingredient=instance
+    ).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(instance, update_fields, **kwargs):
+    """Данные автора входят в ответ с рецептом."""
+    if update_fields == frozenset({"last_login"}):
+        return
+    touch_recipes(authors=[instance.pk])
+
+
+COUNTERS = (
+    (Favorite, Recipes, "recipe_id", "favorites_count"),
+    (ShoppingList, Recipes, "recipe_id", "shopping_count"),
+    (Subscribe, User, "author_id", "followers_count"),
+    (Recipes, User, "author_id", "recipes_count"),
+)
+
+
+def make_counter_receivers(target, key, field):
+    def increment(instance, created, raw=False, **kwargs):
+        if created and not raw:
+            change_counter(target, getattr(instance, key), field, 1)
+
+    def decrement(instance, **kwargs):
+        change_counter(target, getattr(instance, key), field, -1)
+
+    return increment, decrement
+
+
+for sender, target, key, field in COUNTERS:
+    increment, decrement = make_counter_receivers(target, key, field)
+    post_save.connect(increment, sender=sender, weak=False)
+    post_delete.connect(decrement, sender=sender, weak=False)
+
+
+@receiver(relations_changed)
+def update_relation_counters(sender, targets, delta, **kwargs):
+    """Для одной цели счетчик сдвигается на delta. Для пачки
+    неизвестно, какие именно связи изменились, поэтому счетчики
+    целей пересчитываются по фактическим данным.
+    """
+    if len(targets) == 1:
+        for model, target, key, field in COUNTERS:
+            if model is sender:
+                change_counter(target, targets[0], field, delta)
+        return
+    sender.objects.refresh_targets(targets)
+
+
+@receiver(post_save, sender=Recipes)
+def publish_to_feed(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        FeedItem.objects.publish([instance.pk])
+
+
+@receiver(post_save, sender=Subscribe)
+def follow_in_feed(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        FeedItem.objects.follow(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Subscribe)
+def unfollow_in_feed(instance, **kwargs):
+    FeedItem.objects.unfollow(instance.user_id, [instance.author_id])
+
+
+@receiver(relations_changed, sender=Subscribe)
+def update_feed(user_id, targets, delta, **kwargs):
+    if delta > 0:
+        FeedItem.objects.follow(user_id, targets)
+    else:
+        FeedItem.objects.unfollow(user_id, targets)
+
+
+@receiver(post_save, sender=Recipes)
+def process_recipe_image(instance, raw=False, **kwargs):
+    """Новое изображение обрабатывается в фоне после фиксации записи."""
+    if raw or not instance.image or is_processed(instance.image.name):
+        return
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: schedule_processing(recipe_id))
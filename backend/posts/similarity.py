@@ -0,0 +1,206 @@
+"""Похожие рецепты по ингредиентам и тэгам.
+
+Рецепт описывается разреженным вектором ингредиентов и тэгов. Вес
+признака - idf: редкий ингредиент говорит о рецепте больше, чем соль.
+Тэги дополнительно умножаются на SIMILAR_TAG_WEIGHT. Строки матрицы
+нормированы, поэтому косинусная близость - это скалярное
+произведение. Близость считается пачками строк против всей матрицы,
+для рецепта хранятся SIMILAR_RECIPES_COUNT ближайших.
+
+Пересчет обычно неполный: считаются заново списки рецептов,
+измененных после прошлого расчета (updated_at > similar_at), и
+списки, в которых есть измененные или удаленные рецепты. В остальные
+списки измененный рецепт добавляется, если он ближе последнего из них.
+Веса idf при этом меняются и в старых списках не обновляются, поэтому
+полный пересчет (--full) стоит запускать реже, например раз в сутки.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+from scipy import sparse
+
+from .models import AmountOfIngridient, Recipes, SimilarRecipe
+
+
+def get_pairs(queryset, recipe_field, feature_field):
+    pairs = np.fromiter(
+        (value for row in queryset.order_by().values_list(
+            recipe_field, feature_field
+        ).iterator(chunk_size=10000) for value in row),
+        dtype=np.int64
+    )
+    return pairs[0::2], pairs[1::2]
+
+
+def build_matrix(ids):
+    """Нормированная матрица признаков рецептов ids (отсортированы)."""
+    recipes, ingredients = get_pairs(
+        AmountOfIngridient.objects.all(), "recipe_id", "ingredient_id"
+    )
+    tag_recipes, tags = get_pairs(
+        Recipes.tags.through.objects.all(), "recipes_id", "tags_id"
+    )
+    _, ingredients = np.unique(ingredients, return_inverse=True)
+    _, tags = np.unique(tags, return_inverse=True)
+    features = ingredients.max(initial=-1) + 1
+    recipes = np.concatenate((recipes, tag_recipes))
+    columns = np.concatenate((ingredients, tags + features))
+    # Рецепты, созданные после чтения ids, в расчет не входят.
+    known = np.isin(recipes, ids)
+    matrix = sparse.csr_matrix(
+        (np.ones(known.sum(), dtype=np.float32),
+         (np.searchsorted(ids, recipes[known]), columns[known])),
+        shape=(len(ids), features + tags.max(initial=-1) + 1)
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    weights = np.log1p(len(ids) / np.maximum(frequency, 1))
+    weights[features:] *= settings.SIMILAR_TAG_WEIGHT
+    matrix = matrix @ sparse.diags(weights.astype(np.float32))
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(
+        sparse.diags((1 / norms).astype(np.float32)) @ matrix
+    )
+
+
+def top_rows(scores, count, block):
+    """Строки count наибольших значений каждого столбца, без порядка:
+    массив (столбцы, count). Столбец делится на блоки по block строк,
+    и полная выборка идет только по count блокам с наибольшим
+    максимумом: каждое из count наибольших значений лежит в одном
+    из них. Кол-во строк кратно block.
+    """
+    grouped = scores.reshape(-1, block, scores.shape[1])
+    if grouped.shape[0] <= count:
+        return np.argpartition(-scores.T, count - 1, axis=1)[:, :count]
+    columns = np.arange(scores.shape[1])[:, None]
+    best = np.argpartition(
+        -grouped.max(axis=1).T, count - 1, axis=1
+    )[:, :count]
+    candidates = (best[:, :, None] * block + np.arange(block)).reshape(
+        len(columns), -1
+    )
+    values = grouped[best, :, columns].reshape(len(columns), -1)
+    top = np.argpartition(-values, count - 1, axis=1)[:, :count]
+    return np.take_along_axis(candidates, top, axis=1)
+
+
+def nearest(scores, rows, count, block):
+    """Ближайшие рецепты для рецептов rows по близости scores
+    (все рецепты x rows): массивы (рецепт, похожий, близость)
+    позиций в ids без нулевой близости и самого рецепта.
+    """
+    scores[rows, np.arange(len(rows))] = 0
+    top = top_rows(scores, count, block)
+    top_scores = np.take_along_axis(scores.T, top, axis=1)
+    # ids отсортированы, поэтому порядок позиций - порядок id.
+    order = np.lexsort((-top, -top_scores), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    batch_rows, positions = np.nonzero(top_scores > 0)
+    return (rows[batch_rows], top[batch_rows, positions],
+            top_scores[batch_rows, positions])
+
+
+def get_thresholds(ids, count):
+    """Близость, которую должен превзойти рецепт, чтобы попасть в
+    список: последняя в полном списке, иначе 0.
+    """
+    thresholds = np.zeros(len(ids), dtype=np.float32)
+    lists = SimilarRecipe.objects.order_by().values("recipe").annotate(
+        total=Count("pk"), lowest=Min("score")
+    ).filter(total__gte=count).values_list("recipe", "lowest")
+    for recipe, lowest in lists.iterator():
+        position = np.searchsorted(ids, recipe)
+        if position < len(ids) and ids[position] == recipe:
+            thresholds[position] = lowest
+    return thresholds
+
+
+def get_positions(ids, values):
+    """Позиции в ids тех values, что в нем есть."""
+    values = np.fromiter(values, dtype=np.int64)
+    return np.intersect1d(ids, values, return_indices=True)[1]
+
+
+def chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size].tolist()
+
+
+def refresh_similar_recipes(full=False, batch_size=200, block=1024):
+    """Пересчитывает похожие рецепты, все или только устаревшие, и
+    записывает их в одной транзакции. Возвращает кол-во рецептов,
+    чьи списки посчитаны заново.
+    """
+    started = timezone.now()
+    ids = np.fromiter(Recipes.objects.order_by("pk").values_list(
+        "pk", flat=True
+    ).iterator(chunk_size=10000), dtype=np.int64)
+    stale = Recipes.objects.filter(
+        Q(similar_at__isnull=True) | Q(similar_at__lt=F("updated_at"))
+    )
+    if full:
+        changed = targets = np.arange(len(ids))
+    else:
+        changed = get_positions(ids, stale.values_list("pk", flat=True))
+        lists = SimilarRecipe.objects.filter(
+            Q(similar__in=stale.values("pk"))
+            | ~Q(similar__in=Recipes.objects.values("pk"))
+        ).values_list("recipe_id", flat=True).distinct()
+        targets = np.union1d(changed, get_positions(ids, lists))
+    count = min(settings.SIMILAR_RECIPES_COUNT, len(ids) - 1)
+    found = []
+    inserted = []
+    if len(targets) and count > 0:
+        matrix = build_matrix(ids)
+        # Пустые строки до кратного block кол-ва: их близость 0, и в
+        # списки они не попадают.
+        matrix.resize(-(-len(ids) // block) * block, matrix.shape[1])
+        thresholds = None if full else np.pad(
+            get_thresholds(ids, count), (0, matrix.shape[0] - len(ids)),
+            constant_values=np.inf
+        )
+        for start in range(0, len(targets), batch_size):
+            rows = targets[start:start + batch_size]
+            # Близость почти со всеми рецептами ненулевая, поэтому
+            # пачка берется плотной и результат тоже плотный.
+            scores = matrix @ matrix[rows].T.toarray()
+            if not full:
+                # Измененный рецепт попадает в чужие списки, если он
+                # ближе последнего в списке. Списки targets считаются
+                # заново целиком.
+                extra = scores > thresholds[:, None]
+                extra[:, ~np.isin(rows, changed)] = False
+                extra[targets] = False
+                recipes, columns = np.nonzero(extra)
+                inserted.append((recipes, rows[columns],
+                                 scores[recipes, columns]))
+            found.append(nearest(scores, rows, count, block))
+    new_rows = (
+        (int(ids[recipe]), int(ids[similar]), float(score))
+        for part in found + inserted
+        for recipe, similar, score in zip(*part)
+    )
+    updated = np.unique(np.concatenate(
+        [part[0] for part in inserted] or [np.empty(0, int)]
+    ))
+    with transaction.atomic():
+        if full:
+            SimilarRecipe.objects.all().delete()
+        else:
+            for batch in chunks(ids[targets], batch_size):
+                SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+        SimilarRecipe.objects.insert(new_rows)
+        for batch in chunks(ids[updated], batch_size):
+            SimilarRecipe.objects.trim(batch, count)
+        # Рецепт, измененный во время расчета, останется устаревшим:
+        # его updated_at позже started.
+        (Recipes.objects.all() if full else stale).update(
+            similar_at=started
+        )
+    return len(targets)
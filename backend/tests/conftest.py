@@ -0,0 +1,152 @@
+import itertools
+import random
+from types import SimpleNamespace
+
+import pytest
+from django.core.cache import cache
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import metrics
+from api.search import recipe_index
+from posts.models import (AmountOfIngridient, Favorite, FeedItem,
+                          Ingredients, Recipes, ShoppingList, Subscribe, Tags,
+                          refresh_user_counters)
+from posts.rankings import refresh_rankings
+from users.models import User
+
+# Наборы данных разного объема: кол-во запросов к БД не должно
+# от него зависеть.
+DATASETS = {
+    "small": {
+        "users": 4, "recipes_per_user": 2, "ingredients": 20,
+        "ingredients_per_recipe": 2, "tags": 2,
+    },
+    "large": {
+        "users": 25, "recipes_per_user": 6, "ingredients": 300,
+        "ingredients_per_recipe": 8, "tags": 6,
+    },
+}
+
+PNG = (
+    "data:image/png;base64,"
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk"
+    "+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+
+def build_dataset(users, recipes_per_user, ingredients,
+                  ingredients_per_recipe, tags, seed=0):
+    """Создает пользователей с рецептами, подписками, избранным и
+    корзиной. Первый пользователь подписан на всех и добавил в
+    избранное и корзину каждый второй рецепт.
+    """
+    rng = random.Random(seed)
+    Tags.objects.bulk_create(
+        Tags(name=f"Тег {i}", slug=f"tag-{i}", color=f"#{i:06d}")
+        for i in range(tags)
+    )
+    tags = list(Tags.objects.order_by("id"))
+    Ingredients.objects.bulk_create(
+        Ingredients(name=f"Ингредиент {i:04d}", measurement_unit="г")
+        for i in range(ingredients)
+    )
+    ingredients = list(Ingredients.objects.order_by("id"))
+    User.objects.bulk_create(
+        User(username=f"user{i}", email=f"user{i}@example.com",
+             first_name="Имя", last_name="Фамилия", password="!")
+        for i in range(users)
+    )
+    users = list(User.objects.order_by("id"))
+    Recipes.objects.bulk_create(
+        Recipes(author=author, name=f"Рецепт {author.pk}-{i}",
+                description="Описание", image="recipe/test.png",
+                cooking_time=rng.randint(1, 120))
+        for author in users for i in range(recipes_per_user)
+    )
+    recipes = list(Recipes.objects.order_by("id"))
+    Recipes.tags.through.objects.bulk_create(
+        Recipes.tags.through(recipes_id=recipe.pk, tags_id=tag.pk)
+        for recipe in recipes
+        for tag in rng.sample(tags, rng.randint(1, len(tags)))
+    )
+    AmountOfIngridient.objects.bulk_create(
+        AmountOfIngridient(recipe=recipe, ingredient=ingredient,
+                           amount=rng.randint(1, 500))
+        for recipe in recipes
+        for ingredient in rng.sample(ingredients, ingredients_per_recipe)
+    )
+    user = users[0]
+    Subscribe.objects.bulk_create(
+        Subscribe(user=follower, author=author)
+        for follower, author in itertools.permutations(users[:3], 2)
+        if follower != user
+    )
+    Subscribe.objects.bulk_create(
+        Subscribe(user=user, author=author) for author in users[1:]
+    )
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe) for recipe in recipes[::2]
+    )
+    ShoppingList.objects.bulk_create(
+        ShoppingList(user=user, recipe=recipe) for recipe in recipes[::2]
+    )
+    refresh_user_counters(User.objects.all())
+    FeedItem.objects.rebuild([user.pk for user in users])
+    refresh_rankings()
+    return SimpleNamespace(
+        user=user, users=users, recipes=recipes, tags=tags,
+        ingredients=ingredients,
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(monkeypatch):
+    """Метрики запросов копятся в памяти процесса и раз в
+    FLUSH_INTERVAL секунд переносятся в кэш. Накопленные за много
+    тестов, они переполнили бы LocMemCache посреди теста и вытеснили
+    версии моделей, поэтому у каждого теста свой буфер.
+    """
+    monkeypatch.setattr(metrics, "aggregator", metrics.Aggregator())
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_recipe_index():
+    """Индекс подбора рецептов живет в памяти процесса, а база у
+    каждого теста своя.
+    """
+    recipe_index.reset()
+    yield
+    recipe_index.reset()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.IMAGE_WORKERS = 0
+
+
+@pytest.fixture(params=DATASETS.keys())
+def dataset(request, db):
+    return build_dataset(**DATASETS[request.param])
+
+
+@pytest.fixture
+def user_client(dataset):
+    token = Token.objects.create(user=dataset.user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    return client
+
+
+@pytest.fixture
+def anon_client():
+    return APIClient()
+
+
+@pytest.fixture
+def image():
+    return PNG
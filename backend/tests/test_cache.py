@@ -0,0 +1,41 @@
+"""Кэш ответов для анонимных пользователей."""
+import pytest
+
+from posts.models import Favorite
+
+pytestmark = pytest.mark.django_db
+
+
+def test_cache_key_includes_host_and_scheme(settings, anon_client, dataset):
+    settings.ALLOWED_HOSTS = ["*"]
+    url = "/api/recipes/?limit=1"
+    response = anon_client.get(url, HTTP_HOST="a.example.com")
+    assert response["X-Cache"] == "MISS"
+    assert response.data["next"].startswith("http://a.example.com/")
+    response = anon_client.get(url, HTTP_HOST="a.example.com")
+    assert response["X-Cache"] == "HIT"
+    response = anon_client.get(url, HTTP_HOST="b.example.com")
+    assert response["X-Cache"] == "MISS"
+    assert response.data["next"].startswith("http://b.example.com/")
+    response = anon_client.get(url, HTTP_HOST="a.example.com", secure=True)
+    assert response["X-Cache"] == "MISS"
+    assert response.data["next"].startswith("https://a.example.com/")
+
+
+def test_favorites_ordering_follows_counters(
+        anon_client, dataset, django_capture_on_commit_callbacks):
+    url = "/api/recipes/?ordering=-favorites_count&limit=1"
+    first = anon_client.get(url).data["results"][0]["id"]
+    assert anon_client.get(url)["X-Cache"] == "HIT"
+    assert anon_client.get("/api/recipes/")["X-Cache"] == "MISS"
+    recipe = next(
+        recipe for recipe in reversed(dataset.recipes) if recipe.pk != first
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        for user in dataset.users:
+            Favorite.objects.add(user, [recipe.pk])
+    response = anon_client.get(url)
+    assert response["X-Cache"] == "MISS"
+    assert response.data["results"][0]["id"] == recipe.pk
+    # Остальные ответы от избранного не зависят.
+    assert anon_client.get("/api/recipes/")["X-Cache"] == "HIT"
@@ -0,0 +1,50 @@
+"""Ответы 304 на условные GET к рецептам."""
+import pytest
+
+from posts.models import Favorite
+
+pytestmark = pytest.mark.django_db
+
+
+def test_list_validator_skips_database(anon_client, dataset,
+                                       django_assert_num_queries):
+    response = anon_client.get("/api/recipes/")
+    etag = response["ETag"]
+    with django_assert_num_queries(0):
+        response = anon_client.get("/api/recipes/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+
+def test_user_list_follows_user_state(user_client, dataset,
+                                      django_capture_on_commit_callbacks):
+    etag = user_client.get("/api/recipes/")["ETag"]
+    response = user_client.get("/api/recipes/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    recipe = dataset.recipes[1]
+    with django_capture_on_commit_callbacks(execute=True):
+        Favorite.objects.add(dataset.user, [recipe.pk])
+    response = user_client.get("/api/recipes/", HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("related", ("tags", "ingredients"))
+def test_related_edit_changes_validators(user_client, anon_client, dataset,
+                                         django_capture_on_commit_callbacks,
+                                         related):
+    recipe = dataset.recipes[0]
+    url = f"/api/recipes/{recipe.pk}/"
+    if related == "tags":
+        obj = recipe.tags.first()
+        obj.color = "#ABCDEF"
+    else:
+        obj = recipe.ingredient_in_recipe.first().ingredient
+        obj.measurement_unit = "кг"
+    requests = [(client, path)
+                for client in (user_client, anon_client)
+                for path in (url, "/api/recipes/")]
+    etags = [client.get(path)["ETag"] for client, path in requests]
+    with django_capture_on_commit_callbacks(execute=True):
+        obj.save()
+    for (client, path), etag in zip(requests, etags):
+        response = client.get(path, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, path
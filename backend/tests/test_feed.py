@@ -0,0 +1,120 @@
+"""Лента рецептов авторов, на которых подписан пользователь."""
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from posts.models import FeedItem, Recipes, Subscribe
+
+pytestmark = pytest.mark.django_db
+
+
+def expected_feed(user):
+    return list(Recipes.objects.filter(
+        author__author__user=user
+    ).order_by("-pub_date", "-id").values_list("pk", flat=True))
+
+
+def read_feed(client, limit=3):
+    """id рецептов всех страниц ленты по ссылкам next."""
+    ids = []
+    url = f"/api/recipes/feed/?limit={limit}"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, response.data
+        assert len(response.data["results"]) <= limit
+        ids.extend(recipe["id"] for recipe in response.data["results"])
+        url = response.data["next"]
+    return ids
+
+
+def test_feed_pages(user_client, dataset):
+    assert read_feed(user_client) == expected_feed(dataset.user)
+    response = user_client.get("/api/recipes/feed/")
+    recipe = response.data["results"][0]
+    assert recipe["author"]["is_subscribed"] is True
+    assert {"is_favorited", "is_in_shopping_cart", "ingredients",
+            "tags"} <= set(recipe)
+
+
+def test_feed_requires_auth(anon_client, dataset):
+    assert anon_client.get("/api/recipes/feed/").status_code == 401
+
+
+def test_feed_follows_recipes_and_subscriptions(user_client, dataset):
+    author = dataset.users[1]
+    user_client.delete(f"/api/users/{author.pk}/subscribe/")
+    assert author.pk not in FeedItem.objects.filter(
+        user=dataset.user
+    ).values_list("author", flat=True)
+    assert read_feed(user_client) == expected_feed(dataset.user)
+
+    user_client.post(f"/api/users/{author.pk}/subscribe/")
+    other = dataset.users[2]
+    recipe = Recipes.objects.create(
+        author=other, name="Новый", description="Описание",
+        image="recipe/test.png"
+    )
+    feed = read_feed(user_client)
+    assert feed[0] == recipe.pk
+    assert feed == expected_feed(dataset.user)
+
+    authors = [user.pk for user in dataset.users[1:]]
+    user_client.post("/api/users/subscribe/", {"remove": authors},
+                     format="json")
+    assert read_feed(user_client) == []
+    user_client.post("/api/users/subscribe/", {"add": authors},
+                     format="json")
+    assert read_feed(user_client) == expected_feed(dataset.user)
+
+
+def test_recipe_delete_removes_feed_items(dataset):
+    recipe = Recipes.objects.filter(
+        author__author__user=dataset.user
+    ).first()
+    recipe_id = recipe.pk
+    assert FeedItem.objects.filter(recipe_id=recipe_id).exists()
+    recipe.delete()
+    assert not FeedItem.objects.filter(recipe_id=recipe_id).exists()
+
+
+def test_feed_length(settings, user_client, dataset):
+    settings.FEED_LENGTH = 3
+    FeedItem.objects.rebuild([dataset.user.pk])
+    assert read_feed(user_client) == expected_feed(dataset.user)[:3]
+    author = dataset.users[1]
+    Subscribe.objects.filter(user=dataset.user, author=author).delete()
+    Subscribe.objects.create(user=dataset.user, author=author)
+    assert FeedItem.objects.filter(user=dataset.user).count() == 3
+
+
+def test_trim_feed_command(settings, user_client, dataset):
+    settings.FEED_LENGTH = 3
+    FeedItem.objects.rebuild([user.pk for user in dataset.users])
+    author = dataset.users[1]
+    recipe = Recipes.objects.create(
+        author=author, name="Новый", description="Описание",
+        image="recipe/test.png"
+    )
+    followers = list(Subscribe.objects.filter(author=author).values_list(
+        "user", flat=True
+    ))
+    assert followers
+    assert set(FeedItem.objects.overflowing()) == set(followers)
+    call_command("trim_feed", batch_size=2, stdout=StringIO())
+    assert not FeedItem.objects.overflowing().exists()
+    for follower in followers:
+        feed = list(FeedItem.objects.filter(user=follower).order_by(
+            "-pub_date", "-recipe_id"
+        ).values_list("recipe", flat=True))
+        assert feed == expected_feed(follower)[:3]
+        assert feed[0] == recipe.pk
+
+
+def test_rebuild_feed_command(dataset):
+    FeedItem.objects.all().delete()
+    call_command("rebuild_feed", batch_size=2, stdout=StringIO())
+    for user in dataset.users:
+        assert list(FeedItem.objects.filter(user=user).order_by(
+            "-pub_date", "-recipe_id"
+        ).values_list("recipe", flat=True)) == expected_feed(user)
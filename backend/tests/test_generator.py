@@ -0,0 +1,44 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Count
+
+from posts.models import (AmountOfIngridient, Favorite, Recipes, Subscribe,
+                          refresh_user_counters)
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+def test_generate_data():
+    call_command(
+        "generate_data", users=20, recipes=200, ingredients=50, tags=4,
+        subscriptions=5, favorites=5, shopping=3, batch_size=64,
+        stdout=StringIO(),
+    )
+    assert User.objects.count() == 20
+    assert Recipes.objects.count() == 200
+    assert not Recipes.objects.annotate(
+        total=Count("ingredient_in_recipe")
+    ).filter(total__lt=1).exists()
+    assert AmountOfIngridient.objects.count() >= 200
+    assert Subscribe.objects.exists() and Favorite.objects.exists()
+    assert Recipes.objects.dates("pub_date", "month").count() > 1
+    # Счетчики уже сходятся с фактическими данными.
+    assert Recipes.objects.all().refresh_counters() == 0
+    assert refresh_user_counters(User.objects.all()) == 0
+
+
+def test_generate_data_appends_recipes():
+    options = {"users": 3, "recipes": 10, "ingredients": 10, "tags": 2,
+               "stdout": StringIO()}
+    call_command("generate_data", **options)
+    call_command("generate_data", **options)
+    assert User.objects.count() == 3
+    assert Recipes.objects.count() == 20
+    # id назначаются генератором, последовательность сдвинута за них.
+    Recipes.objects.create(
+        author=User.objects.first(), name="Новый", description="Описание",
+        image="recipe/generated.jpg"
+    )
@@ -0,0 +1,102 @@
+"""Обработка изображений рецептов и дообработка пропущенных."""
+from io import BytesIO, StringIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from PIL import Image
+
+from api.cache import get_versions
+from posts.images import PROCESSED_DIR, find_missing_variants
+from posts.models import Recipes
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipe():
+    """Рецепт, задача обработки которого потерялась: обработчики
+    on_commit в тесте не выполняются.
+    """
+    buffer = BytesIO()
+    Image.new("RGB", (40, 30), "red").save(buffer, format="PNG")
+    image = default_storage.save("recipe/source.png",
+                                 ContentFile(buffer.getvalue()))
+    author = User.objects.create(username="author",
+                                 email="author@example.com")
+    return Recipes.objects.create(
+        author=author, name="Рецепт", description="Описание",
+        image=image, cooking_time=10
+    )
+
+
+def missing():
+    return list(find_missing_variants(Recipes.objects.all()))
+
+
+def process(**options):
+    call_command("process_recipe_images", stdout=StringIO(), **options)
+
+
+def test_command_processes_backlog(settings, recipe,
+                                   django_capture_on_commit_callbacks):
+    source = recipe.image.name
+    assert missing() == [recipe.pk]
+    version = get_versions([Recipes])
+    with django_capture_on_commit_callbacks(execute=True):
+        process()
+    recipe.refresh_from_db()
+    assert recipe.image.name.startswith(PROCESSED_DIR)
+    assert set(recipe.thumbnails) == {
+        str(size) for size in settings.RECIPE_THUMBNAIL_SIZES
+    }
+    assert all(default_storage.exists(name)
+               for name in [recipe.image.name, *recipe.thumbnails.values()])
+    assert not default_storage.exists(source)
+    assert get_versions([Recipes]) != version
+    assert missing() == []
+
+
+def test_command_builds_new_sizes(settings, recipe):
+    process()
+    recipe.refresh_from_db()
+    old_names = [recipe.image.name, *recipe.thumbnails.values()]
+    settings.RECIPE_THUMBNAIL_SIZES = (*settings.RECIPE_THUMBNAIL_SIZES, 20)
+    assert missing() == [recipe.pk]
+    process(recipes=[recipe.pk])
+    recipe.refresh_from_db()
+    assert "20" in recipe.thumbnails
+    assert not any(default_storage.exists(name) for name in old_names)
+    assert missing() == []
+
+
+def test_processing_keeps_other_fields(recipe):
+    Recipes.objects.filter(pk=recipe.pk).update(name="Новое название")
+    process()
+    recipe.refresh_from_db()
+    assert recipe.name == "Новое название"
+    assert recipe.image.name.startswith(PROCESSED_DIR)
+
+
+def test_stale_save_keeps_processed_image(recipe):
+    """Рецепт загружен до обработки и сохранен после нее."""
+    stale = Recipes.objects.get(pk=recipe.pk)
+    process()
+    stale.name = "Новое название"
+    stale.save()
+    recipe.refresh_from_db()
+    assert recipe.name == "Новое название"
+    assert recipe.image.name.startswith(PROCESSED_DIR)
+    assert recipe.thumbnails
+    assert default_storage.exists(recipe.image.name)
+
+
+def test_new_upload_is_saved(recipe):
+    process()
+    recipe.refresh_from_db()
+    recipe.image = ContentFile(b"image", name="new.png")
+    recipe.save()
+    recipe.refresh_from_db()
+    assert recipe.image.name.startswith("recipe/new")
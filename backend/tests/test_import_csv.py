@@ -0,0 +1,57 @@
+"""Загрузка ингредиентов командой import_csv."""
+import io
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from posts.management.commands.import_csv import iter_json_array
+from posts.models import Ingredients
+
+pytestmark = pytest.mark.django_db
+
+
+def load(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    call_command("import_csv", str(path), batch_size=2, stdout=io.StringIO())
+    return set(Ingredients.objects.values_list("name", "measurement_unit"))
+
+
+@pytest.mark.parametrize("chunk_size", (1, 2, 3, 5, 7, 64 * 1024))
+def test_iter_json_array_by_chunks(chunk_size):
+    items = [{"name": f"ингредиент {i}", "measurement_unit": "г"}
+             for i in range(20)] + [[1, 2], "]", 3, 12345, -1.5e-3,
+                                    0.125, True, None]
+    text = json.dumps(items, ensure_ascii=False, indent=1)
+    assert list(iter_json_array(io.StringIO(text), chunk_size)) == items
+    assert list(iter_json_array(io.StringIO(" [ ] "), chunk_size)) == []
+
+
+@pytest.mark.parametrize("text", ("", "{}", "[1, 2", "[1 2]", "[1,]"))
+def test_iter_json_array_errors(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), 2))
+
+
+def test_import_csv_and_json(tmp_path):
+    rows = {("соль", "г"), ("молоко", "мл"), ("яйца", "шт")}
+    assert load(tmp_path, "data.csv", "соль,г\nмолоко, мл\nяйца,шт\n"
+                "соль,г\n") == rows
+    content = json.dumps([
+        {"name": "соль", "measurement_unit": "г"},
+        {"name": "мука", "measurement_unit": "г"},
+    ], ensure_ascii=False)
+    assert load(tmp_path, "data.json", content) == rows | {("мука", "г")}
+
+
+@pytest.mark.parametrize("name, content", (
+    ("data.csv", "соль,г\nперец\n"),
+    ("data.json", '[{"name": "соль"}]'),
+    ("data.json", '[{"name": "соль", "measurement_unit": 1}]'),
+    ("data.json", '{"name": "соль"}'),
+))
+def test_import_rejects_invalid_rows(tmp_path, name, content):
+    with pytest.raises(CommandError):
+        load(tmp_path, name, content)
+    assert not Ingredients.objects.exists()
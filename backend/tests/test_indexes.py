@@ -0,0 +1,111 @@
+"""Планы запросов, которые выполняют представления API.
+
+Проверяет, что фильтры и проверки exists() идут по индексам,
+а сортировки рецептов не требуют отдельной сортировки строк.
+В Postgres на маленькой тестовой таблице планировщик предпочел бы
+последовательное чтение или bitmap scan с сортировкой, поэтому они
+отключаются: тест проверяет, что подходящий индекс есть и применим.
+"""
+import pytest
+from django.db import connection
+
+from posts.models import (Favorite, FeedItem, RecipeRank, Recipes,
+                          ShoppingList, SimilarRecipe, Subscribe)
+from users.models import User
+
+from .conftest import DATASETS, build_dataset
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def data(db):
+    data = build_dataset(**DATASETS["small"])
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_bitmapscan = off")
+    return data
+
+
+def index_name(model, name):
+    """SQLite создает уникальные ограничения как автоиндексы таблицы."""
+    if connection.vendor == "sqlite" and any(
+        constraint.name == name for constraint in model._meta.constraints
+    ):
+        return f"sqlite_autoindex_{model._meta.db_table}_"
+    return name
+
+
+def assert_uses_index(queryset, model, name, sorted_by_index=False):
+    plan = queryset.explain()
+    assert index_name(model, name) in plan, plan
+    if sorted_by_index:
+        assert "TEMP B-TREE" not in plan and "Sort" not in plan, plan
+
+
+@pytest.mark.parametrize("model, field, index", [
+    (Subscribe, "author", "unique_subscribe"),
+    (Favorite, "recipe", "unique_favorite"),
+    (ShoppingList, "recipe", "unique_shopping_list"),
+])
+def test_relation_exists_uses_unique_index(data, model, field, index):
+    target = data.users[1] if field == "author" else data.recipes[1]
+    queryset = model.objects.filter(
+        user=data.user, **{field: target}
+    ).values("pk")[:1]
+    assert_uses_index(queryset, model, index)
+
+
+def test_subscriptions_use_unique_index(data):
+    queryset = User.objects.filter(author__user=data.user)
+    assert_uses_index(queryset, Subscribe, "unique_subscribe")
+
+
+@pytest.mark.parametrize("ordering, index", [
+    (("-pub_date", "-id"), "recipes_pub_date_idx"),
+    (("-favorites_count", "-pub_date"), "recipes_favorites_count_idx"),
+])
+def test_recipes_ordering_uses_index(data, ordering, index):
+    queryset = Recipes.objects.order_by(*ordering)[:6]
+    assert_uses_index(queryset, Recipes, index, sorted_by_index=True)
+
+
+def test_author_recipes_use_index(data):
+    queryset = Recipes.objects.filter(
+        author=data.users[1]
+    ).order_by("-pub_date", "-id")[:6]
+    assert_uses_index(queryset, Recipes, "recipes_author_pub_date_idx",
+                      sorted_by_index=True)
+
+
+def test_latest_per_author_uses_index(data):
+    queryset = Recipes.objects.filter(
+        author__in=data.users[:3]
+    ).latest_per_author(3)
+    assert_uses_index(queryset, Recipes, "recipes_author_pub_date_idx")
+
+
+def test_feed_page_uses_index(data):
+    queryset = FeedItem.objects.filter(
+        user=data.user, pub_date__lt=data.recipes[-1].pub_date
+    ).order_by("-pub_date", "-recipe_id")[:6]
+    assert_uses_index(queryset, FeedItem, "feed_user_pub_date_idx",
+                      sorted_by_index=True)
+
+
+@pytest.mark.parametrize("tagged", (False, True))
+def test_ranking_page_uses_index(data, tagged):
+    queryset = RecipeRank.objects.filter(
+        kind=RecipeRank.TRENDING, tag=data.tags[0] if tagged else None
+    ).order_by("-score", "-recipe_id")[:6]
+    index = "recipe_rank_tag_idx" if tagged else "recipe_rank_idx"
+    assert_uses_index(queryset, RecipeRank, index, sorted_by_index=True)
+
+
+def test_similar_recipes_use_index(data):
+    queryset = SimilarRecipe.objects.filter(
+        recipe=data.recipes[0]
+    ).order_by("-score", "-similar_id")[:10]
+    assert_uses_index(queryset, SimilarRecipe, "similar_recipe_idx",
+                      sorted_by_index=True)
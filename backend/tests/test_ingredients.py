@@ -0,0 +1,19 @@
+"""Поиск ингредиентов по началу названия."""
+import pytest
+
+pytestmark = pytest.mark.django_db
+
+
+def test_search_is_limited(anon_client, dataset, settings):
+    settings.INGREDIENTS_SEARCH_LIMIT = 3
+    response = anon_client.get("/api/ingredients/", {"name": "Ингредиент"})
+    assert response.status_code == 200
+    assert len(response.data) == 3
+
+
+def test_retrieve_ignores_search(anon_client, dataset):
+    ingredient = dataset.ingredients[0]
+    response = anon_client.get(f"/api/ingredients/{ingredient.pk}/",
+                               {"name": "Ингредиент"})
+    assert response.status_code == 200
+    assert response.data["id"] == ingredient.pk
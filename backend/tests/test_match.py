@@ -0,0 +1,96 @@
+"""Подбор рецептов по имеющимся ингредиентам."""
+import pytest
+
+from api.search import recipe_index
+from posts.models import AmountOfIngridient, Recipes
+
+pytestmark = pytest.mark.django_db
+
+
+def expected_matches(ingredients):
+    """Подбор прямым перебором рецептов из базы."""
+    ingredients = set(ingredients)
+    matches = []
+    for recipe in Recipes.objects.prefetch_related("ingredient_in_recipe"):
+        required = {
+            item.ingredient_id for item in recipe.ingredient_in_recipe.all()
+        }
+        matched = len(required & ingredients)
+        if matched:
+            matches.append((matched / len(required), matched, recipe.pk))
+    return [pk for *_, pk in sorted(matches, reverse=True)]
+
+
+def match(client, ingredients, **params):
+    params["ingredients"] = ",".join(str(pk) for pk in ingredients)
+    response = client.get("/api/recipes/match/", params)
+    assert response.status_code == 200, response.data
+    return response.data
+
+
+def test_match_ranks_by_coverage(anon_client, dataset):
+    ingredients = [item.pk for item in dataset.ingredients[:10]]
+    data = match(anon_client, ingredients, limit=100)
+    expected = expected_matches(ingredients)
+    assert [recipe["id"] for recipe in data["results"]] == expected
+    assert data["count"] == len(expected)
+    recipe = data["results"][0]
+    assert recipe["coverage"] == round(
+        recipe["matched"] / recipe["required"], 4
+    )
+    assert recipe["required"] == len(recipe["ingredients"])
+
+
+def test_match_limit(anon_client, dataset):
+    ingredients = AmountOfIngridient.objects.filter(
+        recipe__in=dataset.recipes[:3]
+    ).values_list("ingredient", flat=True)
+    data = match(anon_client, ingredients, limit=2)
+    assert len(data["results"]) == 2
+    assert data["count"] == len(expected_matches(ingredients))
+    assert all(recipe["coverage"] == 1 for recipe in data["results"])
+
+
+def test_match_repeated_params(anon_client, dataset):
+    first, second = dataset.ingredients[:2]
+    response = anon_client.get(
+        f"/api/recipes/match/?ingredients={first.pk}"
+        f"&ingredients={second.pk}&limit=100"
+    )
+    assert [recipe["id"] for recipe in response.data["results"]] == \
+        expected_matches([first.pk, second.pk])
+
+
+@pytest.mark.parametrize("query", (
+    "", "?ingredients=", "?ingredients=x", "?ingredients=1&limit=0",
+    "?ingredients=1&limit=1000", "?ingredients=" + ",".join(["1"] * 201),
+))
+def test_match_validation(anon_client, dataset, query):
+    response = anon_client.get(f"/api/recipes/match/{query}")
+    assert response.status_code == 400
+
+
+def test_index_follows_recipe_changes(anon_client, dataset, monkeypatch,
+                                      django_capture_on_commit_callbacks):
+    monkeypatch.setattr(recipe_index, "refresh_interval", 0)
+    ingredient = dataset.ingredients[0]
+    match(anon_client, [ingredient.pk])
+    recipe = dataset.recipes[0]
+    with django_capture_on_commit_callbacks(execute=True):
+        AmountOfIngridient.objects.filter(recipe=recipe).delete()
+        AmountOfIngridient.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=1
+        )
+    data = match(anon_client, [ingredient.pk], limit=100)
+    assert data["results"][0]["id"] == recipe.pk
+    assert data["results"][0]["coverage"] == 1
+    assert [item["id"] for item in data["results"]] == \
+        expected_matches([ingredient.pk])
+
+    # После delete() у экземпляра pk уже None.
+    recipe_id = recipe.pk
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.delete()
+    data = match(anon_client, [ingredient.pk], limit=100)
+    assert recipe_id not in [item["id"] for item in data["results"]]
+    assert recipe_id not in recipe_index.recipes
@@ -0,0 +1,37 @@
+"""Сбор метрик запросов для /metrics."""
+import threading
+
+from api.metrics import Aggregator, get_series, render_metrics
+
+
+def test_concurrent_flushes_keep_all_series():
+    """Воркеры сбрасывают свои серии одновременно, и ни одна
+    не теряется.
+    """
+    workers = 8
+    barrier = threading.Barrier(workers)
+
+    def flush(number):
+        aggregator = Aggregator()
+        aggregator.observe("db_queries", (f"view-{number}", "GET"), 3)
+        aggregator.inc("query_budget_exceeded", ("shared", "GET"))
+        aggregator.flushed_at = 0
+        barrier.wait()
+        aggregator.maybe_flush()
+
+    threads = [threading.Thread(target=flush, args=(number,))
+               for number in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert get_series() == sorted([
+        *(("db_queries", f"view-{number}", "GET")
+          for number in range(workers)),
+        ("query_budget_exceeded", "shared", "GET"),
+    ])
+    metrics = render_metrics()
+    assert 'foodgram_db_queries_count{view="view-7",method="GET"} 1' \
+        in metrics
+    assert ('foodgram_query_budget_exceeded_total'
+            '{view="shared",method="GET"} 8') in metrics
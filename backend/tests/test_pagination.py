@@ -0,0 +1,84 @@
+"""Постраничная и курсорная пагинация рецептов."""
+import pytest
+from django.db.models import FloatField, Value
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.paginations import RecipesCursorPagination
+from api.views import RecipesViewSet
+from posts.models import Recipes
+
+pytestmark = pytest.mark.django_db
+
+
+def read_pages(client, url):
+    ids = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, response.data
+        ids.extend(recipe["id"] for recipe in response.data["results"])
+        url = response.data["next"]
+    return ids
+
+
+@pytest.mark.parametrize("ordering, expected", (
+    ("", ("-pub_date", "-id")),
+    ("pub_date", ("pub_date", "id")),
+))
+def test_cursor_pages_follow_unique_ordering(anon_client, dataset, ordering,
+                                             expected):
+    Recipes.objects.update(pub_date=dataset.recipes[0].pub_date)
+    url = f"/api/recipes/?pagination=cursor&limit=3&ordering={ordering}"
+    assert read_pages(anon_client, url) == list(
+        Recipes.objects.order_by(*expected).values_list("pk", flat=True)
+    )
+
+
+@pytest.mark.parametrize("ordering, expected", (
+    ("-favorites_count", ("-favorites_count", "-pub_date", "-id")),
+    ("favorites_count", ("favorites_count", "pub_date", "id")),
+))
+def test_pages_follow_unique_ordering(anon_client, dataset, ordering,
+                                      expected):
+    """Рецепты с равным кол-вом избранного и датой не повторяются
+    и не пропадают на соседних страницах.
+    """
+    Recipes.objects.update(pub_date=dataset.recipes[0].pub_date)
+    url = f"/api/recipes/?limit=3&ordering={ordering}"
+    assert read_pages(anon_client, url) == list(
+        Recipes.objects.order_by(*expected).values_list("pk", flat=True)
+    )
+
+
+def test_cursor_rejects_non_unique_ordering(anon_client, dataset):
+    response = anon_client.get(
+        "/api/recipes/?pagination=cursor&ordering=-favorites_count"
+    )
+    assert response.status_code == 400
+    assert "ordering" in response.data
+
+
+def get_view(url):
+    request = Request(APIRequestFactory().get(url))
+    return request, RecipesViewSet(request=request, format_kwarg=None)
+
+
+def test_cursor_keeps_search_rank(dataset):
+    request, view = get_view("/api/recipes/")
+    queryset = Recipes.objects.annotate(
+        search_rank=Value(0.5, output_field=FloatField())
+    )
+    assert RecipesCursorPagination().get_ordering(
+        request, queryset, view
+    ) == ("-search_rank", "-id")
+
+
+def test_cursor_ordering_appends_id(dataset):
+    paginator = RecipesCursorPagination()
+    request, view = get_view("/api/recipes/?ordering=-favorites_count")
+    with pytest.raises(ValidationError):
+        paginator.get_ordering(request, Recipes.objects.all(), view)
+    request, view = get_view("/api/recipes/?ordering=pub_date")
+    assert paginator.get_ordering(request, Recipes.objects.all(), view) \
+        == ("pub_date", "id")
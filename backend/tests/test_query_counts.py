@@ -0,0 +1,257 @@
+"""Кол-во SQL запросов каждого эндпоинта API.
+
+Тесты запускаются на наборах данных разного объема и с разным
+размером страницы. Если число запросов начинает зависеть от кол-ва
+строк (N+1), тест падает. При осознанном изменении запросов
+поправьте ожидаемое число в таблице.
+Для изменяющих запросов в счет входят и запросы обработчиков
+on_commit.
+"""
+from contextlib import contextmanager
+
+import pytest
+from django.db import connection
+
+from api.search import recipe_index
+from posts.similarity import refresh_similar_recipes
+
+pytestmark = pytest.mark.django_db
+
+PAGE_SIZES = (None, 50)
+
+
+@pytest.fixture
+def assert_write_queries(django_assert_num_queries,
+                         django_capture_on_commit_callbacks):
+    @contextmanager
+    def assert_queries(num):
+        with django_assert_num_queries(num):
+            with django_capture_on_commit_callbacks(execute=True):
+                yield
+    return assert_queries
+
+
+def with_limit(path, limit):
+    if limit is None:
+        return path
+    separator = "&" if "?" in path else "?"
+    return f"{path}{separator}limit={limit}"
+
+
+@pytest.mark.parametrize("limit", PAGE_SIZES)
+@pytest.mark.parametrize("path, queries", [
+    ("/api/users/", 3),
+    ("/api/users/subscriptions/", 4),
+    ("/api/users/subscriptions/?recipes_limit=2", 4),
+    ("/api/users/subscriptions/?pagination=cursor", 3),
+    ("/api/recipes/", 5),
+    ("/api/recipes/?pagination=cursor", 4),
+    ("/api/recipes/?is_favorited=1", 5),
+    ("/api/recipes/?is_in_shopping_cart=1", 5),
+    ("/api/recipes/?tags=tag-0&tags=tag-1", 6),
+    ("/api/recipes/?search=Рецепт", 5),
+    ("/api/recipes/?ordering=-favorites_count", 5),
+    ("/api/recipes/feed/", 5),
+    ("/api/recipes/popular/", 5),
+    ("/api/recipes/trending/?tag=tag-1", 5),
+])
+def test_user_list_queries(user_client, django_assert_num_queries,
+                           path, queries, limit):
+    with django_assert_num_queries(queries):
+        response = user_client.get(with_limit(path, limit))
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("path, queries", [
+    ("/api/users/me/", 2),
+    ("/api/tags/", 2),
+    ("/api/ingredients/", 2),
+    ("/api/ingredients/?name=Ингредиент 00", 2),
+    ("/api/recipes/download_shopping_cart/", 2),
+    ("/api/recipes/download_shopping_cart/?type=csv", 2),
+])
+def test_user_read_queries(user_client, django_assert_num_queries,
+                           path, queries):
+    with django_assert_num_queries(queries):
+        response = user_client.get(path)
+        b"".join(getattr(response, "streaming_content", []))
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("view, queries", [
+    ("users", 2),
+    ("recipes", 5),
+    ("tags", 2),
+    ("ingredients", 2),
+])
+def test_user_detail_queries(user_client, dataset,
+                             django_assert_num_queries, view, queries):
+    obj = {
+        "users": dataset.users[-1],
+        "recipes": dataset.recipes[-1],
+        "tags": dataset.tags[-1],
+        "ingredients": dataset.ingredients[-1],
+    }[view]
+    with django_assert_num_queries(queries):
+        response = user_client.get(f"/api/{view}/{obj.pk}/")
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("limit", PAGE_SIZES)
+@pytest.mark.parametrize("path, queries", [
+    ("/api/users/", 2),
+    ("/api/recipes/", 4),
+    ("/api/recipes/trending/", 4),
+    ("/api/tags/", 1),
+    ("/api/ingredients/", 1),
+])
+def test_anonymous_list_queries(anon_client, dataset,
+                                django_assert_num_queries, path, queries,
+                                limit):
+    with django_assert_num_queries(queries):
+        response = anon_client.get(with_limit(path, limit))
+    assert response.status_code == 200
+
+
+def test_anonymous_recipe_detail_queries(anon_client, dataset,
+                                         django_assert_num_queries):
+    with django_assert_num_queries(3):
+        response = anon_client.get(f"/api/recipes/{dataset.recipes[0].pk}/")
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("action", ("favorite", "shopping_cart"))
+def test_recipe_relation_queries(user_client, dataset,
+                                 assert_write_queries, action):
+    recipe = dataset.recipes[1]
+    # В Postgres рецепт для ответа возвращает сама вставка.
+    with assert_write_queries(3 if connection.vendor == "postgresql" else 4):
+        response = user_client.post(f"/api/recipes/{recipe.pk}/{action}/")
+    assert response.status_code == 201
+    with assert_write_queries(3):
+        response = user_client.delete(f"/api/recipes/{recipe.pk}/{action}/")
+    assert response.status_code == 204
+
+
+def test_subscribe_queries(user_client, dataset, assert_write_queries):
+    author = dataset.users[1]
+    with assert_write_queries(4):
+        response = user_client.delete(f"/api/users/{author.pk}/subscribe/")
+    assert response.status_code == 204
+    with assert_write_queries(7):
+        response = user_client.post(f"/api/users/{author.pk}/subscribe/")
+    assert response.status_code == 201
+
+
+def recipe_payload(dataset, image, ingredients):
+    return {
+        "name": "Новый рецепт",
+        "text": "Описание",
+        "cooking_time": 10,
+        "image": image,
+        "tags": [tag.pk for tag in dataset.tags[:2]],
+        "ingredients": [
+            {"id": ingredient.pk, "amount": 5}
+            for ingredient in dataset.ingredients[:ingredients]
+        ],
+    }
+
+
+@pytest.mark.parametrize("ingredients", (2, 15))
+def test_recipe_create_queries(user_client, dataset, image,
+                               assert_write_queries, ingredients):
+    payload = recipe_payload(dataset, image, ingredients)
+    with assert_write_queries(18):
+        response = user_client.post("/api/recipes/", payload, format="json")
+    assert response.status_code == 201, response.data
+
+
+@pytest.mark.parametrize("added", (1, 15))
+def test_recipe_update_queries(user_client, dataset, image,
+                               assert_write_queries, added):
+    """Теги прежние, у одного ингредиента меняется кол-во,
+    остальные удаляются, added новых добавляется.
+    """
+    recipe = dataset.recipes[0]
+    current = list(recipe.ingredient_in_recipe.all())
+    current_ids = {item.ingredient_id for item in current}
+    new = [ingredient for ingredient in dataset.ingredients
+           if ingredient.pk not in current_ids][:added]
+    payload = recipe_payload(dataset, image, 0)
+    payload["tags"] = list(recipe.tags.values_list("pk", flat=True))
+    payload["ingredients"] = [
+        {"id": current[0].ingredient_id, "amount": current[0].amount + 1},
+        *({"id": ingredient.pk, "amount": 5} for ingredient in new),
+    ]
+    with assert_write_queries(20):
+        response = user_client.patch(
+            f"/api/recipes/{recipe.pk}/", payload, format="json"
+        )
+    assert response.status_code == 200, response.data
+
+
+def test_recipe_delete_queries(user_client, dataset,
+                               assert_write_queries):
+    recipe = dataset.recipes[0]
+    with assert_write_queries(19):
+        response = user_client.delete(f"/api/recipes/{recipe.pk}/")
+    assert response.status_code == 204
+
+
+def test_user_create_queries(anon_client, dataset,
+                             assert_write_queries):
+    payload = {
+        "email": "new@example.com", "username": "new_user",
+        "first_name": "Имя", "last_name": "Фамилия",
+        "password": "Sup3r-secret-pass",
+    }
+    with assert_write_queries(6):
+        response = anon_client.post("/api/users/", payload, format="json")
+    assert response.status_code == 201, response.data
+
+
+def test_token_queries(anon_client, dataset, assert_write_queries):
+    user = dataset.user
+    user.set_password("Sup3r-secret-pass")
+    user.save()
+    with assert_write_queries(6):
+        response = anon_client.post("/api/auth/token/login/", {
+            "email": user.email, "password": "Sup3r-secret-pass",
+        })
+    assert response.status_code == 200, response.data
+    anon_client.credentials(
+        HTTP_AUTHORIZATION=f"Token {response.data['auth_token']}"
+    )
+    with assert_write_queries(3):
+        response = anon_client.post("/api/users/set_password/", {
+            "current_password": "Sup3r-secret-pass",
+            "new_password": "An0ther-secret-pass",
+        })
+    assert response.status_code == 204, response.data
+    with assert_write_queries(2):
+        response = anon_client.post("/api/auth/token/logout/")
+    assert response.status_code == 204
+
+
+@pytest.mark.parametrize("limit", PAGE_SIZES)
+def test_match_queries(user_client, dataset, django_assert_num_queries,
+                       limit):
+    """Подбор идет по уже построенному индексу в памяти."""
+    recipe_index.build()
+    ingredients = ",".join(str(item.pk) for item in dataset.ingredients[:10])
+    with django_assert_num_queries(4):
+        response = user_client.get(
+            with_limit(f"/api/recipes/match/?ingredients={ingredients}",
+                       limit)
+        )
+    assert response.status_code == 200
+
+
+def test_similar_queries(user_client, dataset, django_assert_num_queries):
+    """Похожие читаются из таблицы без расчетов в запросе."""
+    refresh_similar_recipes(full=True)
+    recipe = dataset.recipes[0]
+    with django_assert_num_queries(5):
+        response = user_client.get(f"/api/recipes/{recipe.pk}/similar/")
+    assert response.status_code == 200
+    assert response.data
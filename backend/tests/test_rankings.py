@@ -0,0 +1,128 @@
+"""Рейтинги популярных рецептов и трендов."""
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from posts.models import Favorite, RecipeRank, ShoppingList
+from posts.rankings import refresh_rankings
+
+from .conftest import DATASETS, build_dataset
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def data(db):
+    """Избранное и корзина заданы явно: рецепт 0 добавлен трижды
+    10 дней назад, рецепт 1 - один раз сейчас, рецепт 2 - дважды
+    двое суток назад, рецепт 3 - 40 дней назад, за окном трендов.
+    """
+    data = build_dataset(**DATASETS["small"])
+    Favorite.objects.all().delete()
+    ShoppingList.objects.all().delete()
+    now = timezone.now()
+    for recipe, users, days in ((0, 3, 10), (1, 1, 0), (2, 2, 2),
+                                (3, 1, 40)):
+        for user in data.users[:users]:
+            Favorite.objects.create(user=user, recipe=data.recipes[recipe])
+        Favorite.objects.filter(recipe=data.recipes[recipe]).update(
+            created=now - timedelta(days=days)
+        )
+    data.now = now
+    return data
+
+
+def ranking(kind, tag=None):
+    return list(RecipeRank.objects.filter(kind=kind, tag=tag).order_by(
+        "-score", "-recipe_id"
+    ).values_list("recipe", flat=True))
+
+
+def test_scores(data):
+    counts = refresh_rankings(now=data.now)
+    assert counts == {"popular": 2, "trending": 3}
+    recipes = [recipe.pk for recipe in data.recipes]
+    assert ranking(RecipeRank.POPULAR) == [recipes[2], recipes[1]]
+    assert ranking(RecipeRank.TRENDING) == [
+        recipes[2], recipes[1], recipes[0]
+    ]
+    popular = RecipeRank.objects.get(
+        kind=RecipeRank.POPULAR, tag=None, recipe=data.recipes[2]
+    )
+    assert popular.score == 2
+
+
+def test_tag_rows(data):
+    refresh_rankings(now=data.now)
+    for tag in data.tags:
+        assert ranking(RecipeRank.TRENDING, tag) == [
+            pk for pk in ranking(RecipeRank.TRENDING)
+            if tag.tag.filter(pk=pk).exists()
+        ]
+
+
+def test_refresh_replaces_rankings(data):
+    refresh_rankings(now=data.now)
+    Favorite.objects.filter(recipe=data.recipes[1]).delete()
+    refresh_rankings(now=data.now + timedelta(days=6))
+    assert ranking(RecipeRank.POPULAR) == []
+    assert data.recipes[1].pk not in ranking(RecipeRank.TRENDING)
+
+
+def rows():
+    return {
+        (rank.kind, rank.tag_id, rank.recipe_id): (rank.pk, rank.score)
+        for rank in RecipeRank.objects.all()
+    }
+
+
+def test_refresh_writes_only_changes(data, django_assert_num_queries):
+    refresh_rankings(now=data.now)
+    before = rows()
+    later = data.now + timedelta(hours=5)
+    # Чтение добавлений, тэгов и текущих строк: записей нет.
+    with django_assert_num_queries(6):
+        refresh_rankings(now=later)
+    assert rows() == before
+
+    recipe = data.recipes[0]
+    Favorite.objects.create(user=data.users[3], recipe=recipe)
+    refresh_rankings(now=later)
+    after = rows()
+    assert after.keys() == before.keys() | {
+        (RecipeRank.POPULAR, tag, recipe.pk)
+        for tag in (None, *recipe.tags.values_list("pk", flat=True))
+    }
+    for key, (pk, score) in after.items():
+        if key[2] == recipe.pk:
+            continue
+        assert (pk, score) == before[key]
+    assert ranking(RecipeRank.TRENDING)[0] == recipe.pk
+
+
+@pytest.mark.parametrize("kind", ("popular", "trending"))
+def test_ranking_endpoint(anon_client, data, kind):
+    refresh_rankings()
+    ids = []
+    url = f"/api/recipes/{kind}/?limit=1"
+    while url:
+        response = anon_client.get(url)
+        assert response.status_code == 200
+        ids.extend(recipe["id"] for recipe in response.data["results"])
+        url = response.data["next"]
+    assert ids == ranking(kind)
+    tag = data.tags[0]
+    response = anon_client.get(f"/api/recipes/{kind}/?tag={tag.slug}")
+    assert [recipe["id"] for recipe in response.data["results"]] == \
+        ranking(kind, tag)
+    response = anon_client.get(f"/api/recipes/{kind}/?tag=unknown")
+    assert response.data["results"] == []
+
+
+def test_refresh_rankings_command(data):
+    stdout = StringIO()
+    call_command("refresh_rankings", stdout=stdout)
+    assert "популярное 2, тренды 3" in stdout.getvalue()
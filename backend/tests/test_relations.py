@@ -0,0 +1,162 @@
+"""Добавление и удаление избранного, корзины и подписок."""
+import pytest
+from django.db import transaction
+
+from posts.models import (Favorite, Recipes, RelationQuerySet,
+                          ShoppingList, Subscribe, refresh_user_counters)
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+def assert_counters_match():
+    """Счетчики сходятся с фактическими данными."""
+    assert Recipes.objects.all().refresh_counters() == 0
+    assert refresh_user_counters(User.objects.all()) == 0
+
+
+@pytest.mark.parametrize("model", (Favorite, ShoppingList, Subscribe))
+def test_add_and_remove_skip_existing(dataset, model):
+    if model is Subscribe:
+        targets = [user.pk for user in dataset.users]
+    else:
+        targets = [recipe.pk for recipe in dataset.recipes]
+    user = User.objects.create(username="new", email="new@example.com")
+    # Несуществующие цели пропускаются.
+    assert model.objects.add(user, targets + [10 ** 6]) == len(targets)
+    assert model.objects.add(user, targets) == 0
+    assert_counters_match()
+    assert model.objects.remove(user, targets[:2]) == 2
+    assert model.objects.remove(user, targets[:2]) == 0
+    assert_counters_match()
+
+
+def test_add_returning_skips_existing(dataset):
+    user = dataset.user
+    existing = set(Favorite.objects.filter(user=user).values_list(
+        "recipe", flat=True
+    ))
+    targets = [recipe.pk for recipe in dataset.recipes]
+    added = Favorite.objects.add_returning(user, targets + [10 ** 6])
+    assert sorted(recipe.pk for recipe in added) == sorted(
+        set(targets) - existing
+    )
+    assert all(isinstance(recipe, Recipes) for recipe in added)
+    assert Favorite.objects.add_returning(user, targets) == []
+    assert_counters_match()
+
+
+def test_relation_queryset_requires_refresh_targets():
+    class BrokenQuerySet(RelationQuerySet):
+        target_field = "recipe"
+
+    with pytest.raises(TypeError):
+        BrokenQuerySet(Favorite)
+
+
+@pytest.mark.parametrize("action", ("favorite", "shopping_cart"))
+def test_recipe_toggle(user_client, dataset, action):
+    recipe = dataset.recipes[1]
+    url = f"/api/recipes/{recipe.pk}/{action}/"
+    response = user_client.post(url)
+    assert response.status_code == 201
+    assert response.data["id"] == recipe.pk
+    assert user_client.post(url).status_code == 400
+    assert_counters_match()
+    assert user_client.delete(url).status_code == 204
+    assert user_client.delete(url).status_code == 400
+    assert_counters_match()
+
+
+@pytest.mark.parametrize("action", ("favorite", "shopping_cart"))
+def test_recipe_toggle_missing_recipe(user_client, dataset, action):
+    url = f"/api/recipes/{10 ** 6}/{action}/"
+    assert user_client.post(url).status_code == 400
+    assert user_client.delete(url).status_code == 404
+
+
+def test_subscribe_toggle(user_client, dataset):
+    author = dataset.users[1]
+    url = f"/api/users/{author.pk}/subscribe/"
+    assert user_client.delete(url).status_code == 204
+    assert user_client.delete(url).status_code == 400
+    response = user_client.post(url)
+    assert response.status_code == 201
+    assert response.data["is_subscribed"] is True
+    assert user_client.post(url).status_code == 400
+    assert_counters_match()
+    url = f"/api/users/{dataset.user.pk}/subscribe/"
+    assert user_client.post(url).status_code == 400
+    assert user_client.delete(url).status_code == 400
+    assert user_client.post(f"/api/users/{10 ** 6}/subscribe/").status_code \
+        == 404
+
+
+@pytest.mark.parametrize("action, model", (
+    ("favorite", Favorite), ("shopping_cart", ShoppingList)
+))
+def test_recipe_batch(user_client, dataset, action, model):
+    added = [recipe.pk for recipe in dataset.recipes[1::2]]
+    removed = [recipe.pk for recipe in dataset.recipes[::2]]
+    response = user_client.post(f"/api/recipes/{action}/", {
+        "add": added + [10 ** 6], "remove": removed,
+    }, format="json")
+    assert response.status_code == 200, response.data
+    assert response.data == {"added": len(added), "removed": len(removed)}
+    assert set(model.objects.filter(user=dataset.user).values_list(
+        "recipe", flat=True
+    )) == set(added)
+    assert_counters_match()
+
+
+def test_subscribe_batch(user_client, dataset):
+    authors = [user.pk for user in dataset.users[1:]]
+    response = user_client.post("/api/users/subscribe/", {
+        "remove": authors,
+    }, format="json")
+    assert response.data == {"added": 0, "removed": len(authors)}
+    response = user_client.post("/api/users/subscribe/", {
+        "add": authors + [dataset.user.pk],
+    }, format="json")
+    assert response.data == {"added": len(authors), "removed": 0}
+    assert_counters_match()
+
+
+@pytest.mark.parametrize("payload", (
+    {},
+    {"add": [], "remove": []},
+    {"add": [1], "remove": [1]},
+    {"add": ["x"]},
+    {"add": list(range(1, 1000))},
+))
+def test_batch_validation(user_client, dataset, payload):
+    response = user_client.post("/api/recipes/favorite/", payload,
+                                format="json")
+    assert response.status_code == 400
+
+
+def test_batch_requires_auth(anon_client, dataset):
+    response = anon_client.post("/api/recipes/favorite/", {"add": [1]},
+                                format="json")
+    assert response.status_code == 401
+
+
+def test_counters_change_with_the_write(user_client, dataset):
+    """Счетчики меняются в той же транзакции, без обработчиков
+    on_commit, и откатываются вместе с записью.
+    """
+    recipe = dataset.recipes[1]
+    before = Recipes.objects.get(pk=recipe.pk).favorites_count
+    user_client.post(f"/api/recipes/{recipe.pk}/favorite/")
+    assert Recipes.objects.get(pk=recipe.pk).favorites_count == before + 1
+    recipe = dataset.recipes[0]
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            Recipes.objects.get(pk=recipe.pk).delete()
+            raise RuntimeError
+    author = User.objects.get(pk=recipe.author_id)
+    assert author.recipes_count == Recipes.objects.filter(
+        author=author
+    ).count()
+    Recipes.objects.get(pk=recipe.pk).delete()
+    assert_counters_match()
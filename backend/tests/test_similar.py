@@ -0,0 +1,157 @@
+"""Похожие рецепты по ингредиентам и тэгам."""
+import math
+from collections import Counter
+from io import StringIO
+
+import numpy as np
+import pytest
+from django.core.management import call_command
+
+from posts.models import AmountOfIngridient, Recipes, SimilarRecipe
+from posts.similarity import refresh_similar_recipes, top_rows
+
+pytestmark = pytest.mark.django_db
+
+
+def expected_similar(settings):
+    """Косинусная близость прямым перебором всех пар рецептов:
+    {рецепт: {другой рецепт: близость}} без нулевой близости.
+    """
+    features = {}
+    for recipe in Recipes.objects.prefetch_related(
+        "ingredient_in_recipe", "tags"
+    ):
+        features[recipe.pk] = {
+            ("ingredient", item.ingredient_id)
+            for item in recipe.ingredient_in_recipe.all()
+        } | {("tag", tag.pk) for tag in recipe.tags.all()}
+    frequency = Counter(
+        feature for values in features.values() for feature in values
+    )
+    vectors = {}
+    for recipe, values in features.items():
+        vector = {}
+        for feature in values:
+            weight = math.log1p(len(features) / frequency[feature])
+            if feature[0] == "tag":
+                weight *= settings.SIMILAR_TAG_WEIGHT
+            vector[feature] = weight
+        norm = math.sqrt(sum(value ** 2 for value in vector.values())) or 1
+        vectors[recipe] = {key: value / norm for key, value in vector.items()}
+    similar = {}
+    for recipe, vector in vectors.items():
+        scores = {
+            pk: sum(value * other.get(key, 0)
+                    for key, value in vector.items())
+            for pk, other in vectors.items() if pk != recipe
+        }
+        similar[recipe] = {
+            pk: score for pk, score in scores.items() if score > 1e-6
+        }
+    return similar
+
+
+@pytest.mark.parametrize("recipes", (64, 1024))
+def test_top_rows_by_blocks(recipes):
+    scores = np.random.default_rng(0).random((recipes, 20)).astype(
+        np.float32
+    )
+    scores[scores < 0.7] = 0
+    top = top_rows(scores, 5, block=16)
+    assert top.shape == (20, 5)
+    assert np.array_equal(
+        np.sort(np.take_along_axis(scores.T, top, axis=1), axis=1),
+        np.sort(scores.T, axis=1)[:, -5:]
+    )
+
+
+def stored(recipe):
+    return [
+        (row.similar_id, row.score)
+        for row in SimilarRecipe.objects.filter(recipe=recipe).order_by(
+            "-score", "-similar_id"
+        )
+    ]
+
+
+def assert_nearest(actual, scores, count):
+    """Сохранены count самых близких. При равной близости на границе
+    списка подходит любой из рецептов.
+    """
+    expected = sorted(scores.values(), reverse=True)[:count]
+    assert [score for _, score in actual] == pytest.approx(expected,
+                                                           abs=1e-5)
+    for pk, score in actual:
+        assert score == pytest.approx(scores[pk], abs=1e-5)
+
+
+@pytest.fixture
+def similar(settings, dataset):
+    settings.SIMILAR_RECIPES_COUNT = 3
+    refresh_similar_recipes(full=True, batch_size=4, block=4)
+    return expected_similar(settings)
+
+
+def test_full_refresh(similar):
+    for recipe, scores in similar.items():
+        assert_nearest(stored(recipe), scores, 3)
+    assert not Recipes.objects.filter(similar_at__isnull=True).exists()
+
+
+def test_incremental_refresh(settings, dataset, similar,
+                             django_capture_on_commit_callbacks):
+    assert refresh_similar_recipes() == 0
+    changed, deleted, source = dataset.recipes[:3]
+    with django_capture_on_commit_callbacks(execute=True):
+        AmountOfIngridient.objects.filter(recipe=changed).delete()
+        AmountOfIngridient.objects.create(
+            recipe=changed, ingredient=dataset.ingredients[-1], amount=1
+        )
+        deleted.delete()
+    copy = Recipes.objects.create(
+        author=source.author, name="Копия", description="Описание",
+        image="recipe/test.png"
+    )
+    copy.tags.set(source.tags.all())
+    AmountOfIngridient.objects.bulk_create(
+        AmountOfIngridient(recipe=copy, ingredient_id=item.ingredient_id,
+                           amount=1)
+        for item in source.ingredient_in_recipe.all()
+    )
+    assert refresh_similar_recipes(batch_size=4, block=4) >= 2
+    assert not SimilarRecipe.objects.filter(similar=deleted.pk).exists()
+    expected = expected_similar(settings)
+    for recipe in (changed, copy):
+        assert_nearest(stored(recipe), expected[recipe.pk], 3)
+    assert stored(source)[0] == (copy.pk, pytest.approx(1))
+    assert all(
+        len(stored(recipe)) <= settings.SIMILAR_RECIPES_COUNT
+        for recipe in expected
+    )
+    assert refresh_similar_recipes() == 0
+
+
+def test_similar_endpoint(anon_client, dataset, similar):
+    recipe = dataset.recipes[0]
+    response = anon_client.get(f"/api/recipes/{recipe.pk}/similar/")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.data] == [
+        pk for pk, _ in stored(recipe)
+    ]
+    assert len(response.data) == min(3, len(similar[recipe.pk]))
+    response = anon_client.get(f"/api/recipes/{recipe.pk}/similar/?limit=1")
+    assert len(response.data) == min(1, len(similar[recipe.pk]))
+    assert anon_client.get(
+        f"/api/recipes/{recipe.pk}/similar/?limit=100"
+    ).status_code == 400
+    assert anon_client.get(f"/api/recipes/{10 ** 6}/similar/").status_code \
+        == 404
+
+
+def test_refresh_similar_recipes_command(dataset):
+    stdout = StringIO()
+    call_command("refresh_similar_recipes", stdout=stdout)
+    assert f"рецептов: {len(dataset.recipes)} " in stdout.getvalue()
+    stdout = StringIO()
+    call_command("refresh_similar_recipes", stdout=stdout)
+    assert "рецептов: 0 " in stdout.getvalue()
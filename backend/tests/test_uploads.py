@@ -0,0 +1,78 @@
+"""Декодирование изображений из data URI base64."""
+import base64
+from io import BytesIO
+
+import pytest
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image
+from rest_framework.serializers import ValidationError
+
+from api import uploads
+from api.uploads import decode_base64_image
+
+
+def encode(image_format, size=(4, 3)):
+    buffer = BytesIO()
+    Image.new("RGB", size, "red").save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def data_uri(content, mime_type, wrap=False):
+    encode_base64 = base64.encodebytes if wrap else base64.b64encode
+    return f"data:{mime_type};base64,{encode_base64(content).decode()}"
+
+
+@pytest.mark.parametrize("mime_type", ("image/jpeg", "image/jpg"))
+def test_jpeg_aliases(mime_type):
+    content = encode("JPEG")
+    upload = decode_base64_image(data_uri(content, mime_type))
+    assert upload.content_type == "image/jpeg"
+    assert upload.name.endswith(".jpg")
+    assert upload.read() == content
+
+
+def test_wrapped_base64(monkeypatch):
+    """Переносы строк через каждые 76 символов, части не кратны ни 4,
+    ни длине строки.
+    """
+    monkeypatch.setattr(uploads, "CHUNK_SIZE", 30)
+    content = encode("PNG", (64, 64))
+    data = data_uri(content, "image/png", wrap=True)
+    assert "\n" in data
+    upload = decode_base64_image(data)
+    assert upload.size == len(content)
+    assert upload.read() == content
+
+
+def test_large_image_goes_to_disk(settings):
+    content = encode("PNG")
+    settings.FILE_UPLOAD_MAX_MEMORY_SIZE = len(content) - 1
+    upload = decode_base64_image(data_uri(content, "image/png"))
+    assert isinstance(upload, TemporaryUploadedFile)
+    assert upload.read() == content
+    upload.close()
+
+
+@pytest.mark.parametrize("data, message", [
+    ("image/png;base64,AAAA", "data URI"),
+    ("data:image/png,AAAA", "data URI"),
+    ("data:image/bmp;base64,AAAA", "Недопустимый тип"),
+    ("data:image/png;base64,", "Некорректные данные"),
+    ("data:image/png;base64,iVBORw0KGgo", "Некорректные данные"),
+    ("data:image/png;base64,iVBORw0KGgo!", "Некорректные данные"),
+    (data_uri(encode("JPEG"), "image/png"), "не соответствует"),
+])
+def test_invalid_data(data, message):
+    with pytest.raises(ValidationError, match=message):
+        decode_base64_image(data)
+
+
+def test_size_limit(settings):
+    """Размер считается по длине base64 без переносов и padding."""
+    content = encode("PNG")
+    data = data_uri(content, "image/png", wrap=True)
+    settings.IMAGE_UPLOAD_MAX_SIZE = len(content)
+    assert decode_base64_image(data).read() == content
+    settings.IMAGE_UPLOAD_MAX_SIZE = len(content) - 1
+    with pytest.raises(ValidationError, match="Размер изображения"):
+        decode_base64_image(data)
@@ -35,6 +35,18 @@ class User(AbstractUser):
         max_length=150,
         blank=False
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name="Кол-во рецептов",
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name="Кол-во подписчиков",
+        default=0,
+        editable=False
+    )
+
+    COUNTER_FIELDS = ("recipes_count", "followers_count")
 
     class Meta:
         ordering = ("username", )
@@ -42,3 +54,15 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.username
+
+    def save(self, *args, **kwargs):
+        """Счетчики меняются только через F() и не перезаписываются
+        при сохранении профиля.
+        """
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)